@@ -1,5 +1,6 @@
 import ccxt
 import math
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import json
 import requests
@@ -13,6 +14,9 @@ from config_constants import DINGTALK_ROBOT_ID, DINGTALK_ROBOT_SECRET
 
 import Signals
 import pandas as pd
+from rate_limiter import TokenBucket, get_okx_limiter, wait_after_error
+from single_flight import SingleFlight
+from candle_decoder import decode_candles, to_dataframe as candles_to_dataframe
 
 
 # =====okex交互函数
@@ -29,6 +33,7 @@ def ccxt_fetch_future_account(exchange, max_try_amount=5):
     """
     for _ in range(max_try_amount):
         try:
+            get_okx_limiter("account").acquire(2)  # 余额、持仓两次请求
             balance_of = float(
                 # 应用可用保证金？
                 exchange.private_get_account_balance({"ccy": "USDT"})["data"][0][
@@ -56,7 +61,7 @@ def ccxt_fetch_future_account(exchange, max_try_amount=5):
                 "通过ccxt的通过futures_get_accounts获取所有合约账户信息，失败，稍后重试：\n",
                 e,
             )
-            time.sleep(medium_sleep_time)
+            wait_after_error("account", e, medium_sleep_time)
 
     _ = "通过ccxt的通过futures_get_accounts获取余额与持仓信息，失败次数过多，程序Raise Error"
     send_dingding_and_raise_error(_)
@@ -84,6 +89,7 @@ def ccxt_fetch_future_position(exchange, max_try_amount=5):
     for _ in range(max_try_amount):
         try:
             # 获取数据
+            get_okx_limiter("account").acquire()
             df = pd.DataFrame(exchange.private_get_account_positions()["data"])
 
             # 只将数值列转换为float，非数值列保持原状
@@ -106,7 +112,7 @@ def ccxt_fetch_future_position(exchange, max_try_amount=5):
                 "通过ccxt的通过futures_get_position获取所有合约的持仓信息，失败，稍后重试。失败原因：\n",
                 e,
             )
-            time.sleep(medium_sleep_time)
+            wait_after_error("account", e, medium_sleep_time)
 
     _ = "通过ccxt的通过futures_get_position获取所有合约的持仓信息，失败次数过多，程序Raise Error"
     send_dingding_and_raise_error(_)
@@ -129,6 +135,7 @@ def ccxt_fetch_candle_data(
         try:
             # 获取数据
             # data = exchange.fetch_ohlcv(symbol=symbol, timeframe=time_interval, limit=limit)
+            get_okx_limiter("candles").acquire()
             data = exchange.publicGetMarketCandles(
                 {
                     "instId": symbol,
@@ -136,38 +143,14 @@ def ccxt_fetch_candle_data(
                     "limit": limit,
                 }
             )["data"]
-            # 整理数据
-            df = pd.DataFrame(data)
-
-            # 只将数值列转换为float，非数值列保持原状
-            for col in df.columns:
-                try:
-                    df[col] = df[col].astype(float)
-                except:
-                    pass  # 如果转换失败，保持原状
-
-            df.rename(
-                columns={
-                    0: "MTS",
-                    1: "open",
-                    2: "high",
-                    3: "low",
-                    4: "close",
-                    5: "volume",
-                },
-                inplace=True,
-            )
-            df["candle_begin_time"] = pd.to_datetime(df["MTS"], unit="ms")
-            # 使用UTC时区，然后转换为北京时间
-            df["candle_begin_time"] = df["candle_begin_time"].dt.tz_localize('UTC')
-            df["candle_begin_time_GMT8"] = df["candle_begin_time"].dt.tz_convert('Asia/Shanghai')
-            df = df[
-                ["candle_begin_time_GMT8", "open", "high", "low", "close", "volume"]
-            ]
+            if not data:
+                raise ValueError("接口未返回K线数据")
+            # 整理数据，保持接口返回的时间倒序
+            df = candles_to_dataframe(decode_candles(data, sort=False))
             return df
         except Exception as e:
             print("获取fetch_ohlcv获取合约K线数据，失败，稍后重试。失败原因：\n", e)
-            time.sleep(short_sleep_time)
+            wait_after_error("candles", e, short_sleep_time)
 
     _ = "获取fetch_ohlcv合约K线数据，失败次数过多，程序Raise Error"
     send_dingding_and_raise_error(_)
@@ -417,6 +400,7 @@ def okex_future_place_order(
         num = 0
         while True:
             try:
+                get_okx_limiter("ticker").acquire()
                 response = float(
                     exchange.public_get_market_ticker(
                         {"instId": symbol_config[symbol]["instrument_id"]}
@@ -450,12 +434,14 @@ def okex_future_place_order(
                 )
 
                 print("开始下单：", datetime.now())
+                get_okx_limiter("trade").acquire()
                 order_info = exchange.private_post_trade_order(params)
                 ordId = order_info["data"][0]["ordId"]
                 print(order_info, "下单完成：", datetime.now())
                 time.sleep(5)  # 等待三秒
 
                 # 获取订单信息
+                get_okx_limiter("trade").acquire()
                 state = exchange.private_get_trade_order(
                     {"instId": symbol_config[symbol]["instrument_id"], "ordId": ordId}
                 )["data"][0]["state"]
@@ -464,6 +450,7 @@ def okex_future_place_order(
                 # canceled：撤单成功  live：等待成交  partially_filled：部分成交   filled：完全成交
                 if state == "live":
                     print("订单超过三秒未成交,重新获取价格下单")
+                    get_okx_limiter("trade").acquire()
                     exchange.private_post_trade_cancel_order(
                         {
                             "instId": symbol_config[symbol]["instrument_id"],
@@ -577,7 +564,6 @@ def update_order_info(exchange, symbol_config, symbol_order, max_try_amount=5):
     if symbol_order.empty is False:
         # 这个遍历下单id
         for order_id in symbol_order.index:
-            time.sleep(medium_sleep_time)  # 每次获取下单数据时sleep一段时间
             order_info = None
             # 根据下单id获取数据
             for i in range(max_try_amount):
@@ -588,12 +574,13 @@ def update_order_info(exchange, symbol_config, symbol_order, max_try_amount=5):
                         ],
                         "ordId": order_id,
                     }
+                    get_okx_limiter("trade").acquire()
                     order_info = exchange.private_get_trade_order(para)
                     break
                 except Exception as e:
                     print(e)
                     print("根据订单号获取订单信息失败，稍后重试")
-                    time.sleep(medium_sleep_time)
+                    wait_after_error("trade", e, medium_sleep_time)
                     if i == max_try_amount - 1:
                         send_dingding_msg("重试次数过多，获取订单信息失败，程序退出")
                         raise ValueError("重试次数过多，获取订单信息失败，程序退出")
@@ -676,6 +663,93 @@ def next_run_time(time_interval, ahead_seconds=5):
     return target_time
 
 
+# ===OKX时间周期映射（支持更多时间周期）
+okex_timeframe_mapping = {
+    '1W': {'multiplier': 7 * 24 * 60 * 60 * 1000, 'desc': '1周'},
+    '3D': {'multiplier': 3 * 24 * 60 * 60 * 1000, 'desc': '3天'},
+    '1D': {'multiplier': 24 * 60 * 60 * 1000, 'desc': '1天'},
+    '12H': {'multiplier': 12 * 60 * 60 * 1000, 'desc': '12小时'},
+    '6H': {'multiplier': 6 * 60 * 60 * 1000, 'desc': '6小时'},
+    '4H': {'multiplier': 4 * 60 * 60 * 1000, 'desc': '4小时'},
+    '2H': {'multiplier': 2 * 60 * 60 * 1000, 'desc': '2小时'},
+    '1H': {'multiplier': 1 * 60 * 60 * 1000, 'desc': '1小时'},
+    '30m': {'multiplier': 30 * 60 * 1000, 'desc': '30分钟'},
+    '15m': {'multiplier': 15 * 60 * 1000, 'desc': '15分钟'},
+    '5m': {'multiplier': 5 * 60 * 1000, 'desc': '5分钟'},
+    '3m': {'multiplier': 3 * 60 * 1000, 'desc': '3分钟'},
+    '1m': {'multiplier': 1 * 60 * 1000, 'desc': '1分钟'},
+}
+
+
+def get_okex_time_interval_info(time_interval):
+    """
+    获取时间周期对应的毫秒数和描述
+    :param time_interval: 时间周期，如 15m、4H、1D，兼容旧的 1h、1d、1w 格式
+    :return: {'multiplier': 毫秒数, 'desc': 描述}
+    """
+    if time_interval in okex_timeframe_mapping:
+        return okex_timeframe_mapping[time_interval]
+
+    # 兼容旧的时间格式（向后兼容）
+    time_interval_int = int(time_interval[:-1])
+    if time_interval.endswith("m"):
+        time_segment = time_interval_int * 60 * 1000
+        return {'multiplier': time_segment, 'desc': f"{time_interval_int}分钟"}
+    elif time_interval.endswith("h"):
+        time_segment = time_interval_int * 60 * 60 * 1000
+        return {'multiplier': time_segment, 'desc': f"{time_interval_int}小时"}
+    elif time_interval.endswith("d"):
+        time_segment = time_interval_int * 24 * 60 * 60 * 1000
+        return {'multiplier': time_segment, 'desc': f"{time_interval_int}天"}
+    elif time_interval.endswith("w"):
+        time_segment = time_interval_int * 7 * 24 * 60 * 60 * 1000
+        return {'multiplier': time_segment, 'desc': f"{time_interval_int}周"}
+    else:
+        raise ValueError(f"不支持的时间周期: {time_interval}")
+
+
+def normalize_okex_timeframe(time_interval):
+    """
+    将时间周期规范为 okex_timeframe_mapping 中的写法，大小写不敏感（1h -> 1H、1d -> 1D）
+    :param time_interval: 时间周期，如 15m、1h、4H
+    :return: 规范后的时间周期，不支持时返回None（1M 表示月，不会当作1分钟）
+    """
+    if not isinstance(time_interval, str):
+        return None
+    time_interval = time_interval.strip()
+    if time_interval in okex_timeframe_mapping:
+        return time_interval
+    if time_interval.endswith('M'):
+        return None
+    for key in okex_timeframe_mapping:
+        if key.lower() == time_interval.lower():
+            return key
+    return None
+
+
+# ===将OKX K线接口返回的原始数据整理为DataFrame
+def okex_candles_to_dataframe(kline_data, with_confirm=False):
+    """
+    :param kline_data: OKX K线接口返回的data字段，[[ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm], ...]
+    :param with_confirm: 是否保留confirm列（True=已收盘，False=正在形成）
+    :return: 包含 candle_begin_time_GMT8、open、high、low、close、volume 的DataFrame，失败返回空DataFrame
+    """
+    # 检查数据格式是否正确
+    if len(kline_data) == 0 or len(kline_data[0]) < 6:
+        print(f"错误：K线数据格式不正确，数据行数: {len(kline_data)}")
+        return pd.DataFrame()
+
+    try:
+        # 一次性解码为定型数组，保持接口返回的顺序，由调用方排序
+        candles = decode_candles(kline_data, sort=False)
+        df = candles_to_dataframe(candles, include_confirm=with_confirm)
+    except Exception as e:
+        print(f"处理K线数据时发生错误: {e}")
+        return pd.DataFrame()
+
+    return df
+
+
 # ===获取全部历史数据
 def fetch_okex_symbol_history_candle_data(
     exchange, symbol, time_interval, max_len, max_try_amount=5
@@ -700,51 +774,18 @@ def fetch_okex_symbol_history_candle_data(
     # 获取当前时间
     now_milliseconds = int(time.time() * 1000)
 
-    # OKX时间周期映射（支持更多时间周期）
-    timeframe_mapping = {
-        '1W': {'multiplier': 7 * 24 * 60 * 60 * 1000, 'desc': '1周'},
-        '3D': {'multiplier': 3 * 24 * 60 * 60 * 1000, 'desc': '3天'},
-        '1D': {'multiplier': 24 * 60 * 60 * 1000, 'desc': '1天'},
-        '12H': {'multiplier': 12 * 60 * 60 * 1000, 'desc': '12小时'},
-        '6H': {'multiplier': 6 * 60 * 60 * 1000, 'desc': '6小时'},
-        '4H': {'multiplier': 4 * 60 * 60 * 1000, 'desc': '4小时'},
-        '2H': {'multiplier': 2 * 60 * 60 * 1000, 'desc': '2小时'},
-        '1H': {'multiplier': 1 * 60 * 60 * 1000, 'desc': '1小时'},
-        '30m': {'multiplier': 30 * 60 * 1000, 'desc': '30分钟'},
-        '15m': {'multiplier': 15 * 60 * 1000, 'desc': '15分钟'},
-        '5m': {'multiplier': 5 * 60 * 1000, 'desc': '5分钟'},
-        '3m': {'multiplier': 3 * 60 * 1000, 'desc': '3分钟'},
-        '1m': {'multiplier': 1 * 60 * 1000, 'desc': '1分钟'},
-    }
-
-    # 兼容旧的时间格式（向后兼容）
-    if time_interval not in timeframe_mapping:
-        time_interval_int = int(time_interval[:-1])
-        if time_interval.endswith("m"):
-            time_segment = time_interval_int * 60 * 1000
-            timeframe_mapping[time_interval] = {'multiplier': time_segment, 'desc': f"{time_interval_int}分钟"}
-        elif time_interval.endswith("h"):
-            time_segment = time_interval_int * 60 * 60 * 1000
-            timeframe_mapping[time_interval] = {'multiplier': time_segment, 'desc': f"{time_interval_int}小时"}
-        elif time_interval.endswith("d"):
-            time_segment = time_interval_int * 24 * 60 * 60 * 1000
-            timeframe_mapping[time_interval] = {'multiplier': time_segment, 'desc': f"{time_interval_int}天"}
-        elif time_interval.endswith("w"):
-            time_segment = time_interval_int * 7 * 24 * 60 * 60 * 1000
-            timeframe_mapping[time_interval] = {'multiplier': time_segment, 'desc': f"{time_interval_int}周"}
-        else:
-            raise ValueError(f"不支持的时间周期: {time_interval}")
+    interval_info = get_okex_time_interval_info(time_interval)
 
     # 修复时间戳计算逻辑 - 使用当前时间作为起始点
     since = now_milliseconds
     # 计算最早需要获取的时间点
-    end_time = now_milliseconds - max_len * timeframe_mapping[time_interval]['multiplier']
+    end_time = now_milliseconds - max_len * interval_info['multiplier']
 
     # 循环获取历史数据
     all_kline_data = []
     request_count = 0
 
-    print(f"开始获取{symbol} {timeframe_mapping[time_interval]['desc']}K线数据...")
+    print(f"开始获取{symbol} {interval_info['desc']}K线数据...")
 
     while True:
         request_count += 1
@@ -761,12 +802,13 @@ def fetch_okex_symbol_history_candle_data(
         # 获取K线使，要多次尝试
         for i in range(max_try_amount):
             try:
+                get_okx_limiter("candles").acquire()
                 kline_data = exchange.public_get_market_candles(params=params)["data"]
                 print(f"请求成功，获取到 {len(kline_data)} 条数据")
                 break
             except Exception as e:
                 print(f"第{i+1}次请求失败: {e}")
-                time.sleep(medium_sleep_time)
+                wait_after_error("candles", e, medium_sleep_time)
                 if i == (max_try_amount - 1):
                     _ = (
                         "【获取需要交易币种的历史数据】阶段，fetch_okex_symbol_history_candle_data函数中，"
@@ -798,51 +840,264 @@ def fetch_okex_symbol_history_candle_data(
         print("错误：没有获取到任何K线数据")
         return pd.DataFrame()
 
-    # 检查数据格式是否正确
-    if len(all_kline_data) == 0 or len(all_kline_data[0]) < 6:
-        print(f"错误：K线数据格式不正确，数据行数: {len(all_kline_data)}")
-        return pd.DataFrame()
+    df = okex_candles_to_dataframe(all_kline_data)
+    if df.empty:
+        return df
 
-    try:
-        df = pd.DataFrame(all_kline_data, dtype=float)
+    # 删除重复的数据
+    df.drop_duplicates(subset=["candle_begin_time_GMT8"], keep="last", inplace=True)
+    df.reset_index(drop=True, inplace=True)
 
-        # 检查DataFrame是否有足够的列
-        if df.shape[1] < 6:
-            print(f"错误：K线数据列数不足，期望6列，实际{df.shape[1]}列")
-            return pd.DataFrame()
+    # 为了保险起见，去掉最后一行最新的数据
+    df = df[:-1]
 
-        df.rename(
-            columns={0: "MTS", 1: "open", 2: "high", 3: "low", 4: "close", 5: "volume"},
-            inplace=True,
-        )
+    print(symbol, "获取历史数据行数：", len(df), ",", datetime.now())
 
-        # 检查重命名后的列是否存在
-        if "MTS" not in df.columns:
-            print("错误：重命名后缺少MTS列")
-            print(f"可用列: {list(df.columns)}")
-            return pd.DataFrame()
-
-        df["candle_begin_time"] = pd.to_datetime(df["MTS"], unit="ms")
-        # 使用UTC时区，然后转换为北京时间
-        df["candle_begin_time"] = df["candle_begin_time"].dt.tz_localize('UTC')
-        df["candle_begin_time_GMT8"] = df["candle_begin_time"].dt.tz_convert('Asia/Shanghai')
-        df = df[["candle_begin_time_GMT8", "open", "high", "low", "close", "volume"]]
-    except Exception as e:
-        print(f"处理K线数据时发生错误: {e}")
+    return df
+
+
+# ===获取单个分片的历史K线，供并发回补使用
+def _fetch_okex_history_candle_page(
+    exchange, symbol, time_interval, after, limit, bucket, max_try_amount=5, deadline=None
+):
+    """
+    使用okx的history-candles接口获取after时间点之前的limit根K线
+    :param exchange:
+    :param symbol:
+    :param time_interval:
+    :param after: 分片结束时间（毫秒时间戳），只返回早于该时间的K线
+    :param limit:
+    :param bucket: 令牌桶限速器，所有分片共享
+    :param max_try_amount:
+    :param deadline: 截止时间（time.time()秒），失败后等待重试会超过截止时间时直接抛出TimeoutError
+    :return: 接口返回的原始K线数据
+    """
+    params = {
+        "instId": symbol,
+        "bar": time_interval,
+        "after": str(after),
+        "limit": str(limit),
+    }
+    for i in range(max_try_amount):
+        bucket.acquire()
+        try:
+            return exchange.public_get_market_history_candles(params=params)["data"]
+        except Exception as e:
+            print(f"{symbol} 分片{datetime.fromtimestamp(after/1000)} 第{i+1}次请求失败: {e}")
+            if deadline is not None and time.time() + medium_sleep_time >= deadline:
+                raise TimeoutError(f"{symbol} 回补K线分片超过截止时间，放弃本次请求") from e
+            wait_after_error("history-candles", e, medium_sleep_time)
+
+    _ = (
+        "【回补历史数据】阶段，fetch_okex_symbol_history_candle_data_concurrent函数中，"
+        "获取K线分片失败次数过多，程序Raise Error"
+    )
+    send_dingding_and_raise_error(_)
+
+
+# ===按时间分片并发回补历史数据
+def fetch_okex_symbol_history_candle_data_concurrent(
+    exchange,
+    symbol,
+    time_interval,
+    max_len,
+    end_milliseconds=None,
+    max_workers=8,
+    max_requests_per_second=None,
+    max_try_amount=5,
+    deadline=None,
+):
+    """
+    按时间分片并发获取历史K线，用于冷启动时回补大量历史数据，没有请求次数上限。
+    :param exchange:
+    :param symbol:
+    :param time_interval:
+    :param max_len: 需要获取的K线根数
+    :param end_milliseconds: 回补截止时间（毫秒时间戳），默认为当前时间
+    :param max_workers: 最大并发请求数
+    :param max_requests_per_second: 每秒最多请求次数，默认与其他调用方共享history-candles接口的限频（20次/2s）
+    :param max_try_amount:
+    :param deadline: 截止时间（time.time()秒），任一分片失败后等待重试会超过截止时间时抛出TimeoutError
+    :return: 按时间升序排列并去重的DataFrame，不包含尚未收盘的K线
+
+    函数核心逻辑：
+    1.将[截止时间 - max_len根K线, 截止时间)按每100根K线切分为多个时间分片
+    2.以每个分片的结束时间作为after参数，在限速范围内并发请求history-candles接口
+    3.合并所有分片，去重、排序，并去掉尚未收盘的K线
+    """
+    interval_info = get_okex_time_interval_info(time_interval)
+    interval_ms = interval_info['multiplier']
+
+    now_milliseconds = int(time.time() * 1000)
+    if end_milliseconds is None:
+        end_milliseconds = now_milliseconds
+    start_milliseconds = end_milliseconds - max_len * interval_ms
+
+    # 切分时间分片，每个分片对应一次请求
+    page_size = 100
+    page_count = math.ceil(max_len / page_size)
+    page_ends = [end_milliseconds - i * page_size * interval_ms for i in range(page_count)]
+
+    print(
+        f"开始并发回补{symbol} {interval_info['desc']}K线数据，"
+        f"共{page_count}个分片，并发数{max_workers}..."
+    )
+
+    if max_requests_per_second is None:
+        bucket = get_okx_limiter("history-candles")
+    else:
+        bucket = TokenBucket(max_requests_per_second)
+    all_kline_data = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _fetch_okex_history_candle_page,
+                exchange, symbol, time_interval, after, page_size, bucket, max_try_amount, deadline,
+            )
+            for after in page_ends
+        ]
+        try:
+            for future in futures:
+                all_kline_data += future.result()
+        except Exception:
+            # 任一分片失败，取消尚未开始的分片
+            for future in futures:
+                future.cancel()
+            raise
+
+    # 只保留目标时间范围内、已经收盘的K线
+    all_kline_data = [
+        row for row in all_kline_data
+        if start_milliseconds <= int(row[0]) < end_milliseconds
+        and int(row[0]) + interval_ms <= now_milliseconds
+    ]
+    if not all_kline_data:
+        print("错误：没有获取到任何K线数据")
         return pd.DataFrame()
 
-    # 删除重复的数据
+    df = okex_candles_to_dataframe(all_kline_data)
+    if df.empty:
+        return df
+
+    # 拼接分片：去重、排序
     df.drop_duplicates(subset=["candle_begin_time_GMT8"], keep="last", inplace=True)
+    df.sort_values(by="candle_begin_time_GMT8", ascending=True, inplace=True)
+    df = df.iloc[-max_len:]
     df.reset_index(drop=True, inplace=True)
 
-    # 为了保险起见，去掉最后一行最新的数据
-    df = df[:-1]
+    print(symbol, "并发回补历史数据行数：", len(df), ",", datetime.now())
+
+    return df
 
-    print(symbol, "获取历史数据行数：", len(df), ",", datetime.now())
 
+# ===增量获取某个时间点之后的K线
+def fetch_okex_candle_data_since(
+    exchange, symbol, time_interval, since_milliseconds, limit=100, max_try_amount=5, deadline=None
+):
+    """
+    只获取since_milliseconds之后的K线（不含该时间点），用于增量刷新缓存。
+    :param exchange:
+    :param symbol:
+    :param time_interval:
+    :param since_milliseconds: 缓存中最后一根已收盘K线的开始时间（毫秒时间戳）
+    :param limit: 单次请求K线数量
+    :param max_try_amount:
+    :param deadline: 截止时间（time.time()秒），失败后等待重试会超过截止时间时不再重试，直接抛出TimeoutError
+    :return: 按时间升序的DataFrame，带confirm列，最后一根可能是正在形成的K线
+
+    当缺失的K线超过单次请求上限时，改用并发回补获取中间缺失的已收盘K线，同样受截止时间限制。
+    """
+    params = {
+        "instId": symbol,
+        "bar": time_interval,
+        "before": str(since_milliseconds),
+        "limit": str(limit),
+    }
+
+    kline_data = []
+    for i in range(max_try_amount):
+        try:
+            get_okx_limiter("candles").acquire()
+            kline_data = exchange.public_get_market_candles(params=params)["data"]
+            break
+        except Exception as e:
+            print(f"{symbol} 增量获取K线第{i+1}次请求失败: {e}")
+            if deadline is not None and time.time() + medium_sleep_time >= deadline:
+                raise TimeoutError(f"{symbol} 增量获取K线超过截止时间，放弃本次请求") from e
+            wait_after_error("candles", e, medium_sleep_time)
+            if i == (max_try_amount - 1):
+                _ = "增量获取K线数据，失败次数过多，程序Raise Error"
+                send_dingding_and_raise_error(_)
+
+    if not kline_data:
+        return pd.DataFrame()
+
+    if len(kline_data) >= limit:
+        # 缺失的K线超过单次请求上限，并发回补[since, now)之间的已收盘K线
+        interval_ms = get_okex_time_interval_info(time_interval)['multiplier']
+        missing = math.ceil((int(time.time() * 1000) - since_milliseconds) / interval_ms)
+        print(f"{symbol} 增量K线超过{limit}根，改用并发回补{missing}根")
+        df = fetch_okex_symbol_history_candle_data_concurrent(
+            exchange, symbol, time_interval, missing, deadline=deadline
+        )
+        if not df.empty:
+            df["confirm"] = True
+            df = df[df["candle_begin_time_GMT8"] > pd.to_datetime(since_milliseconds, unit="ms", utc=True)]
+        return df.reset_index(drop=True)
+
+    df = okex_candles_to_dataframe(kline_data, with_confirm=True)
+    if df.empty:
+        return df
+
+    # 接口返回时间倒序，整理为升序
+    df.sort_values(by="candle_begin_time_GMT8", ascending=True, inplace=True)
+    df.reset_index(drop=True, inplace=True)
     return df
 
 
+# ===合并并发的K线请求：同一 (symbol, 周期) 同时只请求一次上游，数量更多的结果供较少的请求截取，结果缓存几秒
+candle_flight = SingleFlight(ttl=5)
+
+
+def _latest_rows(df, n):
+    """
+    保留最新的n根K线（保持原有顺序），共享的结果数量多于请求时截取
+    :return: DataFrame副本
+    """
+    if len(df) <= n:
+        return df.copy()
+    newest = df["candle_begin_time_GMT8"].nlargest(n).index
+    return df.loc[df.index.isin(newest)].reset_index(drop=True)
+
+
+def fetch_okex_symbol_history_candle_data_shared(exchange, symbol, time_interval, max_len):
+    """
+    fetch_okex_symbol_history_candle_data 的合并版本，供Web接口和监测引擎使用
+    :return: 各调用方各自的DataFrame副本，可以放心修改
+    """
+    df = candle_flight.do(
+        ("history", symbol, time_interval),
+        lambda: fetch_okex_symbol_history_candle_data(exchange, symbol, time_interval, max_len),
+        cache_if=lambda result: not result.empty,
+        size=max_len,
+    )
+    return _latest_rows(df, max_len)
+
+
+def ccxt_fetch_candle_data_shared(exchange, symbol, time_interval, limit):
+    """
+    ccxt_fetch_candle_data 的合并版本
+    :return: 各调用方各自的DataFrame副本，可以放心修改
+    """
+    df = candle_flight.do(
+        ("latest", symbol, time_interval),
+        lambda: ccxt_fetch_candle_data(exchange, symbol, time_interval, limit),
+        cache_if=lambda result: not result.empty,
+        size=int(limit),
+    )
+    return _latest_rows(df, int(limit))
+
+
 # ===依据时间间隔, 自动计算并休眠到指定时间
 def sleep_until_run_time(time_interval, ahead_time=1):
     """
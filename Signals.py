@@ -189,3 +189,104 @@ def real_signal_trendline(df, para):
         signal = -1
 
     return signal
+
+
+def locate_trendlines(times, start_times, start_prices, end_times, end_prices):
+    """
+    批量将趋势线的两个端点定位到K线序号，与 define_trendline 的计算方式一致
+
+    参数:
+        times: K线开始时间数组（升序，不重复），如毫秒时间戳
+        start_times, end_times: 各趋势线起点、终点时间数组，与 times 单位相同
+        start_prices, end_prices: 各趋势线起点、终点价格数组
+    返回:
+        (start_idx, slope, valid)
+        趋势线在第 i 根K线的值为 start_price + slope * (i - start_idx)，只在起点右侧有值；
+        valid为False表示端点不在K线中或两端点为同一根K线（define_trendline 会报错的情况）
+    """
+    times = np.asarray(times)
+    start_times = np.asarray(start_times)
+    end_times = np.asarray(end_times)
+    n = len(times)
+
+    start_idx = np.searchsorted(times, start_times)
+    end_idx = np.searchsorted(times, end_times)
+    valid = (start_idx < n) & (end_idx < n)
+    valid &= times[np.minimum(start_idx, n - 1)] == start_times
+    valid &= times[np.minimum(end_idx, n - 1)] == end_times
+    valid &= start_idx != end_idx
+
+    span = np.where(valid, end_idx - start_idx, 1)
+    slope = (np.asarray(end_prices, dtype=float) - np.asarray(start_prices, dtype=float)) / span
+    return start_idx, slope, valid
+
+
+def batch_monitor_breakout(close, start_idx, start_prices, slope, valid=None):
+    """
+    批量监控突破情况：一次计算所有趋势线在最后两根K线上的值，判断规则与 monitor_breakout 一致
+
+    参数:
+        close: 收盘价数组（至少两根）
+        start_idx, start_prices, slope: 各趋势线的起点序号、起点价格、每根K线的斜率（见 locate_trendlines）
+        valid: 有效的趋势线，无效的趋势线不产生信号
+    返回:
+        (breakout, current_values)
+        breakout: 突破信号数组(1=向上突破, -1=向下跌破, 0=无突破)
+        current_values: 各趋势线在最后一根K线上的值，起点在最后一根之后时为NaN
+    """
+    close = np.asarray(close, dtype=float)
+    start_idx = np.asarray(start_idx)
+    start_prices = np.asarray(start_prices, dtype=float)
+    n = len(close)
+    prev_close, current_close = close[-2], close[-1]
+
+    # 只在起点右侧延伸，起点之前为NaN，NaN参与比较结果为False
+    prev_trend = np.where(n - 2 >= start_idx, start_prices + slope * (n - 2 - start_idx), np.nan)
+    current_trend = np.where(n - 1 >= start_idx, start_prices + slope * (n - 1 - start_idx), np.nan)
+
+    up = (prev_close < prev_trend) & (current_close >= current_trend)
+    down = (prev_close > prev_trend) & (current_close <= current_trend)
+    breakout = np.where(up, 1, np.where(down, -1, 0)).astype(np.int8)
+    if valid is not None:
+        breakout[~np.asarray(valid)] = 0
+    return breakout, current_trend
+
+
+# 基准测试：同一交易对10000条趋势线，逐条计算与批量计算的耗时
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    n_bars, n_lines = 1000, 10000
+    times = pd.date_range("2025-01-01", periods=n_bars, freq="15min", tz="Asia/Shanghai")
+    close = 100 + rng.standard_normal(n_bars).cumsum()
+    df = pd.DataFrame({"candle_begin_time_GMT8": times, "close": close})
+
+    start_pos = rng.integers(0, n_bars - 2, n_lines)
+    end_pos = np.minimum(start_pos + rng.integers(1, 200, n_lines), n_bars - 1)
+    start_prices = close[start_pos] + rng.normal(0, 1, n_lines)
+    end_prices = close[end_pos] + rng.normal(0, 1, n_lines)
+    times_ms = times.as_unit("ms").asi8
+
+    sample = 300
+    begin = time.perf_counter()
+    expected = []
+    for i in range(sample):
+        trendline = define_trendline(
+            df,
+            [times[start_pos[i]].strftime("%Y-%m-%d %H:%M:%S"), start_prices[i]],
+            [times[end_pos[i]].strftime("%Y-%m-%d %H:%M:%S"), end_prices[i]],
+        )
+        expected.append(monitor_breakout(df, trendline) or 0)
+    loop_cost = (time.perf_counter() - begin) / sample * n_lines
+
+    begin = time.perf_counter()
+    start_idx, slope, valid = locate_trendlines(
+        times_ms, times_ms[start_pos], start_prices, times_ms[end_pos], end_prices
+    )
+    breakout, _ = batch_monitor_breakout(close, start_idx, start_prices, slope, valid)
+    batch_cost = time.perf_counter() - begin
+
+    assert breakout[:sample].tolist() == expected
+    print(f"{n_lines} 条趋势线: 逐条计算约 {loop_cost * 1000:.0f} 毫秒，批量计算 {batch_cost * 1000:.2f} 毫秒，"
+          f"突破 {int(np.count_nonzero(breakout))} 条")
@@ -1,17 +1,23 @@
 """
 趋势线管理系统 - 趋势线配置管理模块
 复用现有的K线数据和趋势线计算逻辑
-使用CSV文件存储数据
+趋势线存储在SQLite数据库中并常驻内存，监测日志按月分区只追加写入
 """
 
 import json
 import uuid
+import weakref
 from datetime import datetime
 from typing import List, Dict, Optional, Any
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-from Signals import define_trendline, monitor_breakout
+import numpy as np
+from Function import normalize_okex_timeframe
+from Signals import batch_monitor_breakout, define_trendline, locate_trendlines, monitor_breakout
+from trendline_geometry import TrendlineGeometry, batch_breakout, geometry_arrays
+from trendline_registry import EVENT_DELETE, get_trendline_registry
+from breakout_log import BreakoutLog
 
 
 class TrendlineManager:
@@ -20,8 +26,11 @@ class TrendlineManager:
     def __init__(self, data_dir: str = "data"):
         """初始化数据目录"""
         self.data_dir = data_dir
-        self.trendlines_file = f"{data_dir}/trendlines.csv"
-        self.logs_file = f"{data_dir}/monitor_logs.csv"
+        self.trendlines_file = f"{data_dir}/trendlines.csv"  # 旧版CSV，仅用于迁移
+        self.db_file = f"{data_dir}/trendlines.db"
+        self.logs_file = f"{data_dir}/monitor_logs.csv"  # 旧版CSV，仅用于迁移
+        self.logs_dir = f"{data_dir}/monitor_logs"
+        self._endpoint_cache = {}  # {趋势线id: (updated_at, 起点毫秒时间戳, 终点毫秒时间戳)}，批量检查时复用
         self.init_data_files()
 
     def init_data_files(self):
@@ -29,58 +38,45 @@ class TrendlineManager:
         import os
         os.makedirs(self.data_dir, exist_ok=True)
 
-        # 初始化趋势线文件
-        if not os.path.exists(self.trendlines_file):
-            trendlines_df = pd.DataFrame(columns=[
-                'id', 'name', 'symbol', 'start_time', 'start_price',
-                'end_time', 'end_price', 'direction', 'status',
-                'created_at', 'updated_at'
-            ])
-            trendlines_df.to_csv(self.trendlines_file, index=False)
-
-        # 初始化日志文件
-        if not os.path.exists(self.logs_file):
-            logs_df = pd.DataFrame(columns=[
-                'id', 'trendline_id', 'signal_type', 'price',
-                'trendline_value', 'detected_at'
-            ])
-            logs_df.to_csv(self.logs_file, index=False)
-
-    def _load_trendlines(self) -> pd.DataFrame:
-        """加载趋势线数据"""
-        try:
-            df = pd.read_csv(self.trendlines_file)
-            return df.copy()  # 加载所有记录，不过滤
-        except:
-            return pd.DataFrame(columns=[
-                'id', 'name', 'symbol', 'start_time', 'start_price',
-                'end_time', 'end_price', 'direction', 'status',
-                'created_at', 'updated_at'
-            ])
-
-    def _save_trendlines(self, df: pd.DataFrame):
-        """保存趋势线数据"""
-        df.to_csv(self.trendlines_file, index=False)
-
-    def _load_logs(self) -> pd.DataFrame:
-        """加载日志数据"""
-        try:
-            return pd.read_csv(self.logs_file)
-        except:
-            return pd.DataFrame(columns=[
-                'id', 'trendline_id', 'signal_type', 'price',
-                'trendline_value', 'detected_at'
-            ])
-
-    def _save_logs(self, df: pd.DataFrame):
-        """保存日志数据"""
-        df.to_csv(self.logs_file, index=False)
+        # 初始化趋势线数据库及进程内注册表，首次使用时从旧的CSV文件迁移
+        self.registry = get_trendline_registry(self.db_file)
+        if self.registry.count() == 0 and os.path.exists(self.trendlines_file):
+            self.registry.migrate_from_csv(self.trendlines_file)
+        self._unsubscribe = self._subscribe_registry()
+
+        # 初始化监测日志，首次使用时从旧的CSV文件迁移
+        self.breakout_log = BreakoutLog(self.logs_dir)
+        self.breakout_log.migrate_from_csv(self.logs_file)
+
+    def _subscribe_registry(self):
+        """
+        订阅注册表的变更事件；注册表是进程内共享的，回调只持有管理器的弱引用，
+        管理器被回收后回调在下一次事件时自行取消订阅
+        """
+        manager_ref = weakref.ref(self)
+        unsubscribe = None
+
+        def listener(event: str, trendline: Dict):
+            manager = manager_ref()
+            if manager is not None:
+                manager._on_trendline_event(event, trendline)
+            elif unsubscribe is not None:
+                unsubscribe()
+
+        unsubscribe = self.registry.subscribe(listener)
+        return unsubscribe
+
+    def close(self):
+        """取消订阅注册表的变更事件，不再使用的管理器应调用"""
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
 
     def create_trendline(self, name: str, symbol: str, start_point: List,
                         end_point: List, direction: int, price_info: str = None,
                         candle_data: Dict = None, end_price_info: str = None,
-                        end_candle_data: Dict = None) -> str:
-        """创建新的趋势线配置"""
+                        end_candle_data: Dict = None, timeframe: str = None) -> str:
+        """创建新的趋势线配置，timeframe为画线所用的K线周期（为空时按监测的默认周期检查）"""
         trendline_id = str(uuid.uuid4())
         now = datetime.now().isoformat()
 
@@ -98,7 +94,8 @@ class TrendlineManager:
             'direction': direction,
             'status': 'active',
             'created_at': now,
-            'updated_at': now
+            'updated_at': now,
+            'timeframe': timeframe
         }
 
         # 添加价格信息（如果提供）
@@ -111,66 +108,34 @@ class TrendlineManager:
         if end_candle_data:
             new_trendline['end_candle_data'] = json.dumps(end_candle_data) if not isinstance(end_candle_data, str) else end_candle_data
 
-        # 加载现有数据
-        df = self._load_trendlines()
-
-        # 添加新趋势线
-        new_row = pd.DataFrame([new_trendline])
-        df = pd.concat([df, new_row], ignore_index=True)
-
-        # 保存数据
-        self._save_trendlines(df)
+        # 插入新趋势线
+        self.registry.insert(new_trendline)
 
         return trendline_id
 
     def get_trendline(self, trendline_id: str) -> Optional[Dict]:
         """获取单个趋势线配置"""
-        df = self._load_trendlines()
-        row = df[df['id'] == trendline_id]
+        trendline = self.registry.get(trendline_id)
 
-        if not row.empty and row.iloc[0]['status'] != 'deleted':
-            return row.iloc[0].to_dict()
+        if trendline and trendline['status'] != 'deleted':
+            return trendline
         return None
 
     def get_all_trendlines(self, symbol: Optional[str] = None) -> List[Dict]:
         """获取所有趋势线配置"""
-        df = self._load_trendlines()
-        df = df[df['status'] != 'deleted']  # 只过滤已删除的记录
-
-        if symbol:
-            df = df[df['symbol'] == symbol]
-
-        return df.to_dict('records')
+        # 只过滤已删除的记录
+        return self.registry.query(symbol=symbol, exclude_status='deleted')
 
     def update_trendline(self, trendline_id: str, **kwargs) -> bool:
         """更新趋势线配置"""
         if not kwargs:
             return False
 
-        df = self._load_trendlines()
-
-        # 查找要更新的行
-        mask = df['id'] == trendline_id
-        if not mask.any():
-            return False
-
-        # 更新字段
-        for key, value in kwargs.items():
-            if key in df.columns:
-                # 确保数据类型兼容
-                if key in ['start_price', 'end_price'] and isinstance(value, str):
-                    # 价格字段确保为float类型
-                    df.loc[mask, key] = float(value)
-                else:
-                    df.loc[mask, key] = value
-
-        # 更新修改时间
-        df.loc[mask, 'updated_at'] = datetime.now().isoformat()
-
-        # 保存数据
-        self._save_trendlines(df)
+        # 只更新该行的字段（未知字段忽略），同时更新修改时间
+        fields = dict(kwargs)
+        fields['updated_at'] = datetime.now().isoformat()
 
-        return True
+        return self.registry.update(trendline_id, fields)
 
     def delete_trendline(self, trendline_id: str) -> bool:
         """删除趋势线（软删除）"""
@@ -178,40 +143,44 @@ class TrendlineManager:
 
     def get_active_trendlines(self, symbol: Optional[str] = None) -> List[Dict]:
         """获取活跃的趋势线配置"""
-        df = self._load_trendlines()
-        df = df[df['status'] == 'active']
+        return self.registry.query(symbol=symbol, status='active')
 
-        if symbol:
-            df = df[df['symbol'] == symbol]
+    def calculate_trendline_values(self, trendline_id: str, df: pd.DataFrame,
+                                   step_ms: Optional[int] = None) -> pd.Series:
+        """
+        计算趋势线值
 
-        return df.to_dict('records')
-
-    def calculate_trendline_values(self, trendline_id: str, df: pd.DataFrame) -> pd.Series:
-        """计算趋势线值（复用Signals.define_trendline）"""
+        :param step_ms: K线周期（毫秒），指定时按时间轴计算，端点不需要在 df 中；
+                        为None时复用Signals.define_trendline
+        """
         trendline = self.get_trendline(trendline_id)
         if not trendline:
             raise ValueError(f"趋势线不存在: {trendline_id}")
 
+        if step_ms:
+            return TrendlineGeometry.from_trendline(trendline, step_ms).series(df)
+
         start_point = [trendline['start_time'], trendline['start_price']]
         end_point = [trendline['end_time'], trendline['end_price']]
 
         return define_trendline(df, start_point, end_point)
 
-    def check_breakout_signal(self, trendline_id: str, df: pd.DataFrame) -> Optional[int]:
-        """检查突破信号（复用Signals.monitor_breakout）"""
+    def check_breakout_signal(self, trendline_id: str, df: pd.DataFrame,
+                              step_ms: Optional[int] = None) -> Optional[int]:
+        """检查突破信号（复用Signals.monitor_breakout），step_ms 见 calculate_trendline_values"""
         trendline = self.get_trendline(trendline_id)
         if not trendline or trendline['status'] != 'active':
             return None
 
         # 计算趋势线值
-        trendline_values = self.calculate_trendline_values(trendline_id, df)
+        trendline_values = self.calculate_trendline_values(trendline_id, df, step_ms)
 
         # 检查突破信号
         breakout = monitor_breakout(df, trendline_values)
 
         # 如果检测到突破，记录日志
         if breakout is not None and breakout != 0:
-            self._log_breakout(trendline_id, breakout, df)
+            self._log_breakout(trendline_id, breakout, df, step_ms)
 
         # 只返回符合方向的信号
         if trendline['direction'] == 1 and breakout == 1:
@@ -221,15 +190,99 @@ class TrendlineManager:
 
         return None
 
-    def manual_check_breakout(self, trendline_id: str, df: pd.DataFrame) -> Dict:
-        """手动检查突破信号并返回详细信息"""
+    @staticmethod
+    def _to_utc_ms(values: List) -> np.ndarray:
+        """北京时间字符串批量转换为UTC毫秒时间戳，无法解析的为-1"""
+        try:
+            times = pd.Series(pd.to_datetime(values, errors='coerce', format='mixed'))
+        except (TypeError, ValueError):
+            # 带时区与不带时区的时间混在一起时逐个转换
+            return np.concatenate([TrendlineManager._to_utc_ms([v]) for v in values]) if len(values) > 1 \
+                else np.array([-1], dtype=np.int64)
+        if times.dt.tz is None:
+            times = times.dt.tz_localize('Asia/Shanghai')
+        times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+        return np.where(times.isna(), -1, times.values.astype('datetime64[ms]').astype(np.int64))
+
+    def _endpoint_times(self, trendlines: List[Dict]):
+        """趋势线端点时间转换为UTC毫秒时间戳，按 updated_at 缓存，只转换新增或修改过的趋势线"""
+        entries, stale = {}, []
+        for trendline in trendlines:
+            entry = self._endpoint_cache.get(trendline['id'])
+            if entry is None or entry[0] != trendline['updated_at']:
+                stale.append(trendline)
+            else:
+                entries[trendline['id']] = entry
+        if stale:
+            converted = self._to_utc_ms([t['start_time'] for t in stale] + [t['end_time'] for t in stale])
+            for k, trendline in enumerate(stale):
+                entry = (trendline['updated_at'], int(converted[k]), int(converted[len(stale) + k]))
+                self._endpoint_cache[trendline['id']] = entries[trendline['id']] = entry
+        endpoints = np.array([entries[t['id']][1:] for t in trendlines], dtype=np.int64)
+        return endpoints[:, 0], endpoints[:, 1]
+
+    def _on_trendline_event(self, event: str, trendline: Dict):
+        """趋势线删除后清除其端点缓存"""
+        if event == EVENT_DELETE:
+            self._endpoint_cache.pop(trendline['id'], None)
+
+    @staticmethod
+    def _to_numeric(trendlines: List[Dict], key: str) -> np.ndarray:
+        """批量转换数值字段，无法解析的为NaN"""
+        return pd.to_numeric(pd.Series([t[key] for t in trendlines], dtype=object), errors='coerce').to_numpy(dtype=float)
+
+    def check_breakout_signals(self, trendlines: List[Dict], times_ms: np.ndarray,
+                               close: np.ndarray, step_ms: Optional[int] = None) -> Dict[str, int]:
+        """
+        批量检查同一 (symbol, 周期) 上多条趋势线的突破信号，结果与逐条调用 check_breakout_signal 一致
+
+        :param trendlines: 活跃趋势线
+        :param times_ms: 已收盘K线的UTC毫秒时间戳（升序）
+        :param close: 对应的收盘价
+        :param step_ms: K线周期（毫秒），指定时按时间轴计算，端点滚出窗口的趋势线仍然有效；
+                        为None时按K线序号定位端点，端点必须在 times_ms 中
+        :return: {趋势线id: 信号}，只包含与趋势线方向一致的信号
+        """
+        if not trendlines or len(close) < 2:
+            return {}
+
+        start_ms, end_ms = self._endpoint_times(trendlines)
+        # 价格或方向无法解析的趋势线不产生信号，不影响同一序列上的其他趋势线
+        start_prices = self._to_numeric(trendlines, 'start_price')
+        end_prices = self._to_numeric(trendlines, 'end_price')
+        directions = self._to_numeric(trendlines, 'direction')
+        numeric = np.isfinite(start_prices) & np.isfinite(end_prices) & np.isfinite(directions)
+        directions = np.where(numeric, directions, 0).astype(int)
+
+        if step_ms:
+            slope, valid = geometry_arrays(start_ms, start_prices, end_ms, end_prices, step_ms)
+            breakout, current_values = batch_breakout(
+                times_ms, close, start_ms, start_prices, slope, step_ms, valid & numeric
+            )
+        else:
+            start_idx, slope, valid = locate_trendlines(times_ms, start_ms, start_prices, end_ms, end_prices)
+            breakout, current_values = batch_monitor_breakout(close, start_idx, start_prices, slope, valid & numeric)
+
+        signals = {}
+        current_price = float(close[-1])
+        for i in np.flatnonzero(breakout):
+            trendline_id = trendlines[i]['id']
+            # 记录所有突破，只返回符合方向的信号
+            self._append_breakout_log(trendline_id, int(breakout[i]), current_price, float(current_values[i]))
+            if breakout[i] == directions[i]:
+                signals[trendline_id] = int(breakout[i])
+        return signals
+
+    def manual_check_breakout(self, trendline_id: str, df: pd.DataFrame,
+                              step_ms: Optional[int] = None) -> Dict:
+        """手动检查突破信号并返回详细信息，step_ms 见 calculate_trendline_values"""
         trendline = self.get_trendline(trendline_id)
         if not trendline or trendline['status'] != 'active':
             return {'has_signal': False, 'message': '趋势线不存在或未激活'}
 
         try:
             # 计算趋势线值
-            trendline_values = self.calculate_trendline_values(trendline_id, df)
+            trendline_values = self.calculate_trendline_values(trendline_id, df, step_ms)
 
             # 检查突破信号
             breakout = monitor_breakout(df, trendline_values)
@@ -248,7 +301,7 @@ class TrendlineManager:
 
             if breakout is not None and breakout != 0:
                 # 如果检测到突破，记录日志
-                self._log_breakout(trendline_id, breakout, df)
+                self._log_breakout(trendline_id, breakout, df, step_ms)
 
                 result['has_signal'] = True
                 result['breakout_type'] = 'breakout' if breakout == 1 else 'breakdown'
@@ -270,15 +323,19 @@ class TrendlineManager:
         except Exception as e:
             return {'has_signal': False, 'message': f'检查失败: {str(e)}'}
 
-    def _log_breakout(self, trendline_id: str, signal_type: int, df: pd.DataFrame):
+    def _log_breakout(self, trendline_id: str, signal_type: int, df: pd.DataFrame,
+                      step_ms: Optional[int] = None):
         """记录突破日志"""
-        log_id = str(uuid.uuid4())
-        detected_at = datetime.now().isoformat()
-
         # 获取最新价格和趋势线值
         current_price = df['close'].iloc[-1]
-        trendline_values = self.calculate_trendline_values(trendline_id, df)
+        trendline_values = self.calculate_trendline_values(trendline_id, df, step_ms)
         trendline_value = trendline_values.iloc[-1]
+        self._append_breakout_log(trendline_id, signal_type, current_price, trendline_value)
+
+    def _append_breakout_log(self, trendline_id: str, signal_type: int, current_price, trendline_value):
+        """追加一条突破日志"""
+        log_id = str(uuid.uuid4())
+        detected_at = datetime.now().isoformat()
 
         signal_name = 'breakout' if signal_type == 1 else 'breakdown'
 
@@ -291,58 +348,94 @@ class TrendlineManager:
             'detected_at': detected_at
         }
 
-        # 加载现有日志
-        logs_df = self._load_logs()
-
-        # 添加新日志
-        if logs_df.empty:
-            logs_df = pd.DataFrame([new_log])
-        else:
-            new_row = pd.DataFrame([new_log])
-            logs_df = pd.concat([logs_df, new_row], ignore_index=True)
-
-        # 保存日志
-        self._save_logs(logs_df)
+        # 只追加一行
+        self.breakout_log.append(new_log)
 
     def get_monitor_logs(self, trendline_id: Optional[str] = None,
-                        limit: int = 100) -> List[Dict]:
-        """获取监测日志"""
-        logs_df = self._load_logs()
-
-        if trendline_id:
-            logs_df = logs_df[logs_df['trendline_id'] == trendline_id]
-
-        # 按时间倒序排列并限制数量
-        logs_df = logs_df.sort_values('detected_at', ascending=False).head(limit)
+                        limit: int = 100, before: Optional[str] = None) -> List[Dict]:
+        """获取监测日志（按时间倒序，before为上一页最后一条日志的cursor）"""
+        logs, _ = self.breakout_log.query(trendline_id, limit, before)
+        return logs
 
-        return logs_df.to_dict('records')
+    def iter_export_lines(self):
+        """逐行生成导出内容（NDJSON，每行一个趋势线配置），不拼接整个文件"""
+        for trendline in self.get_all_trendlines():
+            yield json.dumps(trendline, ensure_ascii=False) + '\n'
 
     def export_trendlines(self, file_path: str):
-        """导出趋势线配置到JSON文件"""
-        trendlines = self.get_all_trendlines()
+        """导出趋势线配置到文件（.ndjson/.jsonl 为每行一个配置，其他为JSON数组）"""
         with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(trendlines, f, ensure_ascii=False, indent=2)
+            if file_path.endswith(('.ndjson', '.jsonl')):
+                f.writelines(self.iter_export_lines())
+                return
+            json.dump(self.get_all_trendlines(), f, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def _prepare_import(trendline: Dict, now: str) -> Optional[Dict]:
+        """补全导入的趋势线配置，缺少必要字段、价格/方向/时间无法解析或时间周期不支持时返回None"""
+        required = ('name', 'symbol', 'start_time', 'start_price', 'end_time', 'end_price', 'direction')
+        if not isinstance(trendline, dict) or any(trendline.get(k) is None for k in required):
+            return None
+
+        record = dict(trendline)
+        try:
+            record['start_price'] = float(record['start_price'])
+            record['end_price'] = float(record['end_price'])
+            record['direction'] = int(record['direction'])
+            pd.Timestamp(record['start_time'])
+            pd.Timestamp(record['end_time'])
+        except (TypeError, ValueError, OverflowError):
+            return None
+        if not (np.isfinite(record['start_price']) and np.isfinite(record['end_price'])):
+            return None
+        if record.get('timeframe'):
+            record['timeframe'] = normalize_okex_timeframe(record['timeframe'])
+            if record['timeframe'] is None:
+                return None
+        else:
+            record['timeframe'] = None
+
+        record['id'] = record.get('id') or str(uuid.uuid4())
+        record['status'] = record.get('status') or 'active'
+        record['created_at'] = record.get('created_at') or now
+        record['updated_at'] = record.get('updated_at') or now
+        for key in ('candle_data', 'end_candle_data'):
+            if isinstance(record.get(key), (dict, list)):
+                record[key] = json.dumps(record[key])
+        return record
+
+    def import_trendlines_stream(self, lines) -> Dict[str, int]:
+        """从NDJSON行（文件对象、上传流等）批量导入趋势线配置，保留原有id，已存在或重复的id跳过，一次写入"""
+        now = datetime.now().isoformat()
+        records, total = [], 0
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            line = line.strip()
+            if not line:
+                continue
+            total += 1
+            try:
+                record = self._prepare_import(json.loads(line), now)
+            except ValueError:
+                record = None
+            if record is not None:
+                records.append(record)
+
+        imported = self.registry.insert_many(records)
+        return {'imported': imported, 'skipped': total - imported}
 
     def import_trendlines(self, file_path: str) -> int:
-        """从JSON文件导入趋势线配置"""
+        """从文件导入趋势线配置（JSON数组或NDJSON），返回导入数量"""
         with open(file_path, 'r', encoding='utf-8') as f:
-            trendlines = json.load(f)
-
-        imported_count = 0
-        for trendline in trendlines:
-            # 检查是否已存在
-            existing = self.get_trendline(trendline['id'])
-            if not existing:
-                self.create_trendline(
-                    name=trendline['name'],
-                    symbol=trendline['symbol'],
-                    start_point=[trendline['start_time'], trendline['start_price']],
-                    end_point=[trendline['end_time'], trendline['end_price']],
-                    direction=trendline['direction']
-                )
-                imported_count += 1
-
-        return imported_count
+            head = f.read(1)
+            while head.isspace():
+                head = f.read(1)
+            f.seek(0)
+            if head == '[':
+                lines = (json.dumps(t) for t in json.load(f))
+                return self.import_trendlines_stream(lines)['imported']
+            return self.import_trendlines_stream(f)['imported']
 
 
 # 趋势线配置验证
@@ -5,21 +5,33 @@
 
 import time
 import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import pandas as pd
 import numpy as np
-import ccxt
 from TrendlineManager import TrendlineManager
-from Function import fetch_okex_symbol_history_candle_data
+from Function import (
+    fetch_okex_candle_data_since,
+    fetch_okex_symbol_history_candle_data,
+    fetch_okex_symbol_history_candle_data_concurrent,
+    fetch_okex_symbol_history_candle_data_shared,
+    get_okex_time_interval_info,
+    okex_candles_to_dataframe,
+)
 from Config import *
 from config_constants import OKEX_READONLY_CONFIG
-from Signals import define_trendline, monitor_breakout
+from Signals import monitor_breakout
+from trendline_geometry import TrendlineGeometry
+from candle_store import CandleStore, gmt8_to_milliseconds
+from candle_ring_buffer import CandleRingBuffer
+from bar_scheduler import BarCloseScheduler
+from market_stream import CandleStream
+from exchange_pool import get_exchange
 import os
 
 # =交易所配置
 OKEX_CONFIG = OKEX_READONLY_CONFIG
-exchange = ccxt.okx(OKEX_CONFIG)
 
 
 class TrendlineMonitor:
@@ -29,10 +41,35 @@ class TrendlineMonitor:
         """初始化监测引擎"""
         self.manager = TrendlineManager(data_dir)
         self.exchange_config = exchange_config or OKEX_CONFIG
-        self.exchange = exchange
         self.monitoring = False
         self.monitor_thread = None
-        self.candle_cache = {}  # 缓存K线数据
+        self.time_interval = "15m"  # 未设置周期的趋势线使用的默认周期
+        self.symbols = []  # 监测中的交易对
+        self.series = []  # 监测中的 (symbol, interval)，同一序列上的趋势线共用一份K线和一次请求
+        self.candle_buffers = {}  # {(symbol, interval): 定长K线环形缓冲区}，最后一根可以是正在形成的K线
+        self.candle_store = CandleStore(os.path.join(data_dir, "klines"))  # K线持久化存储
+        self.candle_lock = threading.RLock()  # 保护K线缓冲区字典及缓冲区读写，只在内存操作期间持有
+        self.series_locks = {}  # {(symbol, interval): 锁}，只保护同一序列的缓冲区合并（推送与REST），不做IO
+        self.check_locks = {}  # {(symbol, interval): 锁}，同一序列的趋势线检查串行，推送线程不会等待
+        self.series_locks_guard = threading.Lock()  # 保护 series_locks、check_locks、inflight 和 signaling
+        self.pipeline_pool = None  # 各序列 获取→合并→检查 流水线的线程池
+        self.pipeline_workers = 16
+        self.pipeline_timeout = 15  # 每个序列流水线的截止秒数
+        self.inflight = {}  # {(symbol, interval): Future}，正在执行的流水线，只在 series_locks_guard 内修改
+        self.signaling = set()  # 已产生信号、正在通知的趋势线id，只在 series_locks_guard 内修改，避免重复通知
+        self.store_writer = None  # 单线程的K线持久化队列，按提交顺序写入，推送线程不做磁盘IO
+        self.stream = None  # K线推送客户端
+        self.wakeup = threading.Event()  # 趋势线变更或停止时唤醒监测循环
+        self.scheduler = BarCloseScheduler(wakeup=self.wakeup)  # 每个 (symbol, interval) 在K线收盘后唤醒
+        self.symbols_dirty = True  # 活跃趋势线的交易对可能发生变化
+        self.pending_series = set()  # 有新增或重新启用趋势线、需要立即检查的 (symbol, interval)
+        # 订阅趋势线变更事件，代替每轮重新读取活跃趋势线
+        self.manager.registry.subscribe(self._on_trendline_event)
+
+    @property
+    def exchange(self):
+        """当前线程的交易所客户端，监测线程、线程池与Web请求线程的客户端共用一个连接池"""
+        return get_exchange(self.exchange_config)
 
     def start_monitoring(
         self,
@@ -40,21 +77,43 @@ class TrendlineMonitor:
         time_interval: str = "15m",
         max_candles: int = 1000,
         check_interval: int = 30,
+        use_websocket: bool = True,
+        pipeline_workers: int = 16,
+        pipeline_timeout: float = 15,
     ):
-        """启动监测"""
+        """
+        启动监测
+        :param symbols: 初始监测的交易对（按默认周期），之后按活跃趋势线的 (symbol, 周期) 自动增减
+        :param time_interval: 默认周期，用于未设置周期的趋势线
+        :param check_interval: 没有活跃趋势线或出错时的等待秒数，也是检查其他进程修改趋势线的最长间隔；有监测的交易对时按K线收盘时间唤醒
+        :param use_websocket: 是否订阅K线推送，K线收盘后立即检查；收盘时的REST增量请求作为断线时的补充
+        :param pipeline_workers: 同时执行 获取→合并→检查 的序列数（线程池大小）
+        :param pipeline_timeout: 每个序列流水线的截止秒数，超时的序列不再阻塞本轮，REST重试也不会超过截止时间
+        """
         if self.monitoring:
             print("监测已在运行中")
             return
 
         self.monitoring = True
-        self.symbols = symbols
+        self.symbols = list(symbols)
+        self.series = [(symbol, time_interval) for symbol in symbols]
         self.time_interval = time_interval
         self.max_candles = max_candles
         self.check_interval = check_interval
+        self.pipeline_workers = pipeline_workers
+        self.pipeline_timeout = pipeline_timeout
+        self.pipeline_pool = ThreadPoolExecutor(
+            max_workers=pipeline_workers, thread_name_prefix="trendline-pipeline"
+        )
+        self.store_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="candle-store")
 
         # 初始化K线数据
         self._init_candle_data()
-        self._monitor_loop()
+        for symbol, interval in self.series:
+            self._schedule(symbol, interval)
+
+        if use_websocket:
+            self.start_streaming()
 
         # 启动监测线程
         self.monitor_thread = threading.Thread(target=self._monitor_loop)
@@ -66,160 +125,535 @@ class TrendlineMonitor:
     def stop_monitoring(self):
         """停止监测"""
         self.monitoring = False
+        self.wakeup.set()
+        if self.stream:
+            self.stream.stop()
+            self.stream = None
         if self.monitor_thread:
             self.monitor_thread.join()
+        if self.pipeline_pool:
+            # 正在执行的请求无法中断，不等待它们结束
+            self.pipeline_pool.shutdown(wait=False, cancel_futures=True)
+            self.pipeline_pool = None
+        if self.store_writer:
+            # 已提交的K线写完再退出，保证持久化存储与缓冲区一致
+            self.store_writer.shutdown(wait=True)
+            self.store_writer = None
         print("趋势线监测已停止")
 
-    def init_cache(self, symbol):
-        # 获取历史K线数据
-        df = fetch_okex_symbol_history_candle_data(
-            self.exchange, symbol, self.time_interval, self.max_candles
+    def start_streaming(self, url: str = None):
+        """
+        通过一条WebSocket连接订阅所有监测交易对的K线推送
+        :param url: 推送地址，默认为OKX business端点，调试时可传入本地模拟服务器地址
+        """
+        if self.stream:
+            return
+        if url:
+            self.stream = CandleStream(on_candle=self._on_stream_candle, url=url)
+        else:
+            self.stream = CandleStream(on_candle=self._on_stream_candle)
+        for symbol, interval in self.series:
+            self.stream.subscribe(symbol, interval)
+        self.stream.start()
+
+    def _on_trendline_event(self, event: str, trendline: Dict):
+        """趋势线新增、修改、删除后标记交易对列表需要更新，并唤醒监测循环"""
+        self.symbols_dirty = True
+        if event != "delete" and trendline.get("status") == "active":
+            self.pending_series.add((trendline["symbol"], self._interval_of(trendline)))
+        self.wakeup.set()
+
+    def _interval_of(self, trendline: Dict) -> str:
+        """趋势线的K线周期，未设置时使用默认周期"""
+        return trendline.get("timeframe") or self.time_interval
+
+    def _active_series(self) -> List[tuple]:
+        """有活跃趋势线的 (symbol, interval)"""
+        return sorted({
+            (symbol, timeframe or self.time_interval)
+            for symbol, timeframe in self.manager.registry.active_series()
+        })
+
+    def _schedule(self, symbol: str, interval: str = None):
+        """在当前K线收盘后唤醒该序列"""
+        key = self._buffer_key(symbol, interval)
+        self.scheduler.add(key, get_okex_time_interval_info(key[1])["multiplier"])
+
+    def _series_lock(self, key: tuple) -> threading.RLock:
+        """(symbol, interval) 的合并锁，只在修改该序列的缓冲区期间持有"""
+        return self._keyed_lock(self.series_locks, key)
+
+    def _check_lock(self, key: tuple) -> threading.RLock:
+        """(symbol, interval) 的检查锁，同一序列的检查不会并发执行，与合并锁互不阻塞"""
+        return self._keyed_lock(self.check_locks, key)
+
+    def _keyed_lock(self, locks: Dict, key: tuple) -> threading.RLock:
+        with self.series_locks_guard:
+            lock = locks.get(key)
+            if lock is None:
+                lock = locks[key] = threading.RLock()
+            return lock
+
+    def _wait(self, seconds: float):
+        """等待下一轮检查，期间趋势线变更或停止监测会提前唤醒"""
+        self.wakeup.wait(seconds)
+        self.wakeup.clear()
+
+    def init_cache(self, symbol, interval: str = None, deadline: float = None):
+        interval = interval or self.time_interval
+        # 按时间分片并发回补历史K线数据
+        df = fetch_okex_symbol_history_candle_data_concurrent(
+            self.exchange, symbol, interval, self.max_candles, deadline=deadline
         )
         if not df.empty:
             # 时间倒序排序
             df.sort_values(by="candle_begin_time_GMT8", ascending=True, inplace=True)
             df.reset_index(drop=True, inplace=True)
-            self.candle_cache[symbol] = df
-            if not os.path.exists("./data/klines"):
-                os.makedirs("./data/klines")
-            df.to_csv(
-                f"./data/klines/{symbol}_{self.time_interval}_candles.csv",
-                index=False,
-            )
-            print(f"{symbol}: 已加载 {len(df)} 根K线")
+            self._set_candle_cache(symbol, df, interval)
+            # 只追加存储中尚未保存的K线
+            self.candle_store.write_dataframe(symbol, interval, df)
+            print(f"{symbol} {interval}: 已加载 {len(df)} 根K线")
         else:
-            print(f"{symbol}: 警告 - 未获取到K线数据")
+            print(f"{symbol} {interval}: 警告 - 未获取到K线数据")
+
+    def _init_series(self, series: List[tuple], label: str = ""):
+        """
+        在线程池中并发初始化各序列的历史数据，单个序列失败不影响其他序列；
+        最多等待到截止时间或停止监测，未完成的序列留在后台完成（登记在 inflight 中，不会重复初始化）
+        """
+        deadline = time.time() + self.pipeline_timeout
+
+        def init(key):
+            try:
+                self.init_cache(*key, deadline)
+            except Exception as e:
+                print(f"{key[0]} {key[1]}: 获取K线数据失败{label} - {e}")
+
+        futures = [self._submit_pipeline(key, deadline, init, key) for key in series]
+        not_done = self._wait_futures([f for f in futures if f is not None], deadline)
+        if not_done and self.monitoring:
+            print(f"{len(not_done)} 个序列的历史数据超过截止时间仍未加载完成，在后台继续{label}")
+
+    def _wait_futures(self, futures: List[Future], deadline: float) -> set:
+        """
+        等待任务完成，直到截止时间或停止监测；按短时间片等待，stop_monitoring() 不必等到截止时间
+        :return: 未完成的任务
+        """
+        not_done = set(futures)
+        while not_done and self.monitoring:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            _, not_done = wait(not_done, timeout=min(remaining, 0.2))
+        return not_done
 
     def _init_candle_data(self):
         """初始化K线数据"""
         print("正在初始化K线数据...")
-        for symbol in self.symbols:
-            try:
-                self.init_cache(symbol)
-            except Exception as e:
-                print(f"{symbol}: 获取K线数据失败 - {e}")
+        self._init_series(self.series)
 
-    def _init_new_symbols(self, new_symbols: List[str]):
-        """为新增的symbol初始化历史数据"""
-        print(f"正在初始化新增交易对的历史数据: {new_symbols}")
-        for symbol in new_symbols:
-            try:
-                self.init_cache(symbol=symbol)  # 保存到文件
-            except Exception as e:
-                print(f"{symbol}: 获取K线数据失败（新增） - {e}")
+    def _init_new_series(self, new_series: List[tuple]):
+        """为新增的 (symbol, interval) 初始化历史数据"""
+        print(f"正在初始化新增序列的历史数据: {new_series}")
+        self._init_series(new_series, "（新增）")
 
     def _monitor_loop(self):
         """监测循环"""
         print("开始监测循环...")
+        due_jobs = []
         while self.monitoring:
             try:
-                # 每次循环都重新检查活跃趋势线，实现动态更新
-                active_trendlines = self.manager.get_active_trendlines()
-                active_symbols = list(set([tl["symbol"] for tl in active_trendlines]))
+                # 其他进程修改了趋势线数据库时重新加载，变更以事件形式送达 _on_trendline_event
+                self.manager.registry.sync()
 
-                # 如果没有活跃趋势线，等待而不是停止监测
-                if not active_symbols:
-                    print("没有活跃趋势线，等待...")
-                    time.sleep(self.check_interval)
-                    continue
-
-                # 动态更新监控的symbols列表
-                old_symbols = set(self.symbols) if hasattr(self, "symbols") else set()
-                new_symbols = set(active_symbols)
-
-                # 检查symbols变化
-                if old_symbols != new_symbols:
-                    added_symbols = new_symbols - old_symbols
-                    removed_symbols = old_symbols - new_symbols
-
-                    if added_symbols:
-                        print(f"新增监控交易对: {list(added_symbols)}")
-                        # 为新增的symbol初始化历史数据
-                        self._init_new_symbols(list(added_symbols))
-                    if removed_symbols:
-                        print(f"移除监控交易对: {list(removed_symbols)}")
+                # 趋势线变更事件到达后才重新计算活跃的 (symbol, interval)（内存中完成）
+                if self.symbols_dirty:
+                    self.symbols_dirty = False
+                    active_series = self._active_series()
+                else:
+                    active_series = self.series
+
+                # 动态更新监控的序列列表
+                old_series = set(self.series)
+                new_series = set(active_series)
+
+                # 检查序列变化
+                if old_series != new_series:
+                    added_series = sorted(new_series - old_series)
+                    removed_series = sorted(old_series - new_series)
+
+                    if added_series:
+                        print(f"新增监控序列: {added_series}")
+                        # 为新增的序列初始化历史数据
+                        self._init_new_series(added_series)
+                        # 逐个序列调度，单个序列失败（如数据库中的周期不受支持）不影响其他序列
+                        for symbol, interval in added_series:
+                            try:
+                                self._schedule(symbol, interval)
+                                if self.stream:
+                                    self.stream.subscribe(symbol, interval)
+                            except Exception as e:
+                                print(f"{symbol} {interval}: 调度监测失败 - {e}")
+                    if removed_series:
+                        print(f"移除监控序列: {removed_series}")
                         # 清理不再需要的缓存数据
-                        for symbol in removed_symbols:
-                            if symbol in self.candle_cache:
-                                del self.candle_cache[symbol]
+                        for symbol, interval in removed_series:
+                            self.scheduler.remove((symbol, interval))
+                            if self.stream:
+                                self.stream.unsubscribe(symbol, interval)
+                            with self.candle_lock:
+                                self.candle_buffers.pop((symbol, interval), None)
 
-                self.symbols = active_symbols
+                self.series = list(active_series)
+                self.symbols = sorted({symbol for symbol, _ in self.series})
 
-                # 更新K线数据
-                self._update_candle_data()
+                # 如果没有活跃趋势线，等待而不是停止监测
+                if not active_series:
+                    print("没有活跃趋势线，等待...")
+                    self._wait(self.check_interval)
+                    continue
 
-                # 检查所有活跃趋势线
-                self._check_all_trendlines()
+                # K线收盘的序列增量更新K线（有推送时K线已实时合并，这里只补齐断线期间遗漏的K线），
+                # 新增或重新启用的趋势线不必等到下一根K线收盘；各序列在线程池中并发执行
+                pending, self.pending_series = self.pending_series, set()
+                self._process_due_jobs(due_jobs, pending)
 
-                # 等待下一次检查
-                time.sleep(self.check_interval)
+                # 等待下一根K线收盘，趋势线变更或停止监测时提前唤醒；
+                # 最多等待 check_interval 秒，以便发现其他进程对趋势线的修改
+                due_jobs = self.scheduler.wait(self.check_interval)
 
             except Exception as e:
                 print(f"监测循环出错: {e}")
-                time.sleep(self.check_interval)
-
-    def _update_candle_data(self):
-        """更新K线数据"""
-        for symbol in self.symbols:
-            try:
-                # 获取最新的几根K线
-                new_df = fetch_okex_symbol_history_candle_data(
-                    self.exchange, symbol, self.time_interval, 100
-                )
-
-                if not new_df.empty:
-                    # 合并到缓存
-                    if symbol in self.candle_cache:
-                        old_df = self.candle_cache[symbol]
-                        combined_df = pd.concat([old_df, new_df], ignore_index=True)
-                        combined_df.drop_duplicates(
-                            subset=["candle_begin_time_GMT8"], keep="last", inplace=True
-                        )
-                        combined_df.sort_values(
-                            by="candle_begin_time_GMT8", ascending=True, inplace=True
-                        )
-                        combined_df.reset_index(drop=True, inplace=True)
-                        # 检查/data/klines 目录是否存在，不存在则创建
-                        if not os.path.exists("./data/klines"):
-                            os.makedirs("./data/klines")
-                        combined_df.to_csv(
-                            f"./data/klines/{symbol}_{self.time_interval}_candles.csv",
-                            index=False,
-                        )
-                        combined_df = combined_df.iloc[-self.max_candles :]
-
-                        print(f"{symbol}: 已更新 {len(new_df)} 根K线")
-                        self.candle_cache[symbol] = combined_df
-                    else:
-                        self.candle_cache[symbol] = new_df
+                # 已取出但未处理的任务重新按下一根K线收盘调度
+                for key, _ in due_jobs:
+                    if key in self.series:
+                        self._schedule(*key)
+                due_jobs = []
+                self._wait(self.check_interval)
+
+    def _process_due_jobs(self, due_jobs: List[tuple], pending=()):
+        """
+        把到期的收盘任务和待检查的序列提交到线程池，等待到截止时间为止，
+        总耗时约等于最慢的一个序列，超过截止时间的序列留在后台完成，不阻塞其他序列
+        :param due_jobs: BarCloseScheduler.wait() 的结果 [((symbol, interval), 收盘时间毫秒)]
+        :param pending: 需要立即检查趋势线的 (symbol, interval)
+        """
+        jobs = {}
+        for key, close_ms in due_jobs:
+            if key not in self.series:
+                self.scheduler.remove(key)
+                continue
+            jobs[key] = close_ms
+        for key in pending:
+            if key in self.series:
+                jobs.setdefault(key, None)
+        if not jobs:
+            return
 
-            except Exception as e:
-                print(f"更新 {symbol} K线数据失败: {e}")
+        deadline = time.time() + self.pipeline_timeout
+        futures = {}
+        for key, close_ms in jobs.items():
+            future = self._submit_pipeline(key, deadline, self._run_pipeline, key, close_ms, key in pending, deadline)
+            if future is None:
+                # 上一次流水线超时仍在执行，由它完成后重新调度，需要立即检查的留到下一轮
+                print(f"{key[0]} {key[1]}: 上一次更新仍在进行，本轮跳过")
+                if key in pending:
+                    self.pending_series.add(key)
+                continue
+            futures[key] = future
+
+        not_done = self._wait_futures(list(futures.values()), deadline)
+        if not_done and self.monitoring:
+            late = [f"{s} {i}" for (s, i), future in futures.items() if future in not_done]
+            print(f"{len(late)} 个序列超过截止时间仍未完成，不再等待: {late}")
+
+    def _submit_pipeline(self, key: tuple, deadline: float, fn, *args) -> Optional[Future]:
+        """
+        提交单个序列的任务到线程池，没有线程池（未启动监测）时直接执行；
+        推送线程和监测循环都会调用，检查与登记 inflight 在同一把锁内完成，同一序列最多一个任务在执行
+        :param deadline: 截止时间（秒），超时完成时唤醒监测循环
+        :return: 任务的Future，该序列已有任务在执行时返回None
+        """
+        if self.pipeline_pool is None:
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+
+        with self.series_locks_guard:
+            if key in self.inflight:
+                return None
+            future = self.pipeline_pool.submit(fn, *args)
+            self.inflight[key] = future
+
+        def finished(_):
+            with self.series_locks_guard:
+                if self.inflight.get(key) is future:
+                    del self.inflight[key]
+            if time.time() > deadline:
+                # 超时完成时监测循环可能已在等待，唤醒它以便按新的重试时间调度
+                self.scheduler.wake()
+
+        future.add_done_callback(finished)
+        return future
+
+    def _run_pipeline(self, key: tuple, close_ms: Optional[int], check: bool, deadline: float) -> bool:
+        """
+        单个序列的流水线：增量获取 → 合并 → 检查趋势线，异常只影响本序列
+        :param close_ms: 到期的收盘时间毫秒，None表示不是收盘任务
+        :param check: 即使没有新K线收盘也检查趋势线（新增或重新启用的趋势线）
+        :param deadline: 截止时间（秒），REST请求失败后的重试不会超过该时间
+        :return: 是否检查了趋势线
+        """
+        symbol, interval = key
+        closed = False
+        if close_ms is not None:
+            bar_open_ms = close_ms - get_okex_time_interval_info(interval)["multiplier"]
+            last_confirmed = self._last_confirmed_ts(symbol, interval)
+            if last_confirmed is None or last_confirmed < bar_open_ms:
+                # 推送尚未送达这根收盘K线，请求REST增量
+                try:
+                    closed = self._refresh_symbol_candles(symbol, interval, deadline)
+                except Exception as e:
+                    print(f"更新 {symbol} {interval} K线数据失败: {e}")
+                last_confirmed = self._last_confirmed_ts(symbol, interval)
 
-    def _check_all_trendlines(self):
-        """检查所有趋势线的突破信号"""
-        # 获取所有活跃趋势线
-        active_trendlines = self.manager.get_active_trendlines()
+            if last_confirmed is not None and last_confirmed >= bar_open_ms:
+                self.scheduler.done(key)
+            else:
+                self.scheduler.retry(key)
 
-        for trendline in active_trendlines:
-            symbol = trendline["symbol"]
-            trendline_id = trendline["id"]
+        if not (closed or check):
+            return False
+        try:
+            self._check_all_trendlines([key])
+        except Exception as e:
+            print(f"检查 {symbol} {interval} 的趋势线失败: {e}")
+            return False
+        return True
 
-            # 检查是否有对应的K线数据
-            if symbol not in self.candle_cache or self.candle_cache[symbol].empty:
-                continue
+    def _backfill_series(self, key: tuple, deadline: float) -> bool:
+        """推送与缓存不连续时用REST补齐K线，有新K线收盘则检查该序列的趋势线"""
+        try:
+            closed = self._refresh_symbol_candles(*key, deadline)
+        except Exception as e:
+            print(f"补齐 {key[0]} {key[1]} K线数据失败: {e}")
+            return False
+        if closed:
+            self._check_all_trendlines([key])
+        return closed
+
+    def _buffer_key(self, symbol: str, interval: str = None) -> tuple:
+        """K线缓冲区按 (symbol, interval) 区分，interval为空时使用默认周期"""
+        return symbol, interval or self.time_interval
+
+    def _buffer(self, symbol: str, interval: str = None) -> Optional[CandleRingBuffer]:
+        """(symbol, interval) 的K线缓冲区"""
+        return self.candle_buffers.get(self._buffer_key(symbol, interval))
+
+    def _last_confirmed_ts(self, symbol: str, interval: str = None) -> Optional[int]:
+        """最后一根已收盘K线的毫秒时间戳，无缓存时返回None"""
+        buffer = self._buffer(symbol, interval)
+        return buffer.last_confirmed_ts if buffer is not None else None
+
+    def _get_candles(self, symbol: str, interval: str = None) -> Optional[pd.DataFrame]:
+        """已收盘K线的DataFrame（复制），无缓存时返回None"""
+        with self.candle_lock:
+            buffer = self._buffer(symbol, interval)
+            if buffer is None or buffer.closed_size == 0:
+                return None
+            return buffer.to_dataframe()
 
+    def _set_candle_cache(self, symbol: str, df: pd.DataFrame, interval: str = None):
+        """用已收盘的K线重建缓冲区"""
+        buffer = CandleRingBuffer(max(getattr(self, "max_candles", len(df)), 1))
+        if not df.empty:
+            buffer.extend(
+                gmt8_to_milliseconds(df["candle_begin_time_GMT8"]),
+                *(df[field].to_numpy(dtype=np.float64) for field in CandleRingBuffer.FIELDS),
+            )
+        with self.candle_lock:
+            self.candle_buffers[self._buffer_key(symbol, interval)] = buffer
+
+    def _refresh_symbol_candles(self, symbol: str, interval: str = None, deadline: float = None) -> bool:
+        """
+        增量刷新单个 (symbol, interval) 的K线：只请求最后一根已收盘K线之后的数据
+        :param deadline: 截止时间（秒），请求失败后的重试不会超过该时间
+        :return: 是否有新的K线收盘
+        """
+        interval = interval or self.time_interval
+        since = self._last_confirmed_ts(symbol, interval)
+        if since is None:
+            # 尚无缓存，完整回补
+            self.init_cache(symbol, interval, deadline)
+            return self._last_confirmed_ts(symbol, interval) is not None
+
+        new_df = fetch_okex_candle_data_since(
+            self.exchange, symbol, interval, since, deadline=deadline
+        )
+        return self._merge_candles(symbol, new_df, interval, deadline)
+
+    def _merge_candles(self, symbol: str, new_df: pd.DataFrame, interval: str = None,
+                       deadline: float = None) -> bool:
+        """
+        将带confirm列的K线合并到缓存，REST增量和WebSocket推送共用
+        :param deadline: 截止时间（秒），已超过时不再合并（不去争用推送线程的合并锁），由下一次流水线重试
+        :return: 是否有新的K线收盘
+        """
+        if new_df.empty:
+            return False
+
+        key = self._buffer_key(symbol, interval)
+        if deadline is not None and time.time() > deadline:
+            print(f"{symbol} {key[1]}: 超过截止时间，丢弃本次获取的K线")
+            return False
+        with self._series_lock(key):
+            # 持久化交给写入队列；在序列锁内提交，同一序列的写入顺序与合并顺序一致
+            self._persist_candles(symbol, key[1], new_df)
+
+            with self.candle_lock:
+                buffer = self.candle_buffers.get(key)
+                if buffer is None:
+                    buffer = self.candle_buffers[key] = CandleRingBuffer(self.max_candles)
+
+                # 两个来源可能重复送达同一根K线：早于最后一根的忽略，相同时间的原地更新，只有新收盘的才计数
+                closed = buffer.extend(
+                    gmt8_to_milliseconds(new_df["candle_begin_time_GMT8"]),
+                    *(new_df[field].to_numpy(dtype=np.float64) for field in CandleRingBuffer.FIELDS),
+                    confirm=new_df["confirm"].to_numpy(dtype=bool),
+                )
+                gap = buffer.take_gap()
+        if gap:
+            # 正在形成的K线没有收到收盘确认就被更晚的K线取代，用REST补齐（已有任务在执行时由它重试）
+            print(f"{symbol} {key[1]}: 未收到收盘确认的K线被丢弃，用REST补齐")
+            backfill_deadline = time.time() + self.pipeline_timeout
+            self._submit_pipeline(key, backfill_deadline, self._backfill_series, key, backfill_deadline)
+        if not closed:
+            return False
+
+        print(f"{symbol} {key[1]}: 新收盘 {closed} 根K线")
+        return True
+
+    def _persist_candles(self, symbol: str, interval: str, df: pd.DataFrame):
+        """追加新收盘的K线、原地更新正在形成的K线；监测运行时在写入队列中执行，未启动监测时直接写入"""
+        writer = self.store_writer
+        if writer is not None:
             try:
-                # 检查突破信号
-                signal = self.manager.check_breakout_signal(
-                    trendline_id, self.candle_cache[symbol]
+                future = writer.submit(self.candle_store.write_dataframe, symbol, interval, df)
+            except RuntimeError:
+                # 正在停止监测，写入队列已关闭
+                pass
+            else:
+                future.add_done_callback(
+                    lambda f: f.exception() and print(f"保存 {symbol} {interval} K线失败: {f.exception()}")
                 )
+                return
+        self.candle_store.write_dataframe(symbol, interval, df)
+
+    def _on_stream_candle(self, symbol: str, interval: str, rows: list):
+        """处理WebSocket推送的K线：推送线程只在内存中合并K线，持久化、REST补齐和趋势线检查都交给其他线程"""
+        if (symbol, interval) not in self.series:
+            return
 
-                if signal is not None:
+        key = (symbol, interval)
+        with self._series_lock(key):
+            since = self._last_confirmed_ts(symbol, interval)
+            if since is None:
+                # 尚未完成初始化，由轮询线程回补
+                return
+
+            new_df = okex_candles_to_dataframe(rows, with_confirm=True)
+            if new_df.empty:
+                return
+
+            # 断线期间可能漏掉K线，推送的第一根与缓存不连续时交给线程池用REST补齐，不阻塞推送线程
+            first_ts = int(gmt8_to_milliseconds(new_df["candle_begin_time_GMT8"].iloc[:1])[0])
+            multiplier = get_okex_time_interval_info(interval)["multiplier"]
+            if first_ts > since + multiplier:
+                # 已有补齐或收盘任务在执行时不重复提交
+                deadline = time.time() + self.pipeline_timeout
+                self._submit_pipeline(key, deadline, self._backfill_series, key, deadline)
+                return
+            closed = self._merge_candles(symbol, new_df, interval)
+
+        if closed:
+            # 检查（可能发送通知）交给线程池，推送线程只做内存合并
+            self._submit_check(key)
+
+    def _submit_check(self, key: tuple):
+        """在线程池中检查该序列的趋势线，没有线程池（未启动监测）时直接检查"""
+        if self.pipeline_pool is None:
+            self._check_all_trendlines([key])
+            return
+        future = self.pipeline_pool.submit(self._check_all_trendlines, [key])
+        future.add_done_callback(
+            lambda f: f.exception() and print(f"检查 {key[0]} {key[1]} 的趋势线失败: {f.exception()}")
+        )
+
+    def _check_all_trendlines(self, series: Optional[List[tuple]] = None):
+        """
+        检查所有趋势线的突破信号
+        :param series: 只检查这些 (symbol, interval) 上的趋势线，None表示检查全部
+        """
+        # 获取活跃趋势线，按 (symbol, interval) 分组；只检查部分序列时按交易对索引查询
+        if series is None:
+            trendlines = self.manager.get_active_trendlines()
+        else:
+            trendlines = [
+                trendline
+                for symbol in sorted({symbol for symbol, _ in series})
+                for trendline in self.manager.get_active_trendlines(symbol)
+            ]
+        groups = {}
+        for trendline in trendlines:
+            key = (trendline["symbol"], self._interval_of(trendline))
+            if series is None or key in series:
+                groups.setdefault(key, []).append(trendline)
+
+        for key, trendlines in groups.items():
+            # 同一序列的检查用检查锁串行（不是合并锁，推送线程不会等待）；通知和写库在释放锁之后执行
+            with self._check_lock(key):
+                fired = self._check_trendlines(key, trendlines)
+            for trendline, signal in fired:
+                try:
                     self._handle_breakout_signal(trendline, signal)
+                finally:
+                    with self.series_locks_guard:
+                        self.signaling.discard(trendline["id"])
+
+    def _check_trendlines(self, key: tuple, trendlines: List[Dict]) -> List[tuple]:
+        """
+        批量检查同一 (symbol, interval) 上的趋势线，不处理信号
+        :return: 需要处理的 [(趋势线, 信号)]，已登记到 signaling，处理完后由调用方移除
+        """
+        # 同一序列的所有趋势线一次批量计算，只复制时间和收盘价两列
+        with self.candle_lock:
+            buffer = self._buffer(*key)
+            if buffer is None or buffer.closed_size < 2:
+                return []
+            times_ms = buffer.view("ts").copy()
+            close = buffer.view("close").copy()
+
+        # 上一次的信号还在通知中（尚未暂停）的趋势线不重复检查
+        with self.series_locks_guard:
+            trendlines = [t for t in trendlines if t["id"] not in self.signaling]
+        if not trendlines:
+            return []
 
-            except Exception as e:
-                print(f"检查趋势线 {trendline_id} 失败: {e}")
+        try:
+            step_ms = get_okex_time_interval_info(key[1])["multiplier"]
+            signals = self.manager.check_breakout_signals(trendlines, times_ms, close, step_ms)
+        except Exception as e:
+            print(f"检查 {key[0]} {key[1]} 的趋势线失败: {e}")
+            return []
+
+        fired = []
+        with self.series_locks_guard:
+            for trendline in trendlines:
+                signal = signals.get(trendline["id"])
+                if signal is not None and trendline["id"] not in self.signaling:
+                    self.signaling.add(trendline["id"])
+                    fired.append((trendline, signal))
+        return fired
 
     def _handle_breakout_signal(self, trendline: Dict, signal: int):
         """处理突破信号"""
@@ -249,15 +683,26 @@ class TrendlineMonitor:
 
     def get_monitoring_status(self) -> Dict:
         """获取监测状态"""
+        # 流水线线程会同时新增缓冲区，在锁内一次取出各缓冲区的大小
+        with self.candle_lock:
+            cache_status = {
+                f"{symbol} {interval}": buffer.closed_size
+                for (symbol, interval), buffer in self.candle_buffers.items()
+            }
+            cache_bytes = sum(buffer.nbytes for buffer in self.candle_buffers.values())
         return {
             "monitoring": self.monitoring,
             "symbols": self.symbols,
+            "series": [f"{symbol} {interval}" for symbol, interval in self.series],
             "time_interval": self.time_interval,
             "active_trendlines_count": len(self.manager.get_active_trendlines()),
-            "candle_cache_status": {
-                symbol: len(df) if not df.empty else 0
-                for symbol, df in self.candle_cache.items()
+            "candle_cache_status": cache_status,
+            "candle_cache_bytes": cache_bytes,
+            "next_checks": {
+                f"{symbol} {interval}": datetime.fromtimestamp(due).isoformat()
+                for (symbol, interval), due in self.scheduler.snapshot().items()
             },
+            "pipelines_running": [f"{symbol} {interval}" for symbol, interval in list(self.inflight)],
         }
 
     def check_trendline_now(self, trendline_id: str) -> Optional[int]:
@@ -266,14 +711,14 @@ class TrendlineMonitor:
         if not trendline:
             return None
 
-        symbol = trendline["symbol"]
-        if symbol not in self.candle_cache or self.candle_cache[symbol].empty:
+        interval = self._interval_of(trendline)
+        df = self._get_candles(trendline["symbol"], interval)
+        if df is None:
             return None
 
         try:
-            return self.manager.check_breakout_signal(
-                trendline_id, self.candle_cache[symbol]
-            )
+            step_ms = get_okex_time_interval_info(interval)["multiplier"]
+            return self.manager.check_breakout_signal(trendline_id, df, step_ms)
         except Exception as e:
             print(f"检查趋势线,check_trendline_now {trendline_id} 失败: {e}")
             return None
@@ -285,19 +730,19 @@ class TrendlineMonitor:
             return None
 
         symbol = trendline["symbol"]
-        if symbol not in self.candle_cache or self.candle_cache[symbol].empty:
+        interval = self._interval_of(trendline)
+        df = self._get_candles(symbol, interval)
+        if df is None:
             # 如果没有缓存数据，尝试获取最新数据
             try:
-                df = fetch_okex_symbol_history_candle_data(
-                    self.exchange, symbol, "15m", 100
+                df = fetch_okex_symbol_history_candle_data_shared(
+                    self.exchange, symbol, interval, 100
                 )
                 if df.empty:
                     return None
             except Exception as e:
                 print(f"获取 {symbol} 数据失败: {e}")
                 return None
-        else:
-            df = self.candle_cache[symbol].copy()
 
         try:
             # 解析趋势线数据
@@ -306,10 +751,12 @@ class TrendlineMonitor:
             start_price = float(trendline["start_price"])
             end_price = float(trendline["end_price"])
 
-            # 使用Signals.py中的方法计算趋势线
-            trendline_values = define_trendline(
-                df, [start_time, start_price], [end_time, end_price]
-            )
+            # 按时间轴计算趋势线，端点滚出缓存窗口后仍可计算
+            trendline_values = TrendlineGeometry.from_points(
+                [start_time, start_price],
+                [end_time, end_price],
+                get_okex_time_interval_info(interval)["multiplier"],
+            ).series(df)
 
             # 使用Signals.py中的方法检测突破
             breakout_signal = monitor_breakout(df, trendline_values)
@@ -341,6 +788,7 @@ class TrendlineMonitor:
                 "trendline_id": trendline_id,
                 "trendline_name": trendline["name"],
                 "symbol": symbol,
+                "timeframe": interval,
                 "direction": trendline["direction"],
                 "breakout_signal": breakout_signal,
                 "current_price": current_price,
@@ -370,20 +818,20 @@ class TrendlineMonitor:
             return None
 
         symbol = trendline["symbol"]
+        interval = self._interval_of(trendline)
 
         # 如果没有缓存数据，尝试获取最新数据
-        if symbol not in self.candle_cache or self.candle_cache[symbol].empty:
+        df = self._get_candles(symbol, interval)
+        if df is None:
             try:
-                df = fetch_okex_symbol_history_candle_data(
-                    self.exchange, symbol, "15m", 2000
+                df = fetch_okex_symbol_history_candle_data_shared(
+                    self.exchange, symbol, interval, 2000
                 )
                 if df.empty:
                     return None
             except Exception as e:
                 print(f"获取 {symbol} 数据失败: {e}")
                 return None
-        else:
-            df = self.candle_cache[symbol].copy()
 
         try:
             # 解析趋势线数据
@@ -392,10 +840,12 @@ class TrendlineMonitor:
             start_price = float(trendline["start_price"])
             end_price = float(trendline["end_price"])
 
-            # 使用Signals.py中的方法计算趋势线
-            trendline_values = define_trendline(
-                df, [start_time, start_price], [end_time, end_price]
-            )
+            # 按时间轴计算趋势线，端点滚出缓存窗口后仍可计算
+            trendline_values = TrendlineGeometry.from_points(
+                [start_time, start_price],
+                [end_time, end_price],
+                get_okex_time_interval_info(interval)["multiplier"],
+            ).series(df)
 
             # 转换K线数据为前端格式
             candle_data = []
@@ -469,37 +919,50 @@ class TrendlineMonitor:
     def refresh_candle_data(
         self, symbol: str = None, time_interval: str = None, limit: int = None
     ):
-        """手动刷新K线数据"""
-        symbols = [symbol] if symbol else self.symbols
-        interval = time_interval or self.time_interval
+        """手动刷新K线数据，不指定交易对和周期时刷新所有监测中的序列"""
+        if symbol:
+            series = [(symbol, time_interval or self.time_interval)]
+        else:
+            series = [(s, i) for s, i in self.series if not time_interval or i == time_interval]
         max_candles = limit or self.max_candles
 
-        for s in symbols:
+        for s, interval in series:
             try:
                 # 获取最新的K线数据
                 df = fetch_okex_symbol_history_candle_data(
                     self.exchange, s, interval, max_candles
                 )
                 if not df.empty:
-                    self.candle_cache[s] = df
-                    print(f"{s}: K线数据已刷新，共 {len(df)} 根")
+                    # 接口按时间倒序返回，最新一根可能仍在形成：整理为升序并只保留已收盘的K线
+                    df = df.sort_values(by="candle_begin_time_GMT8").reset_index(drop=True)
+                    multiplier = get_okex_time_interval_info(interval)["multiplier"]
+                    closed = gmt8_to_milliseconds(df["candle_begin_time_GMT8"]) + multiplier <= time.time() * 1000
+                    df = df[closed].reset_index(drop=True)
+                if not df.empty:
+                    # 与合并路径一样持久化，重启后从存储加载的数据与缓冲区一致
+                    with self._series_lock(self._buffer_key(s, interval)):
+                        self._set_candle_cache(s, df, interval)
+                        self._persist_candles(s, interval, df)
+                    print(f"{s} {interval}: K线数据已刷新，共 {len(df)} 根")
                 else:
-                    print(f"{s}: 未获取到K线数据")
+                    print(f"{s} {interval}: 未获取到K线数据")
             except Exception as e:
-                print(f"刷新 {s} K线数据失败: {e}")
+                print(f"刷新 {s} {interval} K线数据失败: {e}")
 
     def get_latest_candle_data(
-        self, symbol: str, limit: int = 100
+        self, symbol: str, limit: int = 100, time_interval: str = None
     ) -> Optional[pd.DataFrame]:
         """获取最新的K线数据（用于前端API）"""
+        interval = time_interval or self.time_interval
         try:
             # 优先从缓存获取
-            if symbol in self.candle_cache and not self.candle_cache[symbol].empty:
-                df = self.candle_cache[symbol].tail(limit).copy()
+            df = self._get_candles(symbol, interval)
+            if df is not None:
+                df = df.tail(limit).reset_index(drop=True)
             else:
                 # 如果没有缓存，直接获取
-                df = fetch_okex_symbol_history_candle_data(
-                    self.exchange, symbol, "15m", limit
+                df = fetch_okex_symbol_history_candle_data_shared(
+                    self.exchange, symbol, interval, limit
                 )
                 if df.empty:
                     return None
@@ -3,7 +3,8 @@
 基于Flask的Web界面，提供趋势线管理和可视化功能
 """
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for
+import io
 import json
 import uuid
 import hashlib
@@ -11,11 +12,19 @@ import time
 from datetime import datetime, timedelta
 from TrendlineManager import TrendlineManager, validate_trendline_config
 from TrendlineMonitor import TrendlineMonitor, get_global_monitor
-from Function import ccxt_fetch_candle_data, fetch_okex_symbol_history_candle_data
+from Function import (
+    ccxt_fetch_candle_data,
+    ccxt_fetch_candle_data_shared,
+    fetch_okex_symbol_history_candle_data_shared,
+    normalize_okex_timeframe,
+    okex_timeframe_mapping,
+)
 from cryptography.fernet import Fernet
 import base64
 import pandas as pd
-import ccxt
+from exchange_pool import get_exchange
+from stochrsi_store import StochRSIStore
+from stochrsi_overview import OverviewSnapshot, summarize_series
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import unpad
 import hashlib
@@ -65,201 +74,16 @@ STOCHRSI_CONFIG = {
     'data_dir': 'data/stochrsi'
 }
 
+# StochRSI指标与背离事件存储，首次启动时从旧的CSV文件迁移
+stochrsi_store = StochRSIStore(os.path.join(STOCHRSI_CONFIG['data_dir'], 'stochrsi.db'))
+stochrsi_store.migrate_from_csv(STOCHRSI_CONFIG['data_dir'])
+# watcher 发布的概览快照，接口直接返回预先序列化的响应
+overview_snapshot = OverviewSnapshot(stochrsi_store, os.path.join(STOCHRSI_CONFIG['data_dir'], 'overview.json'))
+
 def get_stochrsi_data(symbol, timeframe):
     """获取指定币种和时间周期的StochRSI数据"""
     try:
-        # 构造文件路径
-        base_filename = f"{STOCHRSI_CONFIG['data_dir']}/stochrsi_{symbol}_{timeframe}"
-
-        # 读取原始数据
-        main_file = f"{base_filename}.csv"
-        if not os.path.exists(main_file):
-            return None
-
-        df_main = pd.read_csv(main_file)
-        if df_main.empty:
-            return None
-
-        # 获取最新的StochRSI值
-        latest_row = df_main.iloc[-1]
-        latest_stochrsi = latest_row.get('stochrsi', None)
-
-        # 读取背离信号数据
-        tbl_file = f"{base_filename}_tbl.csv"
-        dbl_file = f"{base_filename}_dbl.csv"
-
-        latest_tbl = None
-        latest_dbl = None
-
-        if os.path.exists(tbl_file):
-            df_tbl = pd.read_csv(tbl_file)
-            if not df_tbl.empty:
-                latest_tbl = df_tbl.iloc[-1]
-
-        if os.path.exists(dbl_file):
-            df_dbl = pd.read_csv(dbl_file)
-            if not df_dbl.empty:
-                latest_dbl = df_dbl.iloc[-1]
-
-        # 检查TBL信号是否在当前周期或上一个周期
-        tbl_has_signal = False
-        tbl_timestamp = ''
-        tbl_stochrsi = None
-        tbl_price = None
-
-        if latest_tbl is not None and pd.notna(latest_tbl.get('bl', -1)) and latest_tbl.get('bl', -1) == -1:
-            tbl_signal_time = str(latest_tbl.get('datetime', ''))
-            latest_kline_time = str(latest_row.get('datetime', ''))
-
-            # 计算时间差异
-            try:
-                from datetime import datetime, timedelta
-                tbl_dt = datetime.strptime(tbl_signal_time, '%Y-%m-%d %H:%M:%S')
-                latest_dt = datetime.strptime(latest_kline_time, '%Y-%m-%d %H:%M:%S')
-
-                # 根据时间周期判断时间间隔
-                time_diff = latest_dt - tbl_dt
-
-                # 定义各时间周期的间隔（小时）
-                timeframe_intervals = {
-                    '5m': 0.083,    # 5分钟
-                    '15m': 0.25,    # 15分钟
-                    '30m': 0.5,     # 30分钟
-                    '1H': 1,        # 1小时
-                    '2H': 2,        # 2小时
-                    '4H': 4,        # 4小时
-                    '6H': 6,        # 6小时
-                    '12H': 12,      # 12小时
-                    '1D': 24,       # 1天
-                    '3D': 72,       # 3天
-                    '1W': 168,      # 1周
-                }
-
-                interval = timeframe_intervals.get(timeframe, 4)  # 默认4小时
-
-                # 如果背离信号时间在当前周期的上一个周期内，就标注信号
-                if timedelta(0) <= time_diff <= timedelta(hours=interval):
-                    tbl_has_signal = True
-                    tbl_timestamp = tbl_signal_time
-                    tbl_stochrsi = float(latest_tbl.get('stochrsi', 0)) if pd.notna(latest_tbl.get('stochrsi')) else None
-                    tbl_price = float(latest_tbl.get('close', 0)) if pd.notna(latest_tbl.get('close')) else None
-            except:
-                # 如果时间解析失败，使用原来的逻辑
-                if tbl_signal_time == latest_kline_time:
-                    tbl_has_signal = True
-                    tbl_timestamp = tbl_signal_time
-                    tbl_stochrsi = float(latest_tbl.get('stochrsi', 0)) if pd.notna(latest_tbl.get('stochrsi')) else None
-                    tbl_price = float(latest_tbl.get('close', 0)) if pd.notna(latest_tbl.get('close')) else None
-
-        # 检查DBL信号是否在当前周期或上一个周期
-        dbl_has_signal = False
-        dbl_timestamp = ''
-        dbl_stochrsi = None
-        dbl_price = None
-
-        if latest_dbl is not None and pd.notna(latest_dbl.get('dbl', -1)) and latest_dbl.get('dbl', -1) == 1:
-            dbl_signal_time = str(latest_dbl.get('datetime', ''))
-            latest_kline_time = str(latest_row.get('datetime', ''))
-
-            # 计算时间差异
-            try:
-                from datetime import datetime, timedelta
-                dbl_dt = datetime.strptime(dbl_signal_time, '%Y-%m-%d %H:%M:%S')
-                latest_dt = datetime.strptime(latest_kline_time, '%Y-%m-%d %H:%M:%S')
-
-                # 根据时间周期判断时间间隔
-                time_diff = latest_dt - dbl_dt
-
-                # 定义各时间周期的间隔（小时）
-                timeframe_intervals = {
-                    '5m': 0.083,    # 5分钟
-                    '15m': 0.25,    # 15分钟
-                    '30m': 0.5,     # 30分钟
-                    '1H': 1,        # 1小时
-                    '2H': 2,        # 2小时
-                    '4H': 4,        # 4小时
-                    '6H': 6,        # 6小时
-                    '12H': 12,      # 12小时
-                    '1D': 24,       # 1天
-                    '3D': 72,       # 3天
-                    '1W': 168,      # 1周
-                }
-
-                interval = timeframe_intervals.get(timeframe, 4)  # 默认4小时
-
-                # 如果背离信号时间在当前周期的上一个周期内，就标注信号
-                if timedelta(0) <= time_diff <= timedelta(hours=interval):
-                    dbl_has_signal = True
-                    dbl_timestamp = dbl_signal_time
-                    dbl_stochrsi = float(latest_dbl.get('stochrsi', 0)) if pd.notna(latest_dbl.get('stochrsi')) else None
-                    dbl_price = float(latest_dbl.get('close', 0)) if pd.notna(latest_dbl.get('close')) else None
-            except:
-                # 如果时间解析失败，使用原来的逻辑
-                if dbl_signal_time == latest_kline_time:
-                    dbl_has_signal = True
-                    dbl_timestamp = dbl_signal_time
-                    dbl_stochrsi = float(latest_dbl.get('stochrsi', 0)) if pd.notna(latest_dbl.get('stochrsi')) else None
-                    dbl_price = float(latest_dbl.get('close', 0)) if pd.notna(latest_dbl.get('close')) else None
-
-        # 检查是否有波动率数据
-        volatility_data = {
-            'current_volatility': None,
-            'rolling_volatility': None,
-            'sigma_level': '',
-            'trend': 'stable',
-            'historical_mean': None,
-            'historical_std': None
-        }
-
-        # 如果CSV文件包含波动率列，则提取数据
-        if 'volatility' in df_main.columns:
-            # 处理 NaN 值，确保 JSON 序列化兼容
-            def safe_get_float(key, default=None):
-                value = latest_row.get(key, default)
-                try:
-                    if pd.isna(value):
-                        return default
-                    return float(value) if value is not None else default
-                except (TypeError, ValueError):
-                    return default
-
-          # 处理 sigma_level 字符串中的无效值
-            def safe_get_string(key, default=''):
-                value = latest_row.get(key, default)
-                if pd.isna(value):
-                    return default
-                if value in ['normal', 'nan', 'NaN', 'None']:
-                    return default
-                return str(value) if value is not None else default
-
-            volatility_data = {
-                'current_volatility': safe_get_float('volatility'),
-                'rolling_volatility': safe_get_float('volatility_rolling'),
-                'sigma_level': safe_get_string('volatility_sigma_level'),
-                'trend': safe_get_string('volatility_trend', 'stable'),
-                'historical_mean': safe_get_float('volatility_historical_mean'),
-                'historical_std': safe_get_float('volatility_historical_std')
-            }
-
-        return {
-            'symbol': symbol,
-            'timeframe': timeframe,
-            'latest_stochrsi': float(latest_stochrsi) if pd.notna(latest_stochrsi) else None,
-            'latest_timestamp': latest_row.get('datetime', ''),
-            'tbl_signal': {
-                'has_signal': bool(tbl_has_signal),
-                'timestamp': tbl_timestamp,
-                'stochrsi': tbl_stochrsi,
-                'price': tbl_price
-            },
-            'dbl_signal': {
-                'has_signal': bool(dbl_has_signal),
-                'timestamp': dbl_timestamp,
-                'stochrsi': dbl_stochrsi,
-                'price': dbl_price
-            },
-            'volatility': volatility_data  # 新增波动率数据
-        }
+        return summarize_series(stochrsi_store, symbol, timeframe)
     except Exception as e:
         print(f"获取StochRSI数据失败 {symbol} {timeframe}: {str(e)}")
         return None
@@ -267,87 +91,69 @@ def get_stochrsi_data(symbol, timeframe):
 def get_divergence_history(symbol, timeframe, limit=10):
     """获取背离信号历史"""
     try:
-        base_filename = f"{STOCHRSI_CONFIG['data_dir']}/stochrsi_{symbol}_{timeframe}"
-
-        # 读取背离信号数据
-        tbl_file = f"{base_filename}_tbl.csv"
-        dbl_file = f"{base_filename}_dbl.csv"
-
         divergence_data = []
 
-        # 处理TBL信号
-        if os.path.exists(tbl_file):
-            df_tbl = pd.read_csv(tbl_file)
-            if not df_tbl.empty:
-                # 由于CSV格式问题，bl列为空，使用turn列来判断
-                # turn列值为-1.0的行表示TBL信号
-                valid_tbl = df_tbl[df_tbl['turn'] == -1.0].tail(limit)
-                for _, row in valid_tbl.iterrows():
-                    # 提取波动率数据 - 正确处理空字符串和NaN值
+        # 处理TBL信号，只读取最近limit个事件
+        for row in stochrsi_store.recent_events(symbol, timeframe, 'tbl', limit):
+            # 提取波动率数据 - 正确处理空字符串和NaN值
+            volatility_data = {}
+            volatility_val = row.get('volatility', '')
+
+            # 检查是否有有效的波动率数据（不是空字符串也不是NaN）
+            if 'volatility' in row and pd.notna(volatility_val) and str(volatility_val).strip() != '':
+                try:
+                    volatility_data = {
+                        'current_volatility': float(volatility_val),
+                        'rolling_volatility': float(row.get('volatility_rolling', 0)) if pd.notna(row.get('volatility_rolling')) and str(row.get('volatility_rolling', '')).strip() != '' else None,
+                        'sigma_level': str(row.get('volatility_sigma_level', '')).strip() if pd.notna(row.get('volatility_sigma_level')) and str(row.get('volatility_sigma_level', '')).strip() != '' else '',
+                        'trend': str(row.get('volatility_trend', 'stable')).strip() if pd.notna(row.get('volatility_trend')) and str(row.get('volatility_trend', '')).strip() != '' else 'stable',
+                        'historical_mean': float(row.get('volatility_historical_mean', 0)) if pd.notna(row.get('volatility_historical_mean')) and str(row.get('volatility_historical_mean', '')).strip() != '' else None,
+                        'historical_std': float(row.get('volatility_historical_std', 0)) if pd.notna(row.get('volatility_historical_std')) and str(row.get('volatility_historical_std', '')).strip() != '' else None
+                    }
+                except (ValueError, TypeError) as e:
+                    # 如果转换失败，创建空的波动率数据
                     volatility_data = {}
-                    volatility_val = row.get('volatility', '')
-
-                    # 检查是否有有效的波动率数据（不是空字符串也不是NaN）
-                    if 'volatility' in row and pd.notna(volatility_val) and str(volatility_val).strip() != '':
-                        try:
-                            volatility_data = {
-                                'current_volatility': float(volatility_val),
-                                'rolling_volatility': float(row.get('volatility_rolling', 0)) if pd.notna(row.get('volatility_rolling')) and str(row.get('volatility_rolling', '')).strip() != '' else None,
-                                'sigma_level': str(row.get('volatility_sigma_level', '')).strip() if pd.notna(row.get('volatility_sigma_level')) and str(row.get('volatility_sigma_level', '')).strip() != '' else '',
-                                'trend': str(row.get('volatility_trend', 'stable')).strip() if pd.notna(row.get('volatility_trend')) and str(row.get('volatility_trend', '')).strip() != '' else 'stable',
-                                'historical_mean': float(row.get('volatility_historical_mean', 0)) if pd.notna(row.get('volatility_historical_mean')) and str(row.get('volatility_historical_mean', '')).strip() != '' else None,
-                                'historical_std': float(row.get('volatility_historical_std', 0)) if pd.notna(row.get('volatility_historical_std')) and str(row.get('volatility_historical_std', '')).strip() != '' else None
-                            }
-                        except (ValueError, TypeError) as e:
-                            # 如果转换失败，创建空的波动率数据
-                            volatility_data = {}
-                            print(f"波动率数据转换失败 TBL: {str(e)}, 原值: {volatility_val}")
-
-                    divergence_data.append({
-                        'type': 'TBL',
-                        'timestamp': row.get('datetime', ''),
-                        'stochrsi': float(row.get('stochrsi', 0)) if pd.notna(row.get('stochrsi')) else None,
-                        'price': float(row.get('close', 0)) if pd.notna(row.get('close')) else None,
-                        'signal_strength': '底部背离',
-                        'volatility': volatility_data
-                    })
-
-        # 处理DBL信号
-        if os.path.exists(dbl_file):
-            df_dbl = pd.read_csv(dbl_file)
-            if not df_dbl.empty:
-                # 由于CSV格式问题，dbl列为空，使用turn列来判断
-                # turn列值为1.0的行表示DBL信号
-                valid_dbl = df_dbl[df_dbl['turn'] == 1.0].tail(limit)
-                for _, row in valid_dbl.iterrows():
-                    # 提取波动率数据 - 正确处理空字符串和NaN值
+                    print(f"波动率数据转换失败 TBL: {str(e)}, 原值: {volatility_val}")
+
+            divergence_data.append({
+                'type': 'TBL',
+                'timestamp': row.get('datetime', ''),
+                'stochrsi': float(row.get('stochrsi', 0)) if pd.notna(row.get('stochrsi')) else None,
+                'price': float(row.get('close', 0)) if pd.notna(row.get('close')) else None,
+                'signal_strength': '底部背离',
+                'volatility': volatility_data
+            })
+
+        # 处理DBL信号（所有向上拐点），只读取最近limit个事件
+        for row in stochrsi_store.recent_events(symbol, timeframe, 'dbl', limit):
+            # 提取波动率数据 - 正确处理空字符串和NaN值
+            volatility_data = {}
+            volatility_val = row.get('volatility', '')
+
+            # 检查是否有有效的波动率数据（不是空字符串也不是NaN）
+            if 'volatility' in row and pd.notna(volatility_val) and str(volatility_val).strip() != '':
+                try:
+                    volatility_data = {
+                        'current_volatility': float(volatility_val),
+                        'rolling_volatility': float(row.get('volatility_rolling', 0)) if pd.notna(row.get('volatility_rolling')) and str(row.get('volatility_rolling', '')).strip() != '' else None,
+                        'sigma_level': str(row.get('volatility_sigma_level', '')).strip() if pd.notna(row.get('volatility_sigma_level')) and str(row.get('volatility_sigma_level', '')).strip() != '' else '',
+                        'trend': str(row.get('volatility_trend', 'stable')).strip() if pd.notna(row.get('volatility_trend')) and str(row.get('volatility_trend', '')).strip() != '' else 'stable',
+                        'historical_mean': float(row.get('volatility_historical_mean', 0)) if pd.notna(row.get('volatility_historical_mean')) and str(row.get('volatility_historical_mean', '')).strip() != '' else None,
+                        'historical_std': float(row.get('volatility_historical_std', 0)) if pd.notna(row.get('volatility_historical_std')) and str(row.get('volatility_historical_std', '')).strip() != '' else None
+                    }
+                except (ValueError, TypeError) as e:
+                    # 如果转换失败，创建空的波动率数据
                     volatility_data = {}
-                    volatility_val = row.get('volatility', '')
-
-                    # 检查是否有有效的波动率数据（不是空字符串也不是NaN）
-                    if 'volatility' in row and pd.notna(volatility_val) and str(volatility_val).strip() != '':
-                        try:
-                            volatility_data = {
-                                'current_volatility': float(volatility_val),
-                                'rolling_volatility': float(row.get('volatility_rolling', 0)) if pd.notna(row.get('volatility_rolling')) and str(row.get('volatility_rolling', '')).strip() != '' else None,
-                                'sigma_level': str(row.get('volatility_sigma_level', '')).strip() if pd.notna(row.get('volatility_sigma_level')) and str(row.get('volatility_sigma_level', '')).strip() != '' else '',
-                                'trend': str(row.get('volatility_trend', 'stable')).strip() if pd.notna(row.get('volatility_trend')) and str(row.get('volatility_trend', '')).strip() != '' else 'stable',
-                                'historical_mean': float(row.get('volatility_historical_mean', 0)) if pd.notna(row.get('volatility_historical_mean')) and str(row.get('volatility_historical_mean', '')).strip() != '' else None,
-                                'historical_std': float(row.get('volatility_historical_std', 0)) if pd.notna(row.get('volatility_historical_std')) and str(row.get('volatility_historical_std', '')).strip() != '' else None
-                            }
-                        except (ValueError, TypeError) as e:
-                            # 如果转换失败，创建空的波动率数据
-                            volatility_data = {}
-                            print(f"波动率数据转换失败 DBL: {str(e)}, 原值: {volatility_val}")
-
-                    divergence_data.append({
-                        'type': 'DBL',
-                        'timestamp': row.get('datetime', ''),
-                        'stochrsi': float(row.get('stochrsi', 0)) if pd.notna(row.get('stochrsi')) else None,
-                        'price': float(row.get('close', 0)) if pd.notna(row.get('close')) else None,
-                        'signal_strength': '顶部背离',
-                        'volatility': volatility_data
-                    })
+                    print(f"波动率数据转换失败 DBL: {str(e)}, 原值: {volatility_val}")
+
+            divergence_data.append({
+                'type': 'DBL',
+                'timestamp': row.get('datetime', ''),
+                'stochrsi': float(row.get('stochrsi', 0)) if pd.notna(row.get('stochrsi')) else None,
+                'price': float(row.get('close', 0)) if pd.notna(row.get('close')) else None,
+                'signal_strength': '顶部背离',
+                'volatility': volatility_data
+            })
 
         # 按时间排序，最新的在前
         divergence_data.sort(key=lambda x: x['timestamp'], reverse=True)
@@ -437,7 +243,7 @@ def index():
     """主页 - 趋势线管理界面"""
     if not session.get('authenticated'):
         return redirect(url_for('login'))
-    return render_template('index.html', symbols=STOCHRSI_CONFIG['symbols'])
+    return render_template('index.html', symbols=STOCHRSI_CONFIG['symbols'], timeframes=okex_timeframe_mapping)
 
 @app.route('/stochrsi')
 def stochrsi_dashboard():
@@ -557,6 +363,7 @@ def get_trendlines():
                 'price': float(tl['end_price'])
             },
             'direction': tl['direction'],
+            'timeframe': tl.get('timeframe'),
             'enabled': tl['status'] == 'active',
             'createdAt': tl['created_at'],
             'updatedAt': tl['updated_at']
@@ -602,6 +409,13 @@ def create_trendline():
             if field not in data:
                 return jsonify({'success': False, 'message': f'缺少字段: {field}'})
 
+        # 时间周期为空时按监测的默认周期检查，否则必须是支持的周期
+        timeframe = data.get('timeframe')
+        if timeframe:
+            timeframe = normalize_okex_timeframe(timeframe)
+            if timeframe is None:
+                return jsonify({'success': False, 'message': f"不支持的时间周期: {data['timeframe']}"}), 400
+
         # 转换前端格式到后端格式
         start_point = [data['startPoint']['time'], data['startPoint']['price']]
         end_point = [data['endPoint']['time'], data['endPoint']['price']]
@@ -622,7 +436,8 @@ def create_trendline():
             price_info=start_price_info,
             candle_data=start_candle_data,
             end_price_info=end_price_info,
-            end_candle_data=end_candle_data
+            end_candle_data=end_candle_data,
+            timeframe=timeframe or None
         )
 
         # 返回创建的趋势线数据
@@ -640,6 +455,7 @@ def create_trendline():
                 'price': float(trendline['end_price'])
             },
             'direction': trendline['direction'],
+            'timeframe': trendline.get('timeframe'),
             'enabled': trendline['status'] == 'active',
             'createdAt': trendline['created_at'],
             'updatedAt': trendline['updated_at']
@@ -674,6 +490,7 @@ def get_trendline(trendline_id):
                     'price': float(trendline['end_price'])
                 },
                 'direction': trendline['direction'],
+                'timeframe': trendline.get('timeframe'),
                 'enabled': trendline['status'] == 'active',
                 'createdAt': trendline['created_at'],
                 'updatedAt': trendline['updated_at']
@@ -700,6 +517,13 @@ def update_trendline(trendline_id):
             update_data['symbol'] = data['symbol']
         if 'direction' in data:
             update_data['direction'] = data['direction']
+        if 'timeframe' in data:
+            timeframe = data['timeframe']
+            if timeframe:
+                timeframe = normalize_okex_timeframe(timeframe)
+                if timeframe is None:
+                    return jsonify({'success': False, 'message': f"不支持的时间周期: {data['timeframe']}"}), 400
+            update_data['timeframe'] = timeframe or None
         if 'enabled' in data:
             update_data['status'] = 'active' if data['enabled'] else 'inactive'
 
@@ -803,7 +627,7 @@ def refresh_candle_data():
         limit = int(request.args.get('limit', 100))
 
         df = ccxt_fetch_candle_data(
-            ccxt.okx(EXCHANGE_CONFIG),
+            get_exchange(EXCHANGE_CONFIG),
             symbol,
             time_interval,
             limit
@@ -831,8 +655,9 @@ def get_logs():
     try:
         trendline_id = request.args.get('trendline_id')
         limit = int(request.args.get('limit', 100))
-        logs = manager.get_monitor_logs(trendline_id, limit)
-        return jsonify({'success': True, 'data': logs})
+        before = request.args.get('before')
+        logs, next_cursor = manager.breakout_log.query(trendline_id, limit, before)
+        return jsonify({'success': True, 'data': logs, 'next_cursor': next_cursor})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -845,7 +670,7 @@ def get_candles():
         time_interval = request.args.get('time_interval', '5m')
         limit = int(request.args.get('limit', 100))
 
-        exchange = ccxt.okx(EXCHANGE_CONFIG)
+        exchange = get_exchange(EXCHANGE_CONFIG)
         df = ccxt_fetch_candle_data(exchange, symbol, time_interval, limit)
 
         if not df.empty:
@@ -865,15 +690,17 @@ def get_kline_data(symbol):
     """获取K线数据 - 兼容Lightweight Charts格式"""
     try:
         limit = int(request.args.get('limit', 2000))
-        time_interval = '15m'
+        time_interval = normalize_okex_timeframe(request.args.get('time_interval', '15m'))
+        if time_interval is None:
+            return jsonify({'error': f"不支持的时间周期: {request.args.get('time_interval')}"}), 400
 
-        exchange = ccxt.okx(EXCHANGE_CONFIG)
-        df = fetch_okex_symbol_history_candle_data(exchange, symbol, time_interval, limit)
+        exchange = get_exchange(EXCHANGE_CONFIG)
+        df = fetch_okex_symbol_history_candle_data_shared(exchange, symbol, time_interval, limit)
 
         if df.empty:
             return jsonify({'error': '未获取到K线数据'})
 
-        df.to_csv(f'./data/{symbol}_{time_interval}.csv', index=False)
+        monitor.candle_store.write_dataframe(symbol, time_interval, df)
 
         kline_data = []
         for _, row in df.iterrows():
@@ -930,7 +757,7 @@ def validate_trendline():
         start_point = data.get('start_point')
         end_point = data.get('end_point')
 
-        df = ccxt_fetch_candle_data(monitor.exchange, symbol, '5m', 1000)
+        df = ccxt_fetch_candle_data_shared(get_exchange(EXCHANGE_CONFIG), symbol, '5m', 1000)
 
         if df.empty:
             return jsonify({'success': False, 'message': '无法获取K线数据进行验证'})
@@ -948,34 +775,32 @@ def validate_trendline():
 @app.route('/api/export', methods=['GET'])
 @require_auth
 def export_trendlines():
-    """导出趋势线配置"""
-    try:
-        file_path = f"data/trendlines_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        manager.export_trendlines(file_path)
-        return jsonify({
-            'success': True,
-            'data': {'file_path': file_path},
-            'message': '配置已导出'
-        })
-    except Exception as e:
-        return jsonify({'success': False, 'message': str(e)})
+    """下载趋势线配置（NDJSON，每行一个配置，流式输出）"""
+    file_name = f"trendlines_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson"
+    return Response(
+        manager.iter_export_lines(),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={file_name}'},
+    )
 
 @app.route('/api/import', methods=['POST'])
 @require_auth
 def import_trendlines():
-    """导入趋势线配置"""
+    """上传导入趋势线配置（multipart 的 file 字段，或请求体直接为NDJSON）"""
     try:
-        data = request.json
-        file_path = data.get('file_path')
-
-        if not file_path:
-            return jsonify({'success': False, 'message': '请提供文件路径'})
+        upload = request.files.get('file')
+        if upload is not None:
+            lines = io.TextIOWrapper(upload.stream, encoding='utf-8')
+        elif request.content_length:
+            lines = io.TextIOWrapper(request.stream, encoding='utf-8')
+        else:
+            return jsonify({'success': False, 'message': '请上传导入文件'})
 
-        imported_count = manager.import_trendlines(file_path)
+        result = manager.import_trendlines_stream(lines)
         return jsonify({
             'success': True,
-            'data': {'imported_count': imported_count},
-            'message': f'成功导入 {imported_count} 个趋势线配置'
+            'data': {'imported_count': result['imported'], 'skipped_count': result['skipped']},
+            'message': f"成功导入 {result['imported']} 个趋势线配置，跳过 {result['skipped']} 个"
         })
 
     except Exception as e:
@@ -1006,10 +831,12 @@ def get_symbol_candles(symbol):
     """获取指定交易对的K线数据"""
     try:
         limit = int(request.args.get('limit', 2000))
-        time_interval = request.args.get('time_interval', '15m')
+        time_interval = normalize_okex_timeframe(request.args.get('time_interval', '15m'))
+        if time_interval is None:
+            return jsonify({'success': False, 'message': f"不支持的时间周期: {request.args.get('time_interval')}"}), 400
 
         monitor = get_global_monitor()
-        df = monitor.get_latest_candle_data(symbol, limit)
+        df = monitor.get_latest_candle_data(symbol, limit, time_interval)
 
         if df is None:
             return jsonify({'success': False, 'message': '无法获取K线数据'})
@@ -1069,30 +896,9 @@ def refresh_symbol_data():
 def get_stochrsi_overview_test():
     """获取StochRSI概览数据 - 测试版本"""
     try:
-        overview_data = {}
-
-        for symbol in STOCHRSI_CONFIG['symbols']:
-            symbol_data = {}
-            for timeframe in STOCHRSI_CONFIG['timeframes']:
-                stochrsi_data = get_stochrsi_data(symbol, timeframe)
-                if stochrsi_data:
-                    symbol_data[timeframe] = stochrsi_data
-                else:
-                    symbol_data[timeframe] = {
-                        'symbol': symbol,
-                        'timeframe': timeframe,
-                        'latest_stochrsi': None,
-                        'latest_timestamp': '',
-                        'tbl_signal': {'has_signal': False},
-                        'dbl_signal': {'has_signal': False}
-                    }
-            overview_data[symbol] = symbol_data
-
-        return jsonify({
-            'success': True,
-            'data': overview_data,
-            'message': 'StochRSI概览数据获取成功'
-        })
+        # 快照文件未变化时直接返回缓存的响应字节
+        body = overview_snapshot.response_body(STOCHRSI_CONFIG['symbols'], STOCHRSI_CONFIG['timeframes'])
+        return app.response_class(body, mimetype='application/json')
 
     except Exception as e:
         return jsonify({
@@ -1105,30 +911,9 @@ def get_stochrsi_overview_test():
 def get_stochrsi_overview():
     """获取StochRSI概览数据"""
     try:
-        overview_data = {}
-
-        for symbol in STOCHRSI_CONFIG['symbols']:
-            symbol_data = {}
-            for timeframe in STOCHRSI_CONFIG['timeframes']:
-                stochrsi_data = get_stochrsi_data(symbol, timeframe)
-                if stochrsi_data:
-                    symbol_data[timeframe] = stochrsi_data
-                else:
-                    symbol_data[timeframe] = {
-                        'symbol': symbol,
-                        'timeframe': timeframe,
-                        'latest_stochrsi': None,
-                        'latest_timestamp': '',
-                        'tbl_signal': {'has_signal': False},
-                        'dbl_signal': {'has_signal': False}
-                    }
-            overview_data[symbol] = symbol_data
-
-        return jsonify({
-            'success': True,
-            'data': overview_data,
-            'message': 'StochRSI概览数据获取成功'
-        })
+        # 快照文件未变化时直接返回缓存的响应字节
+        body = overview_snapshot.response_body(STOCHRSI_CONFIG['symbols'], STOCHRSI_CONFIG['timeframes'])
+        return app.response_class(body, mimetype='application/json')
 
     except Exception as e:
         return jsonify({
@@ -1232,8 +1017,7 @@ def refresh_stochrsi_data_test():
 def refresh_stochrsi_data():
     """刷新StochRSI数据"""
     try:
-        from watcher_stochrsi import watch
-        import asyncio
+        from watcher_stochrsi import watch, fetcher
 
         data = request.json or {}
         symbol = data.get('symbol')
@@ -1261,14 +1045,20 @@ def refresh_stochrsi_data():
 
             message = f'{symbol} {timeframe} 数据刷新完成'
         else:
-            # 刷新所有数据
+            # 刷新所有数据：先并发获取全部K线，再逐个计算
+            klines = fetcher.get_klines_batch([
+                (sym, tf, 200 if tf == '1W' else 100)
+                for sym in STOCHRSI_CONFIG['symbols']
+                for tf in STOCHRSI_CONFIG['timeframes']
+            ])
             for sym in STOCHRSI_CONFIG['symbols']:
                 for tf in STOCHRSI_CONFIG['timeframes']:
                     try:
-                        if tf == '1W':
-                            watch(time_interval='1W', symbol=sym, limit=200)
-                        else:
-                            watch(time_interval=tf, symbol=sym, limit=100)
+                        df = klines.get((sym, tf))
+                        if df is None:
+                            print(f"刷新 {sym} {tf} 失败: K线获取失败")
+                            continue
+                        watch(time_interval=tf, symbol=sym, df=df)
                         print(f"已刷新 {sym} {tf}")
                     except Exception as e:
                         print(f"刷新 {sym} {tf} 失败: {e}")
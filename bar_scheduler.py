@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+K线收盘对齐的调度器
+
+每个 (symbol, interval) 任务在K线收盘时刻加一个短暂的结算延迟后到期，到期时间保存在最小堆中，
+调度线程只在最近一个任务到期时醒来，不在K线中途轮询；多个周期可以同时调度。
+等待使用 threading.Event，停止监测或有其他事件时 wake() 立即唤醒。
+
+收盘时间按OKX的K线边界计算：按北京时间（UTC+8）对齐，周线从北京时间周一0点开始。
+"""
+
+import heapq
+import threading
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+BEIJING_OFFSET_MS = 8 * 60 * 60 * 1000
+DAY_MS = 24 * 60 * 60 * 1000
+WEEK_MS = 7 * DAY_MS
+WEEK_ORIGIN_MS = 4 * DAY_MS  # 1970-01-01是周四，向后4天为第一个周一
+
+
+def next_bar_close(now_ms: int, step_ms: int) -> int:
+    """
+    now_ms 所在K线的收盘时间（即下一根K线的开始时间）
+
+    Args:
+        now_ms: 当前UTC毫秒时间戳
+        step_ms: K线周期（毫秒）
+
+    Returns:
+        int: UTC毫秒时间戳
+    """
+    origin = WEEK_ORIGIN_MS if step_ms % WEEK_MS == 0 else 0
+    local_ms = now_ms + BEIJING_OFFSET_MS - origin
+    return (local_ms // step_ms + 1) * step_ms + origin - BEIJING_OFFSET_MS
+
+
+class BarCloseScheduler:
+    """按K线收盘时间唤醒任务的调度器，只在一个线程中调用 wait()，其他线程添加任务后需调用 wake()"""
+
+    def __init__(
+        self,
+        settle_delay: float = 2.0,
+        retry_delay: float = 3.0,
+        max_retries: int = 5,
+        wakeup: Optional[threading.Event] = None,
+        clock=time.time,
+    ):
+        """
+        初始化调度器
+
+        Args:
+            settle_delay: 收盘后等待交易所生成收盘K线的秒数
+            retry_delay: 到期时K线尚未收盘，再次检查的间隔秒数
+            max_retries: 最多重试次数，超过后等待下一根K线收盘
+            wakeup: 唤醒用的Event，可与其他事件共用
+            clock: 返回当前时间（秒）的函数
+        """
+        self.settle_delay = settle_delay
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self.wakeup = wakeup or threading.Event()
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.heap = []  # [(到期时间, 序号, key)]，过期的条目在弹出时丢弃
+        self.jobs = {}  # {key: (到期时间, 周期毫秒, 收盘时间毫秒, 重试次数)}
+        self._seq = 0
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def _now_ms(self) -> int:
+        return int(self.clock() * 1000)
+
+    def _push(self, key: Hashable, step_ms: int, close_ms: int, due: float, retries: int = 0):
+        with self.lock:
+            self.jobs[key] = (due, step_ms, close_ms, retries)
+            self._seq += 1
+            heapq.heappush(self.heap, (due, self._seq, key))
+
+    def add(self, key: Hashable, step_ms: int):
+        """
+        添加任务，在当前K线收盘后到期；任务已存在时重新计算
+
+        Args:
+            key: 任务标识，如 (symbol, interval)
+            step_ms: K线周期（毫秒）
+        """
+        close_ms = next_bar_close(self._now_ms(), step_ms)
+        self._push(key, step_ms, close_ms, close_ms / 1000 + self.settle_delay)
+
+    def remove(self, key: Hashable):
+        """移除任务"""
+        with self.lock:
+            self.jobs.pop(key, None)
+
+    def done(self, key: Hashable):
+        """本根K线已处理完毕，等待下一根K线收盘"""
+        job = self.jobs.get(key)
+        if job is None:
+            return
+        _, step_ms, close_ms, _ = job
+        close_ms = max(close_ms + step_ms, next_bar_close(self._now_ms(), step_ms))
+        self._push(key, step_ms, close_ms, close_ms / 1000 + self.settle_delay)
+
+    def retry(self, key: Hashable):
+        """到期时K线尚未收盘，retry_delay 秒后再检查；超过重试次数时放弃这根K线"""
+        job = self.jobs.get(key)
+        if job is None:
+            return
+        _, step_ms, close_ms, retries = job
+        if retries >= self.max_retries:
+            print(f"{key}: 收盘后重试 {retries} 次仍未获取到收盘K线，等待下一根")
+            self.done(key)
+            return
+        self._push(key, step_ms, close_ms, self.clock() + self.retry_delay, retries + 1)
+
+    def next_due(self) -> Optional[float]:
+        """最近一个任务的到期时间（秒），没有任务时返回None"""
+        with self.lock:
+            while self.heap:
+                due, _, key = self.heap[0]
+                if key in self.jobs and self.jobs[key][0] == due:
+                    return due
+                heapq.heappop(self.heap)
+            return None
+
+    def pop_due(self) -> List[Tuple[Hashable, int]]:
+        """
+        取出所有已到期的任务，任务保留在调度器中，由调用方 done() 或 retry()
+
+        Returns:
+            [(key, 收盘时间毫秒)]
+        """
+        now = self.clock()
+        due_jobs = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                due, _, key = heapq.heappop(self.heap)
+                job = self.jobs.get(key)
+                if job is not None and job[0] == due:
+                    due_jobs.append((key, job[2]))
+        return due_jobs
+
+    def wait(self, timeout: Optional[float] = None) -> List[Tuple[Hashable, int]]:
+        """
+        等待到最近一个任务到期，wake() 或 timeout 时提前返回
+
+        Args:
+            timeout: 最长等待秒数，None表示一直等到任务到期或被唤醒
+
+        Returns:
+            已到期的任务 [(key, 收盘时间毫秒)]，提前返回时可能为空
+        """
+        due_jobs = self.pop_due()
+        if due_jobs:
+            return due_jobs
+
+        next_due = self.next_due()
+        delay = None if next_due is None else max(next_due - self.clock(), 0)
+        if timeout is not None:
+            delay = timeout if delay is None else min(delay, timeout)
+        self.wakeup.wait(delay)
+        self.wakeup.clear()
+        return self.pop_due()
+
+    def wake(self):
+        """立即唤醒 wait()"""
+        self.wakeup.set()
+
+    def snapshot(self) -> Dict[Hashable, float]:
+        """各任务的下次到期时间（秒）"""
+        with self.lock:
+            return {key: job[0] for key, job in self.jobs.items()}
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+突破日志模块
+
+只追加写入的监测日志，按月分区为独立的SQLite文件（data/monitor_logs/2025-01.db），
+每个分区内按写入序号（即写入时间顺序）和 trendline_id 建立索引。
+写入只插入一行，按时间倒序分页查询只读取 limit 行，与历史日志的总量无关。
+首次使用时自动从旧的 monitor_logs.csv 迁移数据。
+"""
+
+import glob
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from trendline_store import connect_sqlite
+
+
+# 日志表的列，顺序与旧CSV文件一致
+LOG_COLUMNS = ['id', 'trendline_id', 'signal_type', 'price', 'trendline_value', 'detected_at']
+
+
+def _to_db_value(value):
+    """将字段值转换为可存入SQLite的类型"""
+    if value is None:
+        return None
+    if isinstance(value, float) and pd.isna(value):
+        return None
+    if hasattr(value, 'item'):
+        # numpy标量
+        return value.item()
+    return value
+
+
+class BreakoutLog:
+    """按月分区、只追加的突破日志"""
+
+    def __init__(self, log_dir: str):
+        """
+        初始化日志目录
+
+        Args:
+            log_dir: 分区文件所在目录，如 data/monitor_logs
+        """
+        self.log_dir = log_dir
+        os.makedirs(log_dir, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._known = set(self.partitions())  # 已建表的分区
+
+    def partitions(self) -> List[str]:
+        """已有的分区，按时间倒序，如 ['2025-02', '2025-01']"""
+        files = glob.glob(os.path.join(self.log_dir, '*.db'))
+        return sorted((os.path.basename(f)[:-3] for f in files), reverse=True)
+
+    @staticmethod
+    def partition_of(detected_at: str) -> str:
+        """日志所属分区：detected_at 的年月"""
+        return str(detected_at)[:7]
+
+    def _conn(self, partition: str):
+        """每个线程对每个分区使用自己的连接"""
+        conns = getattr(self._local, 'conns', None)
+        if conns is None:
+            conns = self._local.conns = {}
+        conn = conns.get(partition)
+        if conn is None:
+            conn = conns[partition] = connect_sqlite(os.path.join(self.log_dir, f"{partition}.db"))
+            if partition not in self._known:
+                self._init_schema(conn)
+                self._known.add(partition)
+        return conn
+
+    @staticmethod
+    def _init_schema(conn):
+        # seq 即 rowid，只追加不删除，因此seq顺序就是写入时间顺序
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS logs ("
+                "seq INTEGER PRIMARY KEY, id TEXT, trendline_id TEXT, signal_type TEXT, "
+                "price REAL, trendline_value REAL, detected_at TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_trendline_seq ON logs(trendline_id, seq)")
+
+    def append(self, log: Dict):
+        """
+        追加一条日志
+
+        Args:
+            log: 日志字段字典，detected_at 决定写入的分区
+        """
+        self.append_many([log])
+
+    def append_many(self, logs: List[Dict]) -> int:
+        """
+        批量追加日志，调用方需保证同一分区内按时间顺序传入
+
+        Returns:
+            int: 写入的日志数量
+        """
+        grouped = {}
+        for log in logs:
+            row = [_to_db_value(log.get(column)) for column in LOG_COLUMNS]
+            grouped.setdefault(self.partition_of(log['detected_at']), []).append(row)
+
+        placeholders = ', '.join('?' for _ in LOG_COLUMNS)
+        with self._write_lock:
+            for partition, rows in grouped.items():
+                with self._conn(partition) as conn:
+                    conn.executemany(f"INSERT INTO logs ({', '.join(LOG_COLUMNS)}) VALUES ({placeholders})", rows)
+        return sum(len(rows) for rows in grouped.values())
+
+    def query(
+        self,
+        trendline_id: Optional[str] = None,
+        limit: int = 100,
+        before: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        按时间倒序分页查询日志
+
+        Args:
+            trendline_id: 只返回该趋势线的日志，None表示全部
+            limit: 每页数量
+            before: 上一页返回的游标，None表示从最新的日志开始
+
+        Returns:
+            (日志列表, 下一页游标)；每条日志带 cursor 字段，没有更多日志时下一页游标为None
+        """
+        before_partition, before_seq = None, None
+        if before:
+            before_partition, _, seq = before.partition(':')
+            before_seq = int(seq)
+
+        records = []
+        for partition in self.partitions():
+            if len(records) >= limit:
+                break
+            if before_partition and partition > before_partition:
+                continue
+
+            conditions, params = [], []
+            if trendline_id:
+                conditions.append("trendline_id = ?")
+                params.append(trendline_id)
+            if partition == before_partition:
+                conditions.append("seq < ?")
+                params.append(before_seq)
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            params.append(limit - len(records))
+
+            rows = self._conn(partition).execute(
+                f"SELECT * FROM logs{where} ORDER BY seq DESC LIMIT ?", params
+            ).fetchall()
+            for row in rows:
+                record = {column: row[column] for column in LOG_COLUMNS}
+                record['cursor'] = f"{partition}:{row['seq']}"
+                records.append(record)
+
+        next_cursor = records[-1]['cursor'] if len(records) >= limit else None
+        return records, next_cursor
+
+    def migrate_from_csv(self, csv_path: str) -> int:
+        """
+        从旧的 monitor_logs.csv 导入日志，仅在还没有任何分区时执行
+
+        Returns:
+            int: 导入的日志数量
+        """
+        if self.partitions() or not os.path.exists(csv_path):
+            return 0
+        try:
+            df = pd.read_csv(csv_path)
+        except pd.errors.EmptyDataError:
+            return 0
+        if df.empty:
+            return 0
+
+        df = df.sort_values('detected_at', kind='stable')
+        imported = self.append_many(df.to_dict('records'))
+        print(f"已从 {csv_path} 迁移 {imported} 条监测日志到 {self.log_dir}")
+        return imported
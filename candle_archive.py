@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+本地K线归档读取模块
+
+get_data 和 fill_missing_data_api 把K线按日期目录保存为 data/okx/spot/<日期>/<交易对>_<周期>.csv，
+目录日期是该文件第一根K线的日期（get_data 一次保存的数据可能跨越多天）。
+CandleArchive 按 (交易对, 周期, 开始, 结束) 只打开可能有重叠的分区：
+- 目录日期晚于结束时间的分区直接跳过，不访问文件
+- 有有效清单（见 dataset_manifest）的分区按清单中的时间范围判断，没有重叠时不打开文件
+- 没有清单的旧分区，下一个分区的目录日期不晚于开始时间的日期时视为已在开始时间之前结束，直接跳过
+  （coverage() 会为所有分区建立清单，之后按清单精确判断）
+- 每个CSV首次读取时转换为同名 .npy 缓存（CSV更新后自动重建），之后以内存映射方式打开，
+  只读取文件头和所需时间段对应的页，读取一个月的数据不会加载整个多年的归档
+"""
+
+import glob
+import os
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dataset_manifest import ensure_csv_manifest, read_manifest
+
+
+# 归档K线的定型结构，ts为北京时间（不带时区）的毫秒时间戳
+ARCHIVE_DTYPE = np.dtype([
+    ('ts', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+])
+
+
+def _to_ms(value) -> Optional[int]:
+    """时间转换为北京时间毫秒时间戳，None保持None"""
+    if value is None:
+        return None
+    return int(pd.Timestamp(value).tz_localize(None).value // 1_000_000)
+
+
+def _end_to_ms(value) -> Optional[int]:
+    """结束时间转换为毫秒时间戳，只有日期（如 '2025-03-01'）时取当天最后一毫秒"""
+    if value is None:
+        return None
+    date_only = (
+        (isinstance(value, date) and not isinstance(value, datetime))
+        or (isinstance(value, str) and len(value.strip()) <= 10)
+    )
+    if date_only:
+        return _to_ms(pd.Timestamp(value).normalize() + pd.Timedelta(days=1)) - 1
+    return _to_ms(value)
+
+
+def _symbol_file_name(symbol: str, interval: str) -> str:
+    """与 get_data 一致的文件名，如 BTC-USDT_5m.csv"""
+    return f"{symbol.replace('/', '-')}_{interval}.csv"
+
+
+def csv_to_array(csv_path: str) -> np.ndarray:
+    """
+    读取归档CSV为按时间升序、时间不重复的定型数组
+
+    Args:
+        csv_path: 归档CSV路径，需包含 candle_begin_time、open、high、low、close、volume 列
+
+    Returns:
+        numpy.ndarray: ARCHIVE_DTYPE 结构数组
+    """
+    df = pd.read_csv(csv_path, usecols=['candle_begin_time', 'open', 'high', 'low', 'close', 'volume'])
+    array = np.empty(len(df), dtype=ARCHIVE_DTYPE)
+    times = pd.to_datetime(df['candle_begin_time']).values.astype('datetime64[ms]')
+    array['ts'] = times.astype(np.int64)
+    for column in ('open', 'high', 'low', 'close', 'volume'):
+        array[column] = df[column].to_numpy(dtype=np.float64)
+    return _sorted_unique(array)
+
+
+def _sorted_unique(array: np.ndarray) -> np.ndarray:
+    """按时间升序排列，同一时间保留最后出现的K线"""
+    if len(array) < 2:
+        return array
+    ts = array['ts']
+    if np.all(ts[:-1] < ts[1:]):
+        return array
+    order = np.argsort(ts, kind='stable')
+    array = array[order]
+    # 相同时间的最后一条
+    keep = np.append(array['ts'][:-1] != array['ts'][1:], True)
+    return array[keep]
+
+
+def to_dataframe(array: np.ndarray) -> pd.DataFrame:
+    """定型数组转换为与归档CSV相同列的DataFrame"""
+    return pd.DataFrame({
+        'candle_begin_time': array['ts'].astype('datetime64[ms]').astype('datetime64[ns]'),
+        'open': array['open'],
+        'high': array['high'],
+        'low': array['low'],
+        'close': array['close'],
+        'volume': array['volume'],
+    })
+
+
+class CandleArchive:
+    """按日期分区的本地K线归档"""
+
+    def __init__(self, root: str = os.path.join('data', 'okx', 'spot'), use_cache: bool = True):
+        """
+        初始化归档读取器
+
+        Args:
+            root: 日期目录所在的根目录
+            use_cache: 是否使用 .npy 缓存并以内存映射方式读取；False时每次读取CSV
+        """
+        self.root = root
+        self.use_cache = use_cache
+
+    def partitions(self, symbol: str, interval: str) -> List[Tuple[date, str]]:
+        """
+        交易对和周期对应的所有分区文件
+
+        Returns:
+            [(目录日期, CSV路径)]，按日期升序
+        """
+        file_name = _symbol_file_name(symbol, interval)
+        result = []
+        for path in glob.glob(os.path.join(self.root, '*', file_name)):
+            try:
+                partition_date = date.fromisoformat(os.path.basename(os.path.dirname(path)))
+            except ValueError:
+                continue  # 不是日期目录
+            result.append((partition_date, path))
+        result.sort()
+        return result
+
+    def load_partition(self, csv_path: str) -> np.ndarray:
+        """
+        读取单个分区
+
+        使用缓存时返回只读的内存映射数组，缓存不存在或早于CSV时先重建
+        """
+        if not self.use_cache:
+            return csv_to_array(csv_path)
+
+        cache_path = csv_path[:-4] + '.npy'
+        if not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(csv_path):
+            array = csv_to_array(csv_path)
+            # 先写临时文件再替换，避免并发读取到写了一半的缓存
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, cache_path)
+        return np.load(cache_path, mmap_mode='r')
+
+    def read_array(self, symbol: str, interval: str, start=None, end=None) -> np.ndarray:
+        """
+        读取时间范围内的K线定型数组
+
+        Args:
+            symbol: 交易对，如 'BTC/USDT' 或 'BTC-USDT'
+            interval: 周期，如 '5m'
+            start: 开始时间（含），北京时间，None表示不限
+            end: 结束时间（含），北京时间，只有日期时包含当天全部K线，None表示不限
+
+        Returns:
+            numpy.ndarray: ARCHIVE_DTYPE 结构数组，按时间升序且不重复；
+                           只有一个分区重叠时直接返回内存映射的切片（只读）
+        """
+        start_ms, end_ms = _to_ms(start), _end_to_ms(end)
+        start_date = pd.Timestamp(start).date() if start is not None else None
+        end_date = pd.Timestamp(end).date() if end is not None else None
+
+        pieces = []
+        partitions = self.partitions(symbol, interval)
+        for i, (partition_date, path) in enumerate(partitions):
+            # 目录日期是文件中最早的K线日期，晚于结束时间的分区不会有重叠
+            if end_date is not None and partition_date > end_date:
+                break
+            manifest = read_manifest(path)
+            if manifest is not None:
+                if not manifest['rows'] or (
+                    (start_ms is not None and manifest['max_ts'] < start_ms)
+                    or (end_ms is not None and manifest['min_ts'] > end_ms)
+                ):
+                    continue
+            elif (
+                start_date is not None and i + 1 < len(partitions)
+                and partitions[i + 1][0] <= start_date
+            ):
+                # 没有清单时不打开文件：下一个分区在开始日期当天或之前开始，本分区视为在开始时间之前结束
+                continue
+            array = self.load_partition(path)
+            if len(array) == 0:
+                continue
+            ts = array['ts']
+            if (start_ms is not None and ts[-1] < start_ms) or (end_ms is not None and ts[0] > end_ms):
+                continue
+            lo = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, side='left'))
+            hi = len(ts) if end_ms is None else int(np.searchsorted(ts, end_ms, side='right'))
+            if hi > lo:
+                pieces.append(array[lo:hi])
+
+        if not pieces:
+            return np.empty(0, dtype=ARCHIVE_DTYPE)
+        if len(pieces) == 1:
+            return pieces[0]
+        # 多个分区时间可能重叠（get_data的整段数据与补全的单日数据），合并后去重，后面的分区优先
+        return _sorted_unique(np.concatenate(pieces))
+
+    def coverage(self, symbol: str, interval: str) -> List[Dict]:
+        """
+        各分区的覆盖范围，从清单读取，清单缺失或过期时重建一次
+
+        Returns:
+            [{'path', 'date', 'min_ts', 'max_ts', 'rows', 'gaps'}]，按日期升序，时间为北京时间毫秒时间戳
+        """
+        result = []
+        for partition_date, path in self.partitions(symbol, interval):
+            manifest = ensure_csv_manifest(path, interval)
+            result.append({
+                'path': path,
+                'date': partition_date,
+                'min_ts': manifest['min_ts'],
+                'max_ts': manifest['max_ts'],
+                'rows': manifest['rows'],
+                'gaps': manifest['gaps'],
+            })
+        return result
+
+    def read(self, symbol: str, interval: str, start=None, end=None) -> pd.DataFrame:
+        """
+        读取时间范围内的K线DataFrame，参数同 read_array
+
+        Returns:
+            pandas.DataFrame: candle_begin_time（北京时间）、open、high、low、close、volume
+        """
+        return to_dataframe(self.read_array(symbol, interval, start, end))
+
+
+# 示例：读取一个月的5m数据
+if __name__ == "__main__":
+    import time
+
+    archive = CandleArchive()
+    symbol, interval = 'BTC/USDT', '5m'
+    print(f"{symbol} {interval} 共 {len(archive.partitions(symbol, interval))} 个分区")
+
+    begin = time.perf_counter()
+    df = archive.read(symbol, interval, '2024-01-01', '2024-01-31 23:59:59')
+    print(f"读取 {len(df)} 根K线，耗时 {(time.perf_counter() - begin) * 1000:.1f} 毫秒")
+    if not df.empty:
+        print(df.head())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+K线原始数据解码模块
+
+将OKX接口返回的字符串二维列表一次性解码为定型的NumPy数组：
+int64毫秒时间戳、float64 OHLCV、bool收盘标记，不经过pandas。
+需要DataFrame时再由 to_dataframe() 在边界处构造。
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+# 北京时间固定为UTC+8（1991年后无夏令时），直接平移即可得到不带时区的北京时间
+GMT8_OFFSET_MS = 8 * 60 * 60 * 1000
+
+
+class Candles(NamedTuple):
+    """按列存储的K线数据"""
+
+    ts: np.ndarray  # int64，K线开始时间的UTC毫秒时间戳
+    open: np.ndarray  # float64
+    high: np.ndarray  # float64
+    low: np.ndarray  # float64
+    close: np.ndarray  # float64
+    volume: np.ndarray  # float64
+    confirm: np.ndarray  # bool，True=已收盘
+
+    def __len__(self):
+        return len(self.ts)
+
+
+def empty_candles() -> Candles:
+    """没有数据时的空K线"""
+    f = np.empty(0, dtype=np.float64)
+    return Candles(np.empty(0, dtype=np.int64), f, f, f, f, f, np.empty(0, dtype=bool))
+
+
+def decode_candles(rows: list, sort: bool = True) -> Candles:
+    """
+    解码K线原始数据
+
+    Args:
+        rows: OKX原生接口返回的data字段 [[ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm], ...]，
+              或CCXT标准格式 [[ts, o, h, l, c, vol], ...]（无confirm，视为已收盘）
+        sort: 是否按时间升序排列；OKX接口返回时间倒序
+
+    Returns:
+        Candles: 按列存储的定型数组
+
+    Raises:
+        ValueError: 数据列数不足或各行长度不一致
+    """
+    if len(rows) == 0:
+        return empty_candles()
+
+    table = np.asarray(rows, dtype=object)
+    if table.ndim != 2 or table.shape[1] < 6:
+        raise ValueError(f"K线数据格式不正确，期望至少6列的二维列表，实际形状: {table.shape}")
+
+    # 字符串一次性转换为float64，毫秒时间戳在2^53以内，转换无精度损失
+    values = table[:, :6].astype(np.float64)
+    ts = values[:, 0].astype(np.int64)
+    if table.shape[1] > 8:
+        confirm = table[:, 8].astype(str) == "1"
+    else:
+        confirm = np.ones(len(ts), dtype=bool)
+
+    if sort and len(ts) > 1:
+        if ts[0] > ts[-1] and np.all(ts[:-1] > ts[1:]):
+            order = slice(None, None, -1)  # 严格倒序，直接翻转视图
+        elif np.all(ts[:-1] < ts[1:]):
+            order = slice(None)
+        else:
+            order = np.argsort(ts, kind="stable")
+        values, ts, confirm = values[order], ts[order], confirm[order]
+
+    return Candles(
+        ts=ts,
+        open=values[:, 1],
+        high=values[:, 2],
+        low=values[:, 3],
+        close=values[:, 4],
+        volume=values[:, 5],
+        confirm=confirm,
+    )
+
+
+def to_dataframe(
+    candles: Candles,
+    time_column: str = "candle_begin_time_GMT8",
+    tz_aware: bool = True,
+    include_confirm: bool = False,
+) -> pd.DataFrame:
+    """
+    构造DataFrame
+
+    Args:
+        candles: decode_candles() 的结果
+        time_column: 时间列名，Function.py 使用 candle_begin_time_GMT8，kline_fetcher 使用 datetime
+        tz_aware: True返回带Asia/Shanghai时区的时间，False返回不带时区的北京时间
+        include_confirm: 是否包含confirm列
+
+    Returns:
+        pandas.DataFrame: 时间列、open、high、low、close、volume，可选confirm
+    """
+    if tz_aware:
+        times = pd.to_datetime(candles.ts, unit="ms", utc=True).tz_convert("Asia/Shanghai")
+    else:
+        times = (candles.ts + GMT8_OFFSET_MS).astype("datetime64[ms]").astype("datetime64[ns]")
+
+    data = {
+        time_column: times,
+        "open": candles.open,
+        "high": candles.high,
+        "low": candles.low,
+        "close": candles.close,
+        "volume": candles.volume,
+    }
+    if include_confirm:
+        data["confirm"] = candles.confirm
+    return pd.DataFrame(data)
+
+
+def _decode_with_pandas(rows: list) -> pd.DataFrame:
+    """原先的解码方式：字符串DataFrame逐列astype，再多次时区转换，仅用于基准对比"""
+    df = pd.DataFrame(rows)
+    for col in df.columns:
+        try:
+            df[col] = df[col].astype(float)
+        except:
+            pass
+    df.rename(columns={0: "MTS", 1: "open", 2: "high", 3: "low", 4: "close", 5: "volume"}, inplace=True)
+    df["candle_begin_time"] = pd.to_datetime(df["MTS"], unit="ms")
+    df["candle_begin_time"] = df["candle_begin_time"].dt.tz_localize("UTC")
+    df["candle_begin_time_GMT8"] = df["candle_begin_time"].dt.tz_convert("Asia/Shanghai")
+    return df[["candle_begin_time_GMT8", "open", "high", "low", "close", "volume"]]
+
+
+# 基准测试：300根K线（OKX单次请求上限）的解码耗时
+if __name__ == "__main__":
+    import time
+
+    start_ms = 1700000000000
+    rows = [
+        [str(start_ms + i * 900000), "150.12", "151.3", "149.8", "150.9", "12345.6", "1851.2", "279000.5", "1"]
+        for i in range(300)
+    ][::-1]
+    rows[0][8] = "0"
+    rounds = 2000
+
+    def bench(name, func):
+        func()
+        begin = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        cost = (time.perf_counter() - begin) / rounds * 1e6
+        print(f"{name:<28s} {cost:10.1f} 微秒/次")
+        return cost
+
+    print(f"解码 {len(rows)} 根K线，重复 {rounds} 次")
+    old = bench("pandas逐列astype", lambda: _decode_with_pandas(rows))
+    raw = bench("decode_candles", lambda: decode_candles(rows))
+    full = bench("decode_candles+to_dataframe", lambda: to_dataframe(decode_candles(rows)))
+    print(f"只解码数组提速 {old / raw:.1f} 倍，构造DataFrame提速 {old / full:.1f} 倍")
+
+    # 结果一致性检查
+    expected = _decode_with_pandas(rows).iloc[::-1].reset_index(drop=True)
+    actual = to_dataframe(decode_candles(rows))
+    pd.testing.assert_frame_equal(expected, actual, check_dtype=False, check_column_type=False)
+    print("结果与原解码方式一致")
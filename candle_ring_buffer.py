@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+定长K线环形缓冲区
+
+按列（struct-of-arrays）保存最近 capacity 根K线，每列分配 2*capacity 的空间，
+写入位置 i 时同时写入 i+capacity，任意时刻最近 capacity 根K线在内存中都是连续的，
+读取方可以直接拿到NumPy视图而不复制。追加新K线、原地更新正在形成的K线都是O(1)，
+内存占用固定，与已处理的K线总数无关。
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+class CandleRingBuffer:
+    """单个 (symbol, interval) 的K线环形缓冲区，最后一根可以是未收盘K线"""
+
+    FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, capacity: int):
+        """
+        初始化缓冲区
+
+        Args:
+            capacity: 最多保留的K线根数
+        """
+        if capacity <= 0:
+            raise ValueError(f"capacity 必须大于0: {capacity}")
+        self.capacity = capacity
+        self.ts = np.zeros(2 * capacity, dtype=np.int64)  # UTC毫秒时间戳
+        self.columns = {field: np.zeros(2 * capacity, dtype=np.float64) for field in self.FIELDS}
+        self.start = 0  # 最早一根K线的位置，范围 [0, capacity)
+        self.size = 0
+        self.forming = False  # 最后一根是否未收盘
+        self.gap = False  # 丢弃过未收到收盘确认的K线，需要调用方补齐（见 take_gap）
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def closed_size(self) -> int:
+        """已收盘的K线根数"""
+        return self.size - 1 if self.forming else self.size
+
+    @property
+    def last_ts(self) -> Optional[int]:
+        """最后一根K线（含未收盘）的时间戳"""
+        return int(self.ts[self.start + self.size - 1]) if self.size else None
+
+    @property
+    def last_confirmed_ts(self) -> Optional[int]:
+        """最后一根已收盘K线的时间戳"""
+        n = self.closed_size
+        return int(self.ts[self.start + n - 1]) if n else None
+
+    @property
+    def nbytes(self) -> int:
+        """缓冲区占用的内存字节数（固定，与写入多少根K线无关）"""
+        return self.ts.nbytes + sum(column.nbytes for column in self.columns.values())
+
+    def _write(self, slot: int, ts: int, values):
+        """写入逻辑位置 slot（0..capacity-1）及其镜像位置"""
+        for pos in (slot, slot + self.capacity):
+            self.ts[pos] = ts
+            for field, value in zip(self.FIELDS, values):
+                self.columns[field][pos] = value
+
+    def _push(self, ts: int, values):
+        if self.size < self.capacity:
+            slot = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            # 已满，覆盖最早的一根
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+        self._write(slot, ts, values)
+
+    def upsert(self, ts: int, open_, high, low, close, volume, confirm: bool = True) -> bool:
+        """
+        写入一根K线
+
+        - 与最后一根时间相同：原地更新（未收盘K线的更新或收盘确认）；最后一根已收盘时，
+          迟到的未收盘更新忽略，已收盘的K线不会变回未收盘
+        - 晚于最后一根：追加；如果最后一根未收盘且没有收到收盘确认，丢弃它并标记缺口（gap），
+          本根也不写入，调用方补齐缺失的K线后再继续写入
+        - 早于最后一根：忽略
+
+        Returns:
+            bool: 是否新增了一根已收盘K线
+        """
+        values = (open_, high, low, close, volume)
+        last = self.last_ts
+        if last is not None and ts < last:
+            return False
+
+        if last is not None and ts == last:
+            if not confirm and not self.forming:
+                return False
+            slot = (self.start + self.size - 1) % self.capacity
+            self._write(slot, ts, values)
+            newly_closed = confirm and self.forming
+        else:
+            if self.forming:
+                # 正在形成的K线没有收到收盘确认，它的收盘数据缺失
+                self.size -= 1
+                self.forming = False
+                self.gap = True
+                return False
+            self._push(ts, values)
+            newly_closed = confirm
+
+        self.forming = not confirm
+        return newly_closed
+
+    def extend(self, ts: np.ndarray, open_, high, low, close, volume, confirm=None) -> int:
+        """
+        按时间升序批量写入，规则同 upsert；出现缺口后剩余的K线不再写入
+
+        Returns:
+            int: 新增的已收盘K线根数
+        """
+        if confirm is None:
+            confirm = np.ones(len(ts), dtype=bool)
+        closed = 0
+        for row in zip(ts, open_, high, low, close, volume, confirm):
+            closed += self.upsert(int(row[0]), *row[1:6], confirm=bool(row[6]))
+            if self.gap:
+                break
+        return closed
+
+    def take_gap(self) -> bool:
+        """是否出现了缺口（丢弃了未收盘的K线），读取后清除标记"""
+        gap, self.gap = self.gap, False
+        return gap
+
+    def view(self, field: str = 'close', include_forming: bool = False) -> np.ndarray:
+        """
+        按时间升序的只读视图，不复制数据
+
+        Args:
+            field: ts、open、high、low、close、volume
+            include_forming: 是否包含未收盘K线
+
+        Returns:
+            numpy.ndarray: 连续内存上的视图，缓冲区写入后内容会变化，需要保留时请自行复制
+        """
+        n = self.size if include_forming else self.closed_size
+        array = self.ts if field == 'ts' else self.columns[field]
+        view = array[self.start:self.start + n]
+        view.flags.writeable = False
+        return view
+
+    def to_dataframe(self, include_forming: bool = False) -> pd.DataFrame:
+        """
+        构造与 fetch_okex_symbol_history_candle_data 一致的DataFrame（会复制数据）
+
+        Returns:
+            pandas.DataFrame: candle_begin_time_GMT8、open、high、low、close、volume
+        """
+        data = {
+            'candle_begin_time_GMT8': pd.to_datetime(
+                self.view('ts', include_forming), unit='ms', utc=True
+            ).tz_convert('Asia/Shanghai'),
+        }
+        for field in self.FIELDS:
+            data[field] = self.view(field, include_forming).copy()
+        return pd.DataFrame(data)
+
+
+# 基准测试：逐根写入时的耗时与内存占用不随容量变化
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    for capacity in (1000, 10000, 100000):
+        buffer = CandleRingBuffer(capacity)
+        base_ts = 1700000000000
+        n = 3 * capacity
+        closes = 100 + rng.standard_normal(n).cumsum()
+
+        begin = time.perf_counter()
+        for i in range(n):
+            ts = base_ts + i * 900000
+            # 每根K线先推送两次未收盘更新，再确认收盘
+            buffer.upsert(ts, closes[i], closes[i] + 1, closes[i] - 1, closes[i], 1.0, confirm=False)
+            buffer.upsert(ts, closes[i], closes[i] + 1, closes[i] - 1, closes[i], 2.0, confirm=False)
+            buffer.upsert(ts, closes[i], closes[i] + 1, closes[i] - 1, closes[i], 3.0, confirm=True)
+        cost = (time.perf_counter() - begin) / (3 * n) * 1e6
+
+        assert len(buffer) == capacity
+        assert np.array_equal(buffer.view('close'), closes[-capacity:])
+        assert np.all(np.diff(buffer.view('ts')) == 900000)
+        print(f"容量 {capacity:>6d}: 每次写入 {cost:.2f} 微秒，占用内存 {buffer.nbytes / 1024:.0f} KB")
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+K线持久化存储模块
+
+按 (symbol, interval) 将K线以定长二进制记录追加写入 ./data/klines/{symbol}_{interval}.candles，
+每次写入只追加新收盘的K线、原地更新最后一根正在形成的K线，磁盘IO与新增K线数量成正比，
+读取时通过内存映射和二分查找按时间范围截取。
+每个文件旁边维护一个清单（见 dataset_manifest），随写入增量更新。
+"""
+
+import os
+import threading
+import zlib
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from dataset_manifest import find_gaps, interval_to_ms, read_manifest, write_manifest
+
+
+# 单根K线的二进制记录格式：毫秒时间戳(UTC)、OHLCV、是否已收盘
+CANDLE_DTYPE = np.dtype([
+    ('ts', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+    ('confirm', 'u1'),
+])
+
+
+def gmt8_to_milliseconds(times) -> np.ndarray:
+    """
+    将北京时间（带或不带时区）的时间序列转换为UTC毫秒时间戳
+
+    Args:
+        times: candle_begin_time_GMT8 列或任意可被 pd.to_datetime 解析的时间序列
+
+    Returns:
+        numpy.ndarray: int64 毫秒时间戳
+    """
+    times = pd.to_datetime(pd.Series(times))
+    if times.dt.tz is None:
+        times = times.dt.tz_localize('Asia/Shanghai')
+    times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+    return times.values.astype('datetime64[ms]').astype(np.int64)
+
+
+def dataframe_to_records(df: pd.DataFrame) -> np.ndarray:
+    """
+    将K线DataFrame转换为按时间升序的二进制记录
+
+    Args:
+        df: 包含 candle_begin_time_GMT8、open、high、low、close、volume 列的DataFrame，
+            可选 confirm 列，缺省视为已收盘
+
+    Returns:
+        numpy.ndarray: CANDLE_DTYPE 结构化数组
+    """
+    records = np.zeros(len(df), dtype=CANDLE_DTYPE)
+    if len(df) == 0:
+        return records
+
+    records['ts'] = gmt8_to_milliseconds(df['candle_begin_time_GMT8'])
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        records[col] = df[col].to_numpy(dtype=np.float64)
+    records['confirm'] = df['confirm'].to_numpy(dtype=np.uint8) if 'confirm' in df.columns else 1
+
+    # 保证时间升序且唯一（相同时间保留最后一条）
+    records = records[np.argsort(records['ts'], kind='stable')]
+    keep = np.append(records['ts'][1:] != records['ts'][:-1], True)
+    return records[keep]
+
+
+def records_to_dataframe(records: np.ndarray) -> pd.DataFrame:
+    """
+    将二进制记录转换为与 fetch_okex_symbol_history_candle_data 一致的DataFrame
+
+    Args:
+        records: CANDLE_DTYPE 结构化数组
+
+    Returns:
+        pandas.DataFrame: 包含 candle_begin_time_GMT8、open、high、low、close、volume 列
+    """
+    df = pd.DataFrame({
+        'candle_begin_time_GMT8': pd.to_datetime(records['ts'], unit='ms', utc=True).tz_convert('Asia/Shanghai'),
+        'open': records['open'],
+        'high': records['high'],
+        'low': records['low'],
+        'close': records['close'],
+        'volume': records['volume'],
+    })
+    return df
+
+
+class CandleStore:
+    """按 (symbol, interval) 追加写入的K线存储"""
+
+    # 同一进程内所有实例共享文件锁，避免监测线程与Web请求同时写同一个文件
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, root: str = "./data/klines"):
+        """
+        初始化K线存储
+
+        Args:
+            root: 存储目录
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, symbol: str, interval: str) -> str:
+        """获取 (symbol, interval) 对应的存储文件路径"""
+        return os.path.join(self.root, f"{symbol}_{interval}.candles")
+
+    def _lock(self, path: str) -> threading.Lock:
+        with self._locks_guard:
+            if path not in self._locks:
+                self._locks[path] = threading.Lock()
+            return self._locks[path]
+
+    def count(self, symbol: str, interval: str) -> int:
+        """已存储的K线根数"""
+        path = self.path(symbol, interval)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // CANDLE_DTYPE.itemsize
+
+    def last_record(self, symbol: str, interval: str) -> Optional[np.void]:
+        """读取最后一根K线，只读取文件末尾一条记录"""
+        path = self.path(symbol, interval)
+        n = self.count(symbol, interval)
+        if n == 0:
+            return None
+        with open(path, 'rb') as f:
+            f.seek((n - 1) * CANDLE_DTYPE.itemsize)
+            return np.frombuffer(f.read(CANDLE_DTYPE.itemsize), dtype=CANDLE_DTYPE)[0]
+
+    def last_timestamp(self, symbol: str, interval: str) -> Optional[int]:
+        """最后一根K线的毫秒时间戳，无数据时返回None"""
+        record = self.last_record(symbol, interval)
+        return int(record['ts']) if record is not None else None
+
+    def write(self, symbol: str, interval: str, records: np.ndarray) -> int:
+        """
+        写入K线记录
+
+        早于已存储最后一根K线的记录视为历史数据直接忽略；与最后一根时间相同的记录原地覆盖
+        （更新正在形成的K线）；更新的记录追加到文件末尾。
+
+        Args:
+            symbol: 交易对
+            interval: 时间周期
+            records: 按时间升序的 CANDLE_DTYPE 结构化数组
+
+        Returns:
+            int: 实际写入（覆盖+追加）的记录数
+        """
+        if len(records) == 0:
+            return 0
+
+        path = self.path(symbol, interval)
+        itemsize = CANDLE_DTYPE.itemsize
+
+        with self._lock(path):
+            manifest = read_manifest(path)
+            mode = 'r+b' if os.path.exists(path) else 'w+b'
+            with open(path, mode) as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                n = size // itemsize
+                if size % itemsize:
+                    # 上次写入中断留下的不完整记录，截断
+                    f.truncate(n * itemsize)
+
+                written = 0
+                if n > 0:
+                    f.seek((n - 1) * itemsize)
+                    last_ts = np.frombuffer(f.read(itemsize), dtype=CANDLE_DTYPE)[0]['ts']
+
+                    # 原地更新最后一根K线
+                    same = records[records['ts'] == last_ts]
+                    if len(same):
+                        f.seek((n - 1) * itemsize)
+                        f.write(same[-1:].tobytes())
+                        written += 1
+
+                    records = records[records['ts'] > last_ts]
+
+                # 追加新K线
+                if len(records):
+                    f.seek(n * itemsize)
+                    f.write(records.tobytes())
+                    written += len(records)
+
+            if written:
+                if manifest is None or manifest.get('rows') != n:
+                    manifest = None  # 清单缺失或与文件不一致，完整重建
+                self._update_manifest(path, interval, manifest)
+
+        return written
+
+    @staticmethod
+    def _update_manifest(path: str, interval: str, manifest: Optional[Dict]):
+        """
+        写入后增量更新清单，只读取上次最后一根K线及之后的记录
+
+        清单额外保存 prefix_crc32（除最后一根以外所有记录的crc32），最后一根正在形成的K线
+        被原地覆盖时，只需从它开始继续计算校验和。
+
+        Args:
+            path: 数据文件路径
+            interval: 周期
+            manifest: 写入前有效的清单，None时读取整个文件重建
+        """
+        itemsize = CANDLE_DTYPE.itemsize
+        if manifest is None:
+            start, prefix_crc, gaps, min_ts = 0, 0, [], None
+        else:
+            start = manifest['rows'] - 1
+            prefix_crc, gaps, min_ts = manifest['prefix_crc32'], manifest['gaps'], manifest['min_ts']
+
+        with open(path, 'rb') as f:
+            f.seek(start * itemsize)
+            chunk = f.read()
+        chunk = chunk[:len(chunk) // itemsize * itemsize]
+        if not chunk:
+            return
+        tail = np.frombuffer(chunk, dtype=CANDLE_DTYPE)['ts']
+
+        prefix_crc = zlib.crc32(chunk[:-itemsize], prefix_crc)
+        step_ms = interval_to_ms(interval)
+        write_manifest(path, {
+            'interval': interval,
+            'timezone': 'UTC',
+            'rows': start + len(tail),
+            'min_ts': int(tail[0]) if min_ts is None else min_ts,
+            'max_ts': int(tail[-1]),
+            'gaps': gaps + find_gaps(tail, step_ms) if step_ms is not None else None,
+            'crc32': zlib.crc32(chunk[-itemsize:], prefix_crc),
+            'prefix_crc32': prefix_crc,
+        })
+
+    def manifest(self, symbol: str, interval: str) -> Optional[Dict]:
+        """(symbol, interval) 的清单：时间范围、行数、缺口、校验和，无数据或清单过期时返回None"""
+        return read_manifest(self.path(symbol, interval))
+
+    def write_dataframe(self, symbol: str, interval: str, df: pd.DataFrame) -> int:
+        """写入K线DataFrame，规则同 write()"""
+        if df is None or df.empty:
+            return 0
+        return self.write(symbol, interval, dataframe_to_records(df))
+
+    def read(
+        self,
+        symbol: str,
+        interval: str,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        copy: bool = True,
+    ) -> np.ndarray:
+        """
+        按时间范围读取K线记录
+
+        Args:
+            symbol: 交易对
+            interval: 时间周期
+            start_ms: 起始毫秒时间戳（包含），None表示从头开始
+            end_ms: 结束毫秒时间戳（不包含），None表示到最新
+            copy: 为False时返回内存映射视图，不复制数据
+
+        Returns:
+            numpy.ndarray: CANDLE_DTYPE 结构化数组
+        """
+        n = self.count(symbol, interval)
+        if n == 0:
+            return np.zeros(0, dtype=CANDLE_DTYPE)
+
+        records = np.memmap(self.path(symbol, interval), dtype=CANDLE_DTYPE, mode='r', shape=(n,))
+        ts = records['ts']
+        lo = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, side='left'))
+        hi = n if end_ms is None else int(np.searchsorted(ts, end_ms, side='left'))
+        selected = records[lo:hi]
+        return np.array(selected) if copy else selected
+
+    def read_latest(self, symbol: str, interval: str, limit: int) -> np.ndarray:
+        """读取最近 limit 根K线记录"""
+        n = self.count(symbol, interval)
+        if n == 0:
+            return np.zeros(0, dtype=CANDLE_DTYPE)
+        records = np.memmap(self.path(symbol, interval), dtype=CANDLE_DTYPE, mode='r', shape=(n,))
+        return np.array(records[max(0, n - limit):])
+
+    def read_dataframe(
+        self,
+        symbol: str,
+        interval: str,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """按时间范围读取K线，返回DataFrame"""
+        return records_to_dataframe(self.read(symbol, interval, start_ms, end_ms))
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+K线数据集清单（manifest）模块
+
+每个K线数据文件旁边维护一个 <文件名>.manifest.json，记录：
+- 时间范围（min_ts / max_ts，毫秒时间戳）、行数、周期
+- 缺口列表 gaps：[[缺失开始, 缺失结束], ...]，两端均为缺失K线的时间（包含），周期无法识别时为None
+- 数据文件的 crc32 校验和，以及写入时的文件大小和修改时间
+
+所有写入方（get_data、fill_missing_data_api、CandleStore）写完数据后立即更新清单，
+清单先写临时文件再原子替换。读取方只需一次 stat 比对文件大小和修改时间即可确认清单有效，
+查询覆盖范围、续传起点时不再读取数据文件；清单缺失或过期时返回None，由调用方重建。
+"""
+
+import json
+import os
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+MANIFEST_SUFFIX = '.manifest.json'
+
+_UNIT_MS = {'m': 60 * 1000, 'h': 3600 * 1000, 'd': 86400 * 1000, 'w': 7 * 86400 * 1000}
+
+
+def manifest_path(data_path: str) -> str:
+    """数据文件对应的清单路径"""
+    return data_path + MANIFEST_SUFFIX
+
+
+def interval_to_ms(interval: str) -> Optional[int]:
+    """周期（5m、1h、4H、1D、1W）转换为毫秒，无法识别时返回None（如月线）"""
+    match = re.fullmatch(r'(\d+)([mhHdDwW])', interval or '')
+    if not match:
+        return None
+    value, unit = match.groups()
+    return int(value) * _UNIT_MS[unit.lower()]
+
+
+def find_gaps(ts: np.ndarray, step_ms: Optional[int]) -> List[List[int]]:
+    """
+    一次diff找出所有缺口
+
+    Args:
+        ts: 升序的毫秒时间戳
+        step_ms: 周期长度，None时不检测缺口
+
+    Returns:
+        [[缺失开始, 缺失结束], ...]
+    """
+    if step_ms is None or len(ts) < 2:
+        return []
+    ts = np.asarray(ts, dtype=np.int64)
+    gap_idx = np.nonzero(np.diff(ts) > step_ms)[0]
+    return [[int(ts[i]) + step_ms, int(ts[i + 1]) - step_ms] for i in gap_idx]
+
+
+def build_manifest(ts: np.ndarray, interval: str, crc32: int, timezone: str, **extra) -> Dict:
+    """
+    根据时间戳构造清单（不含文件大小和修改时间，由 write_manifest 补充）
+
+    Args:
+        ts: 毫秒时间戳（重复的时间只计一次）
+        interval: 周期
+        crc32: 数据文件的校验和
+        timezone: 时间戳对应的时区，归档CSV为北京时间（Asia/Shanghai），CandleStore为UTC
+        extra: 写入方需要额外保存的字段
+    """
+    ts = np.unique(np.asarray(ts, dtype=np.int64))
+    step_ms = interval_to_ms(interval)
+    manifest = {
+        'interval': interval,
+        'timezone': timezone,
+        'rows': int(len(ts)),
+        'min_ts': int(ts[0]) if len(ts) else None,
+        'max_ts': int(ts[-1]) if len(ts) else None,
+        'gaps': find_gaps(ts, step_ms) if step_ms is not None else None,  # None表示周期无法识别，未检测缺口
+        'crc32': int(crc32),
+    }
+    manifest.update(extra)
+    return manifest
+
+
+def write_manifest(data_path: str, manifest: Dict) -> Dict:
+    """
+    原子写入清单，同时记录数据文件当前的大小和修改时间
+
+    Returns:
+        写入的清单
+    """
+    stat = os.stat(data_path)
+    manifest = dict(manifest, file_size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    path = manifest_path(data_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def read_manifest(data_path: str) -> Optional[Dict]:
+    """
+    读取清单，只有数据文件的大小和修改时间与清单记录一致时才返回
+
+    Returns:
+        清单字典；清单不存在、损坏或数据文件在清单之后被修改时返回None
+    """
+    try:
+        with open(manifest_path(data_path), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        stat = os.stat(data_path)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('file_size') != stat.st_size or manifest.get('mtime_ns') != stat.st_mtime_ns:
+        return None
+    return manifest
+
+
+def file_crc32(data_path: str, chunk_size: int = 1 << 20) -> int:
+    """分块计算文件的crc32"""
+    crc = 0
+    with open(data_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def verify(data_path: str) -> bool:
+    """重新计算数据文件的crc32并与清单比较"""
+    manifest = read_manifest(data_path)
+    return manifest is not None and manifest['crc32'] == file_crc32(data_path)
+
+
+def ms_to_time_string(ms: Optional[int]) -> Optional[str]:
+    """毫秒时间戳转换为 'YYYY-MM-DD HH:MM:SS'（不转换时区）"""
+    if ms is None:
+        return None
+    return pd.Timestamp(ms, unit='ms').strftime('%Y-%m-%d %H:%M:%S')
+
+
+def csv_times_to_ms(times: Iterable) -> np.ndarray:
+    """归档CSV的 candle_begin_time（北京时间，不带时区）转换为毫秒时间戳"""
+    times = pd.to_datetime(pd.Series(times))
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert('Asia/Shanghai').dt.tz_localize(None)
+    return times.values.astype('datetime64[ms]').astype(np.int64)
+
+
+def write_csv(df: pd.DataFrame, csv_path: str, interval: str, time_column: str = 'candle_begin_time') -> Dict:
+    """
+    保存K线CSV并更新清单
+
+    CSV先写临时文件再原子替换，校验和在写入前由内存中的内容计算，不需要再读一遍文件。
+
+    Args:
+        df: K线DataFrame
+        csv_path: CSV路径
+        interval: 周期
+        time_column: 时间列（北京时间）
+
+    Returns:
+        写入的清单
+    """
+    content = df.to_csv(index=False).encode('utf-8')
+    tmp_path = f"{csv_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, csv_path)
+    manifest = build_manifest(
+        csv_times_to_ms(df[time_column]), interval, zlib.crc32(content), 'Asia/Shanghai'
+    )
+    return write_manifest(csv_path, manifest)
+
+
+def ensure_csv_manifest(csv_path: str, interval: str, time_column: str = 'candle_begin_time') -> Dict:
+    """
+    读取CSV的清单，缺失或过期时读取一次CSV重建
+
+    Returns:
+        有效的清单
+    """
+    manifest = read_manifest(csv_path)
+    if manifest is not None:
+        return manifest
+    times = pd.read_csv(csv_path, usecols=[time_column])[time_column]
+    return write_manifest(
+        csv_path, build_manifest(csv_times_to_ms(times), interval, file_crc32(csv_path), 'Asia/Shanghai')
+    )
@@ -6,12 +6,14 @@ K线图绘制演示
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from candle_store import CandleStore
+from trendline_store import TrendlineStore
 
 def plot_kline_from_csv():
     """从CSV文件读取数据并绘制K线图"""
 
     # 读取数据
-    df = pd.read_csv('./data/klines/SOL-USDT-SWAP_15m_candles.csv')
+    df = CandleStore('./data/klines').read_dataframe('SOL-USDT-SWAP', '15m')
 
     # 转换时间列
     df['candle_begin_time_GMT8'] = pd.to_datetime(df['candle_begin_time_GMT8'])
@@ -49,7 +51,9 @@ def plot_kline_from_csv():
 
     # 读取趋势线数据
     try:
-        trendlines_df = pd.read_csv('data/trendlines.csv')
+        trendlines_df = pd.DataFrame(TrendlineStore('data/trendlines.db').query(status='active'))
+        if trendlines_df.empty:
+            raise FileNotFoundError('data/trendlines.db')
 
         # 绘制趋势线
         for _, trendline in trendlines_df.iterrows():
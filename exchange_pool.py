@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+交易所客户端池
+
+按配置在进程内共享一个 requests.Session（HTTP连接池），所有线程（监测线程、线程池、
+Flask按请求创建的线程）的客户端都挂在它上面，TCP/TLS连接跨线程、跨请求复用；
+requests 的连接池是线程安全的，同时进行的请求各自占用池中的一个连接。
+ccxt 同步客户端本身不是线程安全的（nonce、last_response_headers、markets 等都是实例状态），
+因此每个线程使用自己的客户端实例；交易对元数据（markets）在进程内共享，只需加载一次。
+"""
+
+import json
+import threading
+
+import ccxt
+from requests.adapters import HTTPAdapter
+
+
+# 共享客户端的HTTP连接池大小，需覆盖监测线程池、并发回补与Web请求同时进行的请求数
+POOL_MAXSIZE = 32
+
+_sessions = {}  # {配置key: 共享的 requests.Session}
+_sessions_lock = threading.Lock()
+_local = threading.local()  # 每个线程自己的客户端 {配置key: 客户端}
+_markets = {}  # {配置key: (markets, currencies)}
+_markets_lock = threading.Lock()
+
+
+def _config_key(config: dict) -> str:
+    """将配置转换为可哈希的key，同一配置（同一账户）共享客户端和元数据"""
+    return json.dumps(config or {}, sort_keys=True, default=str)
+
+
+def _shared_session(key: str, exchange: ccxt.okx):
+    """同一配置共用的 requests.Session，第一次调用时由该客户端的session创建连接池"""
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = exchange.session
+                # 复用TCP/TLS连接，避免每次请求重新握手
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _sessions[key] = session
+    return session
+
+
+def _create_exchange(config: dict) -> ccxt.okx:
+    key = _config_key(config)
+    exchange = ccxt.okx(dict(config or {}))
+    exchange.session = _shared_session(key, exchange)
+    share_markets(exchange, config)
+
+    # 加载交易对元数据后放入共享缓存，其他线程的客户端不必重新加载
+    load_markets = exchange.load_markets
+
+    def load_and_remember(*args, **kwargs):
+        markets = load_markets(*args, **kwargs)
+        remember_markets(exchange, config)
+        return markets
+
+    exchange.load_markets = load_and_remember
+    return exchange
+
+
+def share_markets(exchange, config: dict = None):
+    """
+    为客户端设置进程内共享的交易对元数据（已有缓存时）
+
+    没有缓存时由客户端在第一次需要时自行加载，加载后调用 remember_markets() 放入缓存
+
+    Args:
+        exchange: ccxt客户端
+        config: 客户端配置
+    """
+    with _markets_lock:
+        cached = _markets.get(_config_key(config))
+    if cached is not None and exchange.markets is not cached[0]:
+        exchange.set_markets(cached[0], cached[1])
+
+
+def remember_markets(exchange, config: dict = None):
+    """将客户端已加载的交易对元数据放入共享缓存"""
+    if not exchange.markets:
+        return
+    with _markets_lock:
+        _markets.setdefault(_config_key(config), (exchange.markets, exchange.currencies))
+
+
+def get_exchange(config: dict = None) -> ccxt.okx:
+    """
+    获取当前线程的OKX客户端
+
+    每个线程每个配置一个实例（ccxt同步客户端不是线程安全的），同一配置的所有实例
+    共用一个 requests.Session 及其长连接和已加载的交易对元数据，
+    Web端每个请求线程创建的客户端不会新建TLS会话，也不会重新加载markets。
+
+    Args:
+        config: 客户端配置，如 OKEX_READONLY_CONFIG
+
+    Returns:
+        ccxt.okx: 当前线程的客户端
+    """
+    key = _config_key(config)
+    clients = getattr(_local, 'clients', None)
+    if clients is None:
+        clients = _local.clients = {}
+    exchange = clients.get(key)
+    if exchange is None:
+        exchange = clients[key] = _create_exchange(config)
+    return exchange
+
+
+def clear_markets():
+    """清空共享的交易对元数据，下次需要时重新加载（如交易所新上线交易对）"""
+    with _markets_lock:
+        _markets.clear()
@@ -10,9 +10,13 @@ import re
 import glob
 import traceback
 import pytz
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
 from config_constants import OKEX_READONLY_CONFIG
+from dataset_manifest import ensure_csv_manifest, ms_to_time_string, read_manifest, write_csv
+from rate_limiter import RATE_LIMIT_COOLDOWN, get_okx_limiter
 
 pd.set_option("expand_frame_repr", False)  # 当列太多时不换行
 
@@ -24,8 +28,9 @@ exchange = ccxt.okx(OKEX_READONLY_CONFIG)
 def get_last_datetime(exchange, symbol, time_interval):
     file_path = f"./data/{exchange.id}/csv/{symbol.replace('/','-')}_{time_interval}.csv"
     print('file_path', file_path)
-    df = pd.read_csv(file_path)
-    return df["candle_begin_time"].max()
+    # 从清单读取最后一根K线时间，清单缺失或过期时才读取一次CSV并重建清单
+    manifest = ensure_csv_manifest(file_path, time_interval)
+    return ms_to_time_string(manifest["max_ts"])
 
 
 def get_kline(
@@ -45,7 +50,8 @@ def get_kline(
 
         while True:
             try:
-                # 获取数据
+                # 获取数据，ccxt对较早的since使用history-candles接口，按其限频取令牌
+                get_okx_limiter("history-candles").acquire()
                 df = exchange.fetch_ohlcv(
                     symbol=symbol, timeframe=time_interval, since=start_time_since, limit=2000
                 )
@@ -77,8 +83,11 @@ def get_kline(
                     print("抓取完所需数据，或抓取至最新数据，完成抓取任务，退出循环")
                     break
 
-                # 抓取间隔需要暂停2s，防止抓取过于频繁
-                time.sleep(2)
+            # RateLimitExceeded 是 NetworkError 的子类，需要先捕获
+            except ccxt.RateLimitExceeded as e:
+                print(f"超过频率限制: {str(e)}，冷却{RATE_LIMIT_COOLDOWN}秒...")
+                get_okx_limiter("history-candles").cooldown(RATE_LIMIT_COOLDOWN)
+                continue
 
             except ccxt.NetworkError as e:
                 print(f"网络错误: {str(e)}，等待10秒后重试...")
@@ -98,11 +107,6 @@ def get_kline(
                         print(f"从本地文件加载失败: {str(local_e)}")
                 break
 
-            except ccxt.RateLimitExceeded as e:
-                print(f"超过频率限制: {str(e)}，等待60秒...")
-                time.sleep(60)
-                continue
-
             except Exception as e:
                 print(f"获取数据时发生错误: {str(e)}")
                 traceback.print_exc()
@@ -171,7 +175,7 @@ def get_data(
         path = os.path.join(path, file_name)
         print(path)
 
-        df.to_csv(path, index=False)
+        write_csv(df, path, time_interval)
 
 
 def parse_timeframe(timeframe):
@@ -196,14 +200,98 @@ def parse_timeframe(timeframe):
     return None, None
 
 
-def fill_missing_data_api(file_path, exchange=exchange, max_days_per_request=5):
+def find_missing_ranges(times, expected_interval, merge_gap_bars=100):
     """
-    通过API调用补全CSV文件中缺失的K线数据
+    一次向量化diff找出所有缺失的时间段，并合并相邻或相距较近的缺口
+
+    参数:
+    times: 已排序的K线开始时间序列
+    expected_interval: K线周期(timedelta)
+    merge_gap_bars: 两个缺口之间相隔不超过该根数时合并为一个请求区间，
+                    OKX单次请求返回100根，相隔一页以内时合并请求比分开请求更省
+
+    返回:
+    [(start_time, end_time), ...]，两端均为缺失的K线时间（包含）
+    """
+    t = pd.to_datetime(pd.Series(times)).to_numpy(dtype="datetime64[ns]")
+    if len(t) < 2:
+        return []
+
+    step = np.timedelta64(expected_interval)
+    gap_idx = np.nonzero(np.diff(t) > step)[0]
+    if len(gap_idx) == 0:
+        return []
+
+    starts = t[gap_idx] + step
+    ends = t[gap_idx + 1] - step
+
+    # 后一个缺口的起点与前一个缺口的终点相距不超过merge_gap_bars根时合并
+    merge_gap = step * merge_gap_bars
+    new_group = np.empty(len(starts), dtype=bool)
+    new_group[0] = True
+    new_group[1:] = (starts[1:] - ends[:-1]) > merge_gap
+    group_first = np.nonzero(new_group)[0]
+    group_last = np.append(group_first[1:] - 1, len(starts) - 1)
+
+    return [
+        (pd.Timestamp(starts[a]), pd.Timestamp(ends[b]))
+        for a, b in zip(group_first, group_last)
+    ]
+
+
+def split_ranges(ranges, expected_interval, max_days_per_request):
+    """将合并后的区间按最大天数切分，便于并发请求"""
+    chunk = timedelta(days=max_days_per_request)
+    pieces = []
+    for start, end in ranges:
+        current = start
+        while current <= end:
+            current_end = min(end, current + chunk - expected_interval)
+            pieces.append((current, current_end))
+            current = current_end + expected_interval
+    return pieces
+
+
+def _fetch_range(exchange, symbol, time_interval, start, end, expected_interval):
+    """获取[start, end]之间的K线（两端包含，均为北京时间）"""
+    days = (end - start + expected_interval) / timedelta(days=1)
+    # get_kline按UTC解析起始时间，返回的candle_begin_time为北京时间
+    df = get_kline(
+        start_time=str(start - timedelta(hours=8)),
+        exchange=exchange,
+        symbol=symbol,
+        time_interval=time_interval,
+        days=days,
+    )
+    if df is None or df.empty:
+        return None
+    return df[(df["candle_begin_time"] >= start) & (df["candle_begin_time"] <= end)]
+
+
+def _merge_into_file(target_file, new_df, time_interval):
+    """将新数据与已有文件合并，每个文件只读写一次，同时更新清单"""
+    if os.path.exists(target_file):
+        existing_df = pd.read_csv(target_file)
+        existing_df["candle_begin_time"] = pd.to_datetime(existing_df["candle_begin_time"])
+        new_df = pd.concat([existing_df, new_df], ignore_index=True)
+    new_df = new_df.drop_duplicates(subset=["candle_begin_time"], keep="first")
+    new_df = new_df.sort_values("candle_begin_time").reset_index(drop=True)
+    write_csv(new_df, target_file, time_interval)
+    return new_df
+
+
+def fill_missing_data_api(
+    file_path, exchange=exchange, max_days_per_request=5, max_workers=4, merge_gap_bars=100
+):
+    """
+    通过API补全CSV文件中缺失的K线数据
 
     参数:
     file_path: CSV文件路径
     exchange: 交易所对象
     max_days_per_request: 每次API请求最大天数，避免请求过大
+    max_workers: 并发请求的区间数，总请求频率由限频器控制
+    merge_gap_bars: 相距不超过该根数的缺口合并为一次请求
 
     返回:
     补全后的DataFrame
@@ -248,133 +336,72 @@ def fill_missing_data_api(file_path, exchange=exchange, max_days_per_request=5):
         # 排序数据
         df = df.sort_values("candle_begin_time").reset_index(drop=True)
 
-        # 检测缺失的时间段
-        missing_periods = []
-        for i in range(1, len(df)):
-            actual_interval = (
-                df["candle_begin_time"].iloc[i] - df["candle_begin_time"].iloc[i - 1]
-            )
-            if actual_interval > expected_interval:
-                # 计算缺失的起止时间
-                start_time = df["candle_begin_time"].iloc[i - 1] + expected_interval
-                end_time = df["candle_begin_time"].iloc[i] - expected_interval
-
-                # 如果只缺一个点，调整结束时间
-                if start_time > end_time:
-                    end_time = start_time
-
-                missing_periods.append({"start_time": start_time, "end_time": end_time})
-
-        if not missing_periods:
+        # 检测缺失的时间段，相近的缺口合并为尽量少的请求区间
+        missing_ranges = find_missing_ranges(df["candle_begin_time"], expected_interval, merge_gap_bars)
+        if not missing_ranges:
             print(f"文件 {filename} 没有检测到缺失的数据")
             return df
 
-        print(f"检测到 {len(missing_periods)} 个缺失时间段，正在通过API获取数据...")
+        requests = split_ranges(missing_ranges, expected_interval, max_days_per_request)
+        print(
+            f"检测到 {len(missing_ranges)} 个缺失区间，拆分为 {len(requests)} 次请求，"
+            f"并发数 {max_workers}，正在通过API获取数据..."
+        )
 
-        # 获取所有缺失数据
+        # 并发获取所有缺失区间，请求频率由get_kline中的共享限频器控制
         all_missing_data = []
-
-        for period in missing_periods:
-            start_time_str = str(period["start_time"])
-            end_time = period["end_time"]
-
-            # 根据时间跨度可能需要分多次请求
-            current_start = period["start_time"]
-
-            while current_start <= end_time:
-                # 计算当前批次的结束时间，不超过原定结束时间和最大请求天数
-                current_end = min(
-                    end_time, current_start + timedelta(days=max_days_per_request)
-                )
-
-                print(
-                    f"正在请求: {symbol} {time_interval} 从 {current_start} 到 {current_end}"
-                )
-
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    _fetch_range, exchange, symbol, time_interval, start, end, expected_interval
+                ): (start, end)
+                for start, end in requests
+            }
+            for future in as_completed(futures):
+                start, end = futures[future]
                 try:
-                    # 获取这段时间的数据
-                    missing_df = get_kline(
-                        start_time=str(current_start),
-                        exchange=exchange,
-                        symbol=symbol,
-                        time_interval=time_interval,
-                        days=(current_end - current_start).days + 1,
-                    )
-
-                    # 检查是否获取到了数据
-                    if missing_df is not None and not missing_df.empty:
-                        all_missing_data.append(missing_df)
-                        print(f"成功获取到 {len(missing_df)} 条数据")
-
-                        # 保存到相应的日期目录中
-                        for date, group in missing_df.groupby(missing_df["candle_begin_time"].dt.date):
-                            # 构建目标目录路径
-                            target_dir = os.path.join("data", exchange.id, "spot", str(date))
-                            os.makedirs(target_dir, exist_ok=True)
-
-                            # 构建目标文件路径
-                            target_file = os.path.join(target_dir, filename)
-
-                            # 如果文件已存在，则合并数据
-                            if os.path.exists(target_file):
-                                try:
-                                    existing_df = pd.read_csv(target_file)
-                                    existing_df["candle_begin_time"] = pd.to_datetime(existing_df["candle_begin_time"])
-
-                                    # 合并数据
-                                    merged_df = pd.concat([existing_df, group], ignore_index=True)
-                                    merged_df.drop_duplicates(subset=["candle_begin_time"], keep="first", inplace=True)
-                                    merged_df.sort_values("candle_begin_time", inplace=True)
-                                    merged_df.reset_index(drop=True, inplace=True)
-
-                                    # 保存合并后的数据
-                                    merged_df.to_csv(target_file, index=False)
-                                    print(f"已将数据合并到现有文件: {target_file}")
-                                except Exception as e:
-                                    print(f"合并数据到 {target_file} 时出错: {str(e)}")
-                                    # 如果合并失败，直接保存新数据
-                                    group.to_csv(target_file, index=False)
-                            else:
-                                # 直接保存新数据
-                                group.to_csv(target_file, index=False)
-                                print(f"已将数据保存到新文件: {target_file}")
-                    else:
-                        print(f"未能获取到从 {current_start} 到 {current_end} 的数据")
-
+                    missing_df = future.result()
                 except Exception as e:
-                    print(f"获取数据时出错: {str(e)}")
-
-                # 更新下一批次的起始时间
-                current_start = current_end + expected_interval
-
-                # 请求间隔，避免API限制
-                time.sleep(3)
-
-        # 合并所有数据到原始文件
-        if all_missing_data:
-            missing_df_combined = pd.concat(all_missing_data, ignore_index=True)
-
-            # 确保没有重复
-            missing_df_combined.drop_duplicates(
-                subset=["candle_begin_time"], keep="first", inplace=True
-            )
+                    print(f"获取 {start} 到 {end} 的数据时出错: {str(e)}")
+                    continue
+                if missing_df is not None and not missing_df.empty:
+                    all_missing_data.append(missing_df)
+                    print(f"成功获取 {start} 到 {end} 的 {len(missing_df)} 条数据")
+                else:
+                    print(f"未能获取到从 {start} 到 {end} 的数据")
+
+        if not all_missing_data:
+            print(f"没有获取到任何缺失数据，保持原文件不变")
+            return df
 
-            # 与原数据合并
-            combined_df = pd.concat([df, missing_df_combined], ignore_index=True)
-            combined_df.drop_duplicates(
-                subset=["candle_begin_time"], keep="first", inplace=True
-            )
-            combined_df.sort_values("candle_begin_time", inplace=True)
-            combined_df.reset_index(drop=True, inplace=True)
+        # 只保留原文件中确实缺失的K线
+        missing_df_combined = pd.concat(all_missing_data, ignore_index=True)
+        missing_df_combined.drop_duplicates(subset=["candle_begin_time"], keep="first", inplace=True)
+        missing_df_combined = missing_df_combined[
+            ~missing_df_combined["candle_begin_time"].isin(df["candle_begin_time"])
+        ]
+
+        # 按日期保存到相应的日期目录，每个日期文件只读写一次
+        for date, group in missing_df_combined.groupby(missing_df_combined["candle_begin_time"].dt.date):
+            target_dir = os.path.join("data", exchange.id, "spot", str(date))
+            os.makedirs(target_dir, exist_ok=True)
+            target_file = os.path.join(target_dir, filename)
+            try:
+                _merge_into_file(target_file, group, time_interval)
+            except Exception as e:
+                print(f"合并数据到 {target_file} 时出错: {str(e)}")
+                # 如果合并失败，直接保存新数据
+                write_csv(group, target_file, time_interval)
+        print(f"已将缺失数据保存到 {missing_df_combined['candle_begin_time'].dt.date.nunique()} 个日期目录")
 
-            # 保存合并后的数据到原始文件
-            combined_df.to_csv(file_path, index=False)
-            print(f"已将补全后的数据保存到原始文件: {file_path}")
+        # 与原数据合并，一次写回原始文件
+        combined_df = pd.concat([df, missing_df_combined], ignore_index=True)
+        combined_df.sort_values("candle_begin_time", inplace=True)
+        combined_df.reset_index(drop=True, inplace=True)
+        write_csv(combined_df, file_path, time_interval)
+        print(f"已将补全后的数据保存到原始文件: {file_path}，补全 {len(missing_df_combined)} 条")
 
-            return combined_df
-        else:
-            print(f"没有获取到任何缺失数据，保持原文件不变")
-            return df
+        return combined_df
 
     except Exception as e:
         print(f"处理文件 {file_path} 时出错: {str(e)}")
@@ -382,7 +409,7 @@ def fill_missing_data_api(file_path, exchange=exchange, max_days_per_request=5):
         return None
 
 
-def fill_missing_batch_api(directory, exchange=exchange, pattern="*.csv"):
+def fill_missing_batch_api(directory, exchange=exchange, pattern="*.csv", max_files=4):
     """
     批量处理目录中的文件，通过API补全缺失数据
 
@@ -390,6 +417,7 @@ def fill_missing_batch_api(directory, exchange=exchange, pattern="*.csv"):
     directory: 目录路径
     exchange: 交易所对象
     pattern: 文件匹配模式
+    max_files: 同时处理的文件数，所有文件共享同一个限频器
     """
 
     # 获取所有匹配的文件
@@ -399,16 +427,31 @@ def fill_missing_batch_api(directory, exchange=exchange, pattern="*.csv"):
         print(f"在目录 {directory} 中没有找到匹配的文件")
         return
 
+    # 清单有效且没有缺口的文件直接跳过，不读取CSV
+    pending = []
+    for file_path in files:
+        manifest = read_manifest(file_path)
+        if manifest is None or manifest.get("gaps") != []:
+            pending.append(file_path)
+    if len(pending) < len(files):
+        print(f"根据清单跳过 {len(files) - len(pending)} 个没有缺口的文件")
+    files = pending
+    if not files:
+        print("所有文件均没有缺口")
+        return
+
     print(f"找到 {len(files)} 个文件，开始处理...")
 
-    # 处理每个文件
-    for file_path in files:
-        try:
-            fill_missing_data_api(file_path, exchange)
-        except Exception as e:
-            print(f"处理文件 {file_path} 时出错: {str(e)}")
+    # 并发处理多个文件
+    with ThreadPoolExecutor(max_workers=max_files) as executor:
+        futures = {executor.submit(fill_missing_data_api, file_path, exchange): file_path for file_path in files}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"处理文件 {futures[future]} 时出错: {str(e)}")
 
-            traceback.print_exc()
+                traceback.print_exc()
 
     print("批量处理完成")
 
@@ -3,38 +3,77 @@
 最新K线数据获取模块
 
 基于CCXT 4.0.85库封装，提供简洁统一的K线数据获取接口
+同步接口 KlineFetcher 是异步接口 AsyncKlineFetcher 的封装，批量请求并发执行；
+KlineFetcher 在一个常驻的后台事件循环线程中持有一个异步客户端，所有同步调用共用同一个HTTP会话
 """
 
-import ccxt
+import asyncio
+import threading
+import ccxt.async_support as ccxt_async
 import pandas as pd
-import time
 from typing import Optional
 from config_constants import OKEX_READONLY_CONFIG
+from exchange_pool import remember_markets, share_markets
+from candle_decoder import decode_candles, to_dataframe as candles_to_dataframe
+from rate_limiter import RATE_LIMIT_COOLDOWN, get_okx_limiter, is_rate_limit_error
 
 
-class KlineFetcher:
-    """K线数据获取器"""
+def _ohlcv_to_dataframe(ohlcv: list, include_confirm: bool = False) -> pd.DataFrame:
+    """
+    将K线原始数据整理为统一格式的DataFrame
+
+    Args:
+        ohlcv: OKX原生接口或CCXT标准接口返回的K线列表
+        include_confirm: 是否保留confirm列（True=已收盘），CCXT标准格式无此信息时全部视为已收盘
+
+    Returns:
+        pandas.DataFrame: 包含 datetime(北京时间)、open、high、low、close、volume 列，按时间升序
+    """
+    # OKX原生格式 [timestamp, open, high, low, close, volume, volume_ccy, volume_ccy_quote, confirm]
+    # 与CCXT标准格式 [timestamp, open, high, low, close, volume] 都一次性解码为定型数组，并按时间升序
+    candles = decode_candles(ohlcv)
+    # 时间列为不带时区的北京时间
+    return candles_to_dataframe(candles, time_column='datetime', tz_aware=False, include_confirm=include_confirm)
+
+
+class AsyncKlineFetcher:
+    """基于asyncio的K线数据获取器，批量请求并发执行"""
 
-    def __init__(self, exchange_config: Optional[dict] = None):
+    def __init__(self, exchange_config: Optional[dict] = None, max_concurrency: int = 5):
         """
-        初始化K线获取器
+        初始化异步K线获取器
 
         Args:
             exchange_config: 交易所配置字典，如为None则使用默认OKX配置
+            max_concurrency: 同时进行的最大请求数 (默认5)
         """
         if exchange_config is None:
             exchange_config = OKEX_READONLY_CONFIG
 
-        self.exchange = ccxt.okx(exchange_config)
+        self.exchange = ccxt_async.okx(exchange_config)
         self.exchange_config = exchange_config
+        # 复用进程内已加载的交易对元数据，避免每个异步客户端重复加载
+        share_markets(self.exchange, exchange_config)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
 
-    def get_klines(
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """关闭底层HTTP会话"""
+        await self.exchange.close()
+
+    async def get_klines(
         self,
         symbol: str,
         timeframe: str,
         limit: int = 200,
         retries: int = 3,
-        retry_delay: float = 2.0
+        retry_delay: float = 2.0,
+        include_confirm: bool = False
     ) -> Optional[pd.DataFrame]:
         """
         获取最新K线数据
@@ -44,7 +83,8 @@ class KlineFetcher:
             timeframe: 时间周期 (如 '1W', '1D', '4H', '15m', '1h', '5m')
             limit: K线数量，okx接口一次性最多返回300 (默认200)
             retries: 重试次数 (默认3)
-            retry_delay: 重试间隔秒数 (默认2.0)
+            retry_delay: 重试间隔秒数，等待期间不阻塞其他请求 (默认2.0)
+            include_confirm: 是否返回confirm列，标记K线是否已收盘 (默认False)
 
         Returns:
             pandas.DataFrame: 包含OHLCV数据的DataFrame，失败时返回None
@@ -53,64 +93,29 @@ class KlineFetcher:
             try:
                 print(f"正在获取 {symbol} {timeframe} K线数据 (尝试 {attempt + 1}/{retries})...")
 
-                # 使用CCXT标准API获取数据
-                if '/' in symbol:
-                    # 标准格式，如 'BTC/USDT'
-                    ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-                else:
-                    # OKX格式，如 'BTC-USDT-SWAP'
-                    ohlcv = self.exchange.publicGetMarketCandles({
-                        'instId': symbol,
-                        'bar': timeframe,
-                        'limit': limit
-                    })['data']
+                async with self.semaphore:
+                    # 与同步调用方共享candles接口的限频
+                    await get_okx_limiter('candles').acquire_async()
+
+                    # 使用CCXT标准API获取数据
+                    if '/' in symbol:
+                        # 标准格式，如 'BTC/USDT'
+                        ohlcv = await self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+                        remember_markets(self.exchange, self.exchange_config)
+                    else:
+                        # OKX格式，如 'BTC-USDT-SWAP'
+                        response = await self.exchange.publicGetMarketCandles({
+                            'instId': symbol,
+                            'bar': timeframe,
+                            'limit': limit
+                        })
+                        ohlcv = response['data']
 
                 if not ohlcv:
                     print(f"⚠️  未获取到 {symbol} {timeframe} 的数据")
                     return None
 
-                # 转换为DataFrame - OKX返回9列数据
-                if isinstance(ohlcv[0], list) and len(ohlcv[0]) == 9:
-                    # OKX原生API格式：[timestamp, open, high, low, close, volume, volume_ccy, volume_ccy_quote, confirm]
-                    df = pd.DataFrame(ohlcv, columns=[
-                        'timestamp', 'open', 'high', 'low', 'close',
-                        'volume', 'volume_ccy', 'volume_ccy_quote', 'confirm'
-                    ])
-                    # 只使用标准的6列
-                    df = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
-                else:
-                    # 标准CCXT API格式
-                    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-
-                # 转换时间戳
-                df['timestamp'] = pd.to_numeric(df['timestamp'], errors='coerce')
-                df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
-
-                # 转换数据类型
-                numeric_columns = ['open', 'high', 'low', 'close', 'volume']
-                for col in numeric_columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-
-                # 时区转换：UTC -> 北京时间
-                df['datetime_utc'] = df['datetime'].dt.tz_localize('UTC')
-                df['datetime_beijing'] = df['datetime_utc'].dt.tz_convert('Asia/Shanghai')
-                # 去掉时区信息，只保留时间字符串
-                df['datetime_beijing'] = df['datetime_beijing'].dt.tz_localize(None)
-                # df['datetime_beijing_str'] = df['datetime_beijing'].dt.strftime('%Y-%m-%d %H:%M:%S')
-
-                # 重新排列列顺序
-                df = df[[
-                    # 'datetime_beijing_str',
-                    'datetime_beijing', 'open', 'high', 'low', 'close', 'volume'
-                ]]
-
-                # 重命名列
-                df.rename(columns={
-                    # 'datetime_beijing_str': 'time',
-                    'datetime_beijing': 'datetime'
-                }, inplace=True)
-                # 时间排序
-                df.sort_values(by='datetime', inplace=True)
+                df = _ohlcv_to_dataframe(ohlcv, include_confirm)
 
                 print(f"✅ 成功获取 {len(df)} 根 {symbol} {timeframe} K线数据")
                 return df
@@ -119,16 +124,46 @@ class KlineFetcher:
                 error_msg = str(e)
                 print(f"❌ 获取 {symbol} {timeframe} 失败 (尝试 {attempt + 1}/{retries}): {error_msg}")
 
-                if attempt < retries - 1:
+                if attempt < retries - 1 and is_rate_limit_error(e):
+                    # 限频时冷却共享令牌桶，其他请求也会随之等待
+                    print(f"触发限频，冷却 {RATE_LIMIT_COOLDOWN} 秒后重试...")
+                    get_okx_limiter('candles').cooldown(RATE_LIMIT_COOLDOWN)
+                elif attempt < retries - 1:
                     print(f"等待 {retry_delay} 秒后重试...")
-                    time.sleep(retry_delay)
+                    await asyncio.sleep(retry_delay)
                 else:
                     print(f"获取 {symbol} {timeframe} 失败次数过多，已放弃")
                     return None
 
         return None
 
-    def get_latest_price(self, symbol: str) -> Optional[float]:
+    async def get_klines_batch(self, requests: list, limit: int = 200) -> dict:
+        """
+        并发获取多组K线数据
+
+        Args:
+            requests: 请求列表，每项为 (symbol, timeframe) 或 (symbol, timeframe, limit)
+            limit: 未单独指定时使用的K线数量
+
+        Returns:
+            dict: {(symbol, timeframe): DataFrame} 格式的字典，获取失败的项不包含在内
+        """
+        keys = [(request[0], request[1]) for request in requests]
+        limits = [request[2] if len(request) > 2 else limit for request in requests]
+        frames = await asyncio.gather(*[
+            self.get_klines(symbol, timeframe, request_limit)
+            for (symbol, timeframe), request_limit in zip(keys, limits)
+        ])
+
+        results = {}
+        for key, df in zip(keys, frames):
+            if df is not None:
+                results[key] = df
+            else:
+                print(f"⚠️  跳过 {key[0]} {key[1]}，获取失败")
+        return results
+
+    async def get_latest_price(self, symbol: str) -> Optional[float]:
         """
         获取最新价格
 
@@ -140,7 +175,7 @@ class KlineFetcher:
         """
         try:
             # 使用1分钟K线获取最新价格
-            df = self.get_klines(symbol, '1m', limit=1)
+            df = await self.get_klines(symbol, '1m', limit=1)
             if df is not None and len(df) > 0:
                 return float(df['close'].iloc[-1])
         except Exception as e:
@@ -148,14 +183,14 @@ class KlineFetcher:
 
         return None
 
-    def get_multiple_symbols(
+    async def get_multiple_symbols(
         self,
         symbols: list,
         timeframe: str,
         limit: int = 200
     ) -> dict:
         """
-        批量获取多个交易对的K线数据
+        并发获取多个交易对的K线数据
 
         Args:
             symbols: 交易对符号列表
@@ -165,17 +200,164 @@ class KlineFetcher:
         Returns:
             dict: {symbol: DataFrame} 格式的字典
         """
-        results = {}
+        results = await self.get_klines_batch([(symbol, timeframe) for symbol in symbols], limit)
+        return {symbol: results[(symbol, timeframe)] for symbol in symbols if (symbol, timeframe) in results}
 
-        for symbol in symbols:
-            print(f"\n📊 处理交易对: {symbol}")
-            df = self.get_klines(symbol, timeframe, limit)
-            if df is not None:
-                results[symbol] = df
-            else:
-                print(f"⚠️  跳过 {symbol}，获取失败")
+    async def get_multiple_timeframes(
+        self,
+        symbol: str,
+        timeframes: list,
+        limit: int = 200
+    ) -> dict:
+        """
+        并发获取单个交易对的多个时间周期数据
 
-        return results
+        Args:
+            symbol: 交易对符号
+            timeframes: 时间周期列表
+            limit: 每个周期的K线数量
+
+        Returns:
+            dict: {timeframe: DataFrame} 格式的字典
+        """
+        results = await self.get_klines_batch([(symbol, timeframe) for timeframe in timeframes], limit)
+        return {timeframe: results[(symbol, timeframe)] for timeframe in timeframes if (symbol, timeframe) in results}
+
+
+class KlineFetcher:
+    """K线数据获取器（同步接口，内部由常驻事件循环中的AsyncKlineFetcher并发执行）"""
+
+    def __init__(self, exchange_config: Optional[dict] = None, max_concurrency: int = 5):
+        """
+        初始化K线获取器
+
+        Args:
+            exchange_config: 交易所配置字典，如为None则使用默认OKX配置
+            max_concurrency: 批量获取时的最大并发请求数 (默认5)
+        """
+        if exchange_config is None:
+            exchange_config = OKEX_READONLY_CONFIG
+
+        self.exchange_config = exchange_config
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._loop = None  # 后台事件循环，首次调用时启动
+        self._thread = None
+        self._fetcher = None  # 后台事件循环中的异步获取器，所有调用共用
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """启动后台事件循环线程，并在其中创建异步获取器"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="kline-fetcher", daemon=True)
+                thread.start()
+
+                async def create():
+                    return AsyncKlineFetcher(self.exchange_config, self.max_concurrency)
+
+                self._fetcher = asyncio.run_coroutine_threadsafe(create(), loop).result()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def _run(self, func):
+        """
+        在后台事件循环中运行异步获取器的方法并等待结果
+
+        调用线程自身是否有正在运行的事件循环都可以调用
+        """
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(func(self._fetcher), loop).result()
+
+    def close(self):
+        """关闭异步客户端的HTTP会话并停止后台事件循环"""
+        with self._lock:
+            if self._loop is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._fetcher.close(), self._loop).result()
+            finally:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+                self._loop.close()
+                self._loop = self._thread = self._fetcher = None
+
+    def get_klines(
+        self,
+        symbol: str,
+        timeframe: str,
+        limit: int = 200,
+        retries: int = 3,
+        retry_delay: float = 2.0,
+        include_confirm: bool = False
+    ) -> Optional[pd.DataFrame]:
+        """
+        获取最新K线数据
+
+        Args:
+            symbol: 交易对符号 (如 'SOL-USDT-SWAP', 'BTC/USDT')
+            timeframe: 时间周期 (如 '1W', '1D', '4H', '15m', '1h', '5m')
+            limit: K线数量，okx接口一次性最多返回300 (默认200)
+            retries: 重试次数 (默认3)
+            retry_delay: 重试间隔秒数 (默认2.0)
+            include_confirm: 是否返回confirm列，标记K线是否已收盘 (默认False)
+
+        Returns:
+            pandas.DataFrame: 包含OHLCV数据的DataFrame，失败时返回None
+        """
+        return self._run(lambda fetcher: fetcher.get_klines(
+            symbol, timeframe, limit, retries, retry_delay, include_confirm
+        ))
+
+    def get_klines_batch(self, requests: list, limit: int = 200) -> dict:
+        """
+        并发获取多组K线数据
+
+        Args:
+            requests: 请求列表，每项为 (symbol, timeframe) 或 (symbol, timeframe, limit)
+            limit: 未单独指定时使用的K线数量
+
+        Returns:
+            dict: {(symbol, timeframe): DataFrame} 格式的字典
+        """
+        return self._run(lambda fetcher: fetcher.get_klines_batch(requests, limit))
+
+    def get_latest_price(self, symbol: str) -> Optional[float]:
+        """
+        获取最新价格
+
+        Args:
+            symbol: 交易对符号
+
+        Returns:
+            float: 最新价格，失败时返回None
+        """
+        return self._run(lambda fetcher: fetcher.get_latest_price(symbol))
+
+    def get_multiple_symbols(
+        self,
+        symbols: list,
+        timeframe: str,
+        limit: int = 200
+    ) -> dict:
+        """
+        批量获取多个交易对的K线数据（并发执行）
+
+        Args:
+            symbols: 交易对符号列表
+            timeframe: 时间周期
+            limit: K线数量
+
+        Returns:
+            dict: {symbol: DataFrame} 格式的字典
+        """
+        return self._run(lambda fetcher: fetcher.get_multiple_symbols(symbols, timeframe, limit))
 
     def get_multiple_timeframes(
         self,
@@ -184,7 +366,7 @@ class KlineFetcher:
         limit: int = 200
     ) -> dict:
         """
-        获取单个交易对的多个时间周期数据
+        获取单个交易对的多个时间周期数据（并发执行）
 
         Args:
             symbol: 交易对符号
@@ -194,17 +376,7 @@ class KlineFetcher:
         Returns:
             dict: {timeframe: DataFrame} 格式的字典
         """
-        results = {}
-
-        for timeframe in timeframes:
-            print(f"\n📊 处理时间周期: {timeframe}")
-            df = self.get_klines(symbol, timeframe, limit)
-            if df is not None:
-                results[timeframe] = df
-            else:
-                print(f"⚠️  跳过 {timeframe}，获取失败")
-
-        return results
+        return self._run(lambda fetcher: fetcher.get_multiple_timeframes(symbol, timeframes, limit))
 
     def save_to_csv(self, df: pd.DataFrame, filepath: str) -> bool:
         """
@@ -247,6 +419,19 @@ class KlineFetcher:
 
 
 # 便捷函数
+_default = None
+_default_lock = threading.Lock()
+
+
+def _default_fetcher() -> KlineFetcher:
+    """便捷函数共用的获取器，进程内只创建一个"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = KlineFetcher()
+        return _default
+
+
 def get_klines(symbol: str, timeframe: str, limit: int = 200) -> Optional[pd.DataFrame]:
     """
     快捷获取K线数据
@@ -259,8 +444,7 @@ def get_klines(symbol: str, timeframe: str, limit: int = 200) -> Optional[pd.Dat
     Returns:
         pandas.DataFrame: K线数据
     """
-    fetcher = KlineFetcher()
-    return fetcher.get_klines(symbol, timeframe, limit)
+    return _default_fetcher().get_klines(symbol, timeframe, limit)
 
 
 def get_latest_price(symbol: str) -> Optional[float]:
@@ -273,8 +457,7 @@ def get_latest_price(symbol: str) -> Optional[float]:
     Returns:
         float: 最新价格
     """
-    fetcher = KlineFetcher()
-    return fetcher.get_latest_price(symbol)
+    return _default_fetcher().get_latest_price(symbol)
 
 
 # 示例用法
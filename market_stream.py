@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+行情推送模块
+
+通过一条WebSocket连接订阅多个交易对的OKX K线频道，断线后自动重连并重新订阅，
+收到K线推送后立即回调，取代按固定间隔轮询REST接口。
+附带本地WebSocket模拟服务器 LocalCandleServer，便于离线调试。
+"""
+
+import asyncio
+import json
+import threading
+from typing import Callable
+
+import websockets
+from websockets.exceptions import ConnectionClosed
+
+
+# K线频道位于business端点
+OKX_BUSINESS_WS_URL = "wss://ws.okx.com:8443/ws/v5/business"
+
+
+def candle_channel(interval: str) -> str:
+    """时间周期对应的K线频道名，如 15m -> candle15m"""
+    return f"candle{interval}"
+
+
+class CandleStream:
+    """OKX K线推送客户端，在后台线程中运行自己的事件循环"""
+
+    def __init__(
+        self,
+        on_candle: Callable[[str, str, list], None],
+        url: str = OKX_BUSINESS_WS_URL,
+        ping_interval: float = 25,
+        reconnect_delay: float = 1,
+        max_reconnect_delay: float = 30,
+    ):
+        """
+        初始化推送客户端
+
+        Args:
+            on_candle: 回调函数 on_candle(symbol, interval, rows)，rows为OKX原始K线列表，
+                       [[ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm], ...]
+            url: WebSocket地址
+            ping_interval: 无消息时发送ping的间隔秒数，OKX 30秒无消息会断开连接
+            reconnect_delay: 首次重连等待秒数，之后指数退避
+            max_reconnect_delay: 重连最长等待秒数
+        """
+        self.on_candle = on_candle
+        self.url = url
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.subscriptions = set()  # {(symbol, interval)}
+        self.lock = threading.Lock()
+        self.loop = None
+        self.thread = None
+        self.websocket = None
+        self.running = False
+        self.connected = threading.Event()
+
+    def start(self):
+        """启动后台线程"""
+        if self.running:
+            return
+        self.running = True
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5):
+        """停止推送并关闭连接"""
+        self.running = False
+        if self.loop is not None and self.websocket is not None:
+            asyncio.run_coroutine_threadsafe(self.websocket.close(), self.loop)
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self.connected.clear()
+
+    def subscribe(self, symbol: str, interval: str):
+        """订阅 (symbol, interval)，已连接时立即发送订阅请求"""
+        with self.lock:
+            if (symbol, interval) in self.subscriptions:
+                return
+            self.subscriptions.add((symbol, interval))
+        self._send_threadsafe("subscribe", [(symbol, interval)])
+
+    def unsubscribe(self, symbol: str, interval: str):
+        """取消订阅 (symbol, interval)"""
+        with self.lock:
+            if (symbol, interval) not in self.subscriptions:
+                return
+            self.subscriptions.discard((symbol, interval))
+        self._send_threadsafe("unsubscribe", [(symbol, interval)])
+
+    def _send_threadsafe(self, op: str, pairs: list):
+        if self.loop is None or self.websocket is None:
+            # 尚未连接，连接成功后会统一订阅
+            return
+        asyncio.run_coroutine_threadsafe(self._send_op(self.websocket, op, pairs), self.loop)
+
+    @staticmethod
+    async def _send_op(websocket, op: str, pairs: list):
+        if not pairs:
+            return
+        message = {
+            "op": op,
+            "args": [{"channel": candle_channel(interval), "instId": symbol} for symbol, interval in pairs],
+        }
+        try:
+            await websocket.send(json.dumps(message))
+        except ConnectionClosed:
+            # 断线后重连时会重新订阅
+            pass
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._run())
+        finally:
+            self.loop.close()
+
+    async def _run(self):
+        """连接、订阅、接收消息，断线后指数退避重连"""
+        delay = self.reconnect_delay
+        while self.running:
+            try:
+                async with websockets.connect(self.url, ping_interval=None) as websocket:
+                    self.websocket = websocket
+                    with self.lock:
+                        pairs = list(self.subscriptions)
+                    await self._send_op(websocket, "subscribe", pairs)
+                    self.connected.set()
+                    print(f"📡 行情推送已连接: {self.url}，订阅 {len(pairs)} 个频道")
+                    delay = self.reconnect_delay
+                    await self._receive(websocket)
+            except (ConnectionClosed, OSError, asyncio.TimeoutError) as e:
+                if self.running:
+                    print(f"⚠️  行情推送连接断开: {e}")
+            except Exception as e:
+                if self.running:
+                    print(f"❌ 行情推送出错: {e}")
+            finally:
+                self.websocket = None
+                self.connected.clear()
+
+            if self.running:
+                print(f"等待 {delay} 秒后重连...")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _receive(self, websocket):
+        while self.running:
+            try:
+                raw = await asyncio.wait_for(websocket.recv(), timeout=self.ping_interval)
+            except asyncio.TimeoutError:
+                # 长时间没有消息，发送ping保持连接
+                await websocket.send("ping")
+                continue
+
+            if raw == "pong":
+                continue
+
+            message = json.loads(raw)
+            if "event" in message:
+                if message["event"] == "error":
+                    print(f"❌ 行情推送订阅失败: {message.get('msg')}")
+                continue
+
+            arg = message.get("arg", {})
+            channel = arg.get("channel", "")
+            if not channel.startswith("candle") or not message.get("data"):
+                continue
+
+            try:
+                self.on_candle(arg["instId"], channel[len("candle"):], message["data"])
+            except Exception as e:
+                print(f"处理 {arg.get('instId')} K线推送失败: {e}")
+
+
+class LocalCandleServer:
+    """本地模拟的OKX K线推送服务器，用于离线调试 CandleStream"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        """
+        初始化模拟服务器
+
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示随机分配
+        """
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.thread = None
+        self.server = None
+        self.clients = {}  # {websocket: {(symbol, interval)}}
+        self.started = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    def start(self):
+        """在后台线程中启动服务器，返回时已可接受连接"""
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+        self.started.wait()
+
+    def stop(self):
+        """停止服务器"""
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def publish(self, symbol: str, interval: str, row: list):
+        """
+        向订阅了该频道的客户端推送一根K线
+
+        Args:
+            symbol: 交易对
+            interval: 时间周期
+            row: OKX格式K线 [ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm]，元素为字符串
+        """
+        message = json.dumps({
+            "arg": {"channel": candle_channel(interval), "instId": symbol},
+            "data": [row],
+        })
+        asyncio.run_coroutine_threadsafe(self._broadcast((symbol, interval), message), self.loop).result()
+
+    def drop_connections(self):
+        """断开所有客户端连接，用于模拟网络中断"""
+        asyncio.run_coroutine_threadsafe(self._close_clients(), self.loop).result()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            websockets.serve(self._handler, self.host, self.port)
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    async def _handler(self, websocket, path=None):
+        self.clients[websocket] = set()
+        try:
+            async for raw in websocket:
+                if raw == "ping":
+                    await websocket.send("pong")
+                    continue
+
+                message = json.loads(raw)
+                op = message.get("op")
+                for arg in message.get("args", []):
+                    key = (arg["instId"], arg["channel"][len("candle"):])
+                    if op == "subscribe":
+                        self.clients[websocket].add(key)
+                    elif op == "unsubscribe":
+                        self.clients[websocket].discard(key)
+                    await websocket.send(json.dumps({"event": op, "arg": arg, "connId": "local"}))
+        except ConnectionClosed:
+            pass
+        finally:
+            self.clients.pop(websocket, None)
+
+    async def _broadcast(self, key: tuple, message: str):
+        for websocket, subscriptions in list(self.clients.items()):
+            if key in subscriptions:
+                try:
+                    await websocket.send(message)
+                except ConnectionClosed:
+                    pass
+
+    async def _close_clients(self):
+        for websocket in list(self.clients):
+            await websocket.close()
+
+    async def _shutdown(self):
+        await self._close_clients()
+        self.server.close()
+        await self.server.wait_closed()
+
+
+# 示例用法：本地模拟服务器 + 推送客户端
+if __name__ == "__main__":
+    import time
+
+    server = LocalCandleServer()
+    server.start()
+    print(f"模拟服务器已启动: {server.url}")
+
+    def print_candle(symbol, interval, rows):
+        for row in rows:
+            print(f"收到推送 {symbol} {interval}: ts={row[0]} close={row[4]} confirm={row[8]}")
+
+    stream = CandleStream(on_candle=print_candle, url=server.url, reconnect_delay=0.5)
+    stream.subscribe("BTC-USDT-SWAP", "15m")
+    stream.start()
+    stream.connected.wait(5)
+    time.sleep(0.2)
+
+    ts = int(time.time() * 1000) // 900000 * 900000
+    server.publish("BTC-USDT-SWAP", "15m", [str(ts), "100", "101", "99", "100.5", "10", "0", "0", "0"])
+    server.publish("BTC-USDT-SWAP", "15m", [str(ts), "100", "102", "99", "101.5", "12", "0", "0", "1"])
+
+    # 模拟断线，客户端会自动重连并重新订阅
+    server.drop_connections()
+    time.sleep(1.5)
+    stream.connected.wait(5)
+    time.sleep(0.2)
+    server.publish("BTC-USDT-SWAP", "15m", [str(ts + 900000), "101.5", "103", "101", "102", "5", "0", "0", "0"])
+
+    time.sleep(0.5)
+    stream.stop()
+    server.stop()
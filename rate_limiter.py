@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+请求限速模块
+
+基于令牌桶算法，控制并发请求在交易所限频范围内。
+OKX按接口分别限频，get_okx_limiter() 为每类接口提供进程内共享的令牌桶，
+所有访问OKX的代码（同步、线程池、asyncio）都从同一个桶取令牌。
+"""
+
+import asyncio
+import threading
+import time
+
+import ccxt
+
+
+class TokenBucket:
+    """线程安全的令牌桶限速器"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数（即平均每秒允许的请求数）
+            capacity: 桶容量（允许的突发请求数），默认等于rate
+        """
+        if rate <= 0:
+            raise ValueError(f"rate必须大于0: {rate}")
+
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else float(rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """按流逝时间补充令牌（调用方需持有锁）"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        尝试获取令牌，不阻塞
+
+        Args:
+            tokens: 需要的令牌数
+
+        Returns:
+            float: 0表示获取成功，否则为需要等待的秒数
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens: float = 1):
+        """阻塞直到获取到令牌"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1):
+        """在事件循环中等待令牌，等待期间不阻塞其他协程"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def cooldown(self, seconds: float):
+        """
+        清空令牌并冷却一段时间，收到限频错误(429)时调用
+
+        Args:
+            seconds: 冷却秒数，期间所有调用方的获取都会等待
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+# OKX各类接口的限频：(请求次数, 时间窗口秒数)
+OKX_RATE_LIMITS = {
+    "candles": (40, 2),  # GET /api/v5/market/candles，按IP
+    "history-candles": (20, 2),  # GET /api/v5/market/history-candles，按IP
+    "ticker": (20, 2),  # GET /api/v5/market/ticker，按IP
+    "trade": (60, 2),  # 下单、撤单、查询订单，按UID+产品ID
+    "account": (10, 2),  # 账户余额、持仓，按UID
+}
+
+# 收到429后该类接口的冷却秒数，一个限频窗口即可恢复
+RATE_LIMIT_COOLDOWN = 2
+
+_okx_limiters = {}
+_okx_limiters_lock = threading.Lock()
+
+
+def get_okx_limiter(endpoint: str) -> TokenBucket:
+    """
+    获取OKX某类接口的共享令牌桶
+
+    Args:
+        endpoint: OKX_RATE_LIMITS 中的接口类别，如 candles、history-candles
+
+    Returns:
+        TokenBucket: 进程内该类接口唯一的令牌桶
+    """
+    with _okx_limiters_lock:
+        limiter = _okx_limiters.get(endpoint)
+        if limiter is None:
+            if endpoint not in OKX_RATE_LIMITS:
+                raise ValueError(f"未知的OKX接口类别: {endpoint}")
+            count, window = OKX_RATE_LIMITS[endpoint]
+            # 任意窗口内最多取到 容量 + 速率 * 窗口 个令牌，容量与补充各占一半限额，
+            # 满桶突发加上一个窗口的补充不超过限额
+            half = count / 2
+            limiter = _okx_limiters[endpoint] = TokenBucket(half / window, half)
+        return limiter
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """是否为限频错误（HTTP 429 或 OKX错误码 50011）"""
+    return isinstance(error, ccxt.DDoSProtection) or "50011" in str(error)
+
+
+def wait_after_error(endpoint: str, error: Exception, delay: float):
+    """
+    请求失败后的等待：限频错误时冷却该类接口的令牌桶，下次获取令牌时自然等待；
+    其他错误（网络等）按delay秒重试
+
+    Args:
+        endpoint: OKX_RATE_LIMITS 中的接口类别
+        error: 捕获到的异常
+        delay: 非限频错误的重试等待秒数
+    """
+    if is_rate_limit_error(error):
+        print(f"{endpoint} 接口触发限频，冷却 {RATE_LIMIT_COOLDOWN} 秒")
+        get_okx_limiter(endpoint).cooldown(RATE_LIMIT_COOLDOWN)
+    else:
+        time.sleep(delay)
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+多周期K线本地合成模块
+
+每个交易对只维护一条基础周期（如15m）的K线序列，4H、1D、1W等高周期由基础K线在本地增量合成，
+每轮只需请求一次基础周期，各周期的最新K线也始终一致。
+周期边界与OKX一致：按北京时间（UTC+8）对齐，1D从北京时间0点开始，1W从北京时间周一0点开始。
+
+高周期的历史K线在首次使用时从接口获取一次（seed），之后只更新当前未收盘的K线并追加新K线。
+"""
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+
+# 支持的周期及长度（毫秒）
+INTERVAL_MS = {
+    '1m': MINUTE_MS,
+    '3m': 3 * MINUTE_MS,
+    '5m': 5 * MINUTE_MS,
+    '15m': 15 * MINUTE_MS,
+    '30m': 30 * MINUTE_MS,
+    '1H': HOUR_MS,
+    '2H': 2 * HOUR_MS,
+    '4H': 4 * HOUR_MS,
+    '6H': 6 * HOUR_MS,
+    '12H': 12 * HOUR_MS,
+    '1D': DAY_MS,
+    '1W': 7 * DAY_MS,
+}
+
+# 1970-01-01是周四，向后4天为第一个周一
+WEEK_ORIGIN_MS = 4 * DAY_MS
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def interval_ms(interval: str) -> int:
+    """周期长度（毫秒）"""
+    if interval not in INTERVAL_MS:
+        raise ValueError(f"不支持的周期: {interval}，可选: {list(INTERVAL_MS)}")
+    return INTERVAL_MS[interval]
+
+
+def bucket_start(local_ms: np.ndarray, interval: str) -> np.ndarray:
+    """
+    计算K线所属的高周期K线开始时间
+
+    Args:
+        local_ms: 北京时间（不带时区）的毫秒时间戳
+        interval: 目标周期
+
+    Returns:
+        numpy.ndarray: 所属高周期K线的开始时间（北京时间毫秒时间戳）
+    """
+    step = interval_ms(interval)
+    local_ms = np.asarray(local_ms, dtype=np.int64)
+    if interval == '1W':
+        return (local_ms - WEEK_ORIGIN_MS) // step * step + WEEK_ORIGIN_MS
+    return local_ms // step * step
+
+
+def _to_local_ms(times: pd.Series) -> np.ndarray:
+    """不带时区的北京时间列转换为毫秒时间戳"""
+    return times.values.astype('datetime64[ms]').astype(np.int64)
+
+
+def resample(df: pd.DataFrame, interval: str, time_column: str = 'datetime') -> pd.DataFrame:
+    """
+    将按时间升序的基础K线合成为高周期K线
+
+    Args:
+        df: 基础周期K线，时间列为不带时区的北京时间
+        interval: 目标周期，如 '4H'、'1D'、'1W'
+        time_column: 时间列名
+
+    Returns:
+        pandas.DataFrame: 高周期K线，列与输入相同（时间、open、high、low、close、volume）
+    """
+    if df.empty:
+        return df[[time_column] + OHLCV_COLUMNS].copy()
+
+    keys = bucket_start(_to_local_ms(df[time_column]), interval)
+    # 每个高周期K线的第一根基础K线位置
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+    ends = np.concatenate((starts[1:], [len(keys)])) - 1
+
+    return pd.DataFrame({
+        time_column: keys[starts].astype('datetime64[ms]').astype('datetime64[ns]'),
+        'open': df['open'].values[starts],
+        'high': np.maximum.reduceat(df['high'].values, starts),
+        'low': np.minimum.reduceat(df['low'].values, starts),
+        'close': df['close'].values[ends],
+        'volume': np.add.reduceat(df['volume'].values, starts),
+    })
+
+
+class TimeframeResampler:
+    """按交易对维护基础周期K线，并增量合成高周期K线"""
+
+    def __init__(
+        self,
+        base_interval: str = '15m',
+        intervals: Iterable[str] = ('4H', '1D', '1W'),
+        max_bars: int = 300,
+        time_column: str = 'datetime',
+    ):
+        """
+        初始化合成器
+
+        Args:
+            base_interval: 基础周期
+            intervals: 需要合成的高周期，必须是基础周期的整数倍
+            max_bars: 每个周期最多保留的K线数量
+            time_column: 时间列名，kline_fetcher 返回的是 datetime
+        """
+        self.base_interval = base_interval
+        self.base_ms = interval_ms(base_interval)
+        self.intervals = list(intervals)
+        for interval in self.intervals:
+            if interval_ms(interval) % self.base_ms:
+                raise ValueError(f"{interval} 不是基础周期 {base_interval} 的整数倍")
+        self.max_bars = max_bars
+        self.time_column = time_column
+        self.series = {}  # {(symbol, interval): DataFrame}，包含基础周期
+        # 基础K线未完整覆盖的当前高周期K线：{(symbol, interval): 开始时间及已知部分的open/high/low/volume}
+        self.prefix = {}
+
+    def is_seeded(self, symbol: str) -> bool:
+        """交易对的所有周期是否都已初始化"""
+        return all((symbol, interval) in self.series for interval in [self.base_interval] + self.intervals)
+
+    def reset(self, symbol: str):
+        """丢弃交易对的所有周期，下次使用前需要重新seed"""
+        for interval in [self.base_interval] + self.intervals:
+            self.series.pop((symbol, interval), None)
+            self.prefix.pop((symbol, interval), None)
+
+    def seed(self, symbol: str, frames: Dict[str, pd.DataFrame]):
+        """
+        用接口获取的各周期K线初始化交易对
+
+        Args:
+            symbol: 交易对
+            frames: {周期: DataFrame}，需包含基础周期和所有高周期，基础周期K线越多，能覆盖的当前高周期K线越完整
+        """
+        column = self.time_column
+        base = self._normalize(frames[self.base_interval])
+        self.series[(symbol, self.base_interval)] = base
+        base_ms = _to_local_ms(base[column])
+
+        for interval in self.intervals:
+            target = self._normalize(frames[interval])
+            self.series[(symbol, interval)] = target
+            self.prefix.pop((symbol, interval), None)
+            if target.empty or base.empty:
+                continue
+
+            # 当前高周期K线开始于基础K线之前时，记录基础K线之外的部分，后续与基础K线合并
+            last = target.iloc[-1]
+            last_ms = int(_to_local_ms(target[column].iloc[-1:])[0])
+            if base_ms[0] > last_ms:
+                covered = bucket_start(base_ms, interval) == last_ms
+                self.prefix[(symbol, interval)] = {
+                    'start': last_ms,
+                    'open': last['open'],
+                    'high': last['high'],
+                    'low': last['low'],
+                    'volume': max(last['volume'] - base['volume'].values[covered].sum(), 0.0),
+                }
+
+        self._trim_base(symbol)
+
+    def update(self, symbol: str, base_df: pd.DataFrame) -> bool:
+        """
+        合并新的基础K线并更新所有高周期
+
+        Args:
+            symbol: 交易对
+            base_df: 最新的基础周期K线（可与已有数据重叠，最后一根可以是未收盘K线）
+
+        Returns:
+            bool: 是否更新成功；未初始化或新数据与已有数据之间有缺口时返回False，需要重新seed
+        """
+        if not self.is_seeded(symbol):
+            return False
+        if base_df is None or base_df.empty:
+            return True
+
+        column = self.time_column
+        key = (symbol, self.base_interval)
+        base = self.series[key]
+        incoming = self._normalize(base_df)
+        if not base.empty:
+            last_ms = int(_to_local_ms(base[column].iloc[-1:])[0])
+            first_ms = int(_to_local_ms(incoming[column].iloc[:1])[0])
+            if first_ms > last_ms + self.base_ms:
+                print(f"{symbol}: 基础K线出现缺口，需要重新初始化")
+                return False
+
+        base = pd.concat([base, incoming], ignore_index=True)
+        base = base.drop_duplicates(subset=[column], keep='last').sort_values(column, kind='stable')
+        base = base.reset_index(drop=True)
+        self.series[key] = base
+
+        for interval in self.intervals:
+            self._update_interval(symbol, interval, base)
+
+        self._trim_base(symbol)
+        return True
+
+    def _update_interval(self, symbol: str, interval: str, base: pd.DataFrame):
+        """从当前（最后一根）高周期K线开始重新合成"""
+        column = self.time_column
+        key = (symbol, interval)
+        target = self.series[key]
+
+        if target.empty:
+            from_ms = int(_to_local_ms(base[column].iloc[:1])[0])
+        else:
+            from_ms = int(_to_local_ms(target[column].iloc[-1:])[0])
+        from_time = pd.Timestamp(from_ms, unit='ms')
+
+        fresh = resample(base[base[column] >= from_time], interval, column)
+        if fresh.empty:
+            return
+
+        prefix = self.prefix.get(key)
+        if prefix is not None:
+            first_ms = int(_to_local_ms(fresh[column].iloc[:1])[0])
+            if first_ms == prefix['start']:
+                fresh.loc[0, 'open'] = prefix['open']
+                fresh.loc[0, 'high'] = max(prefix['high'], fresh.loc[0, 'high'])
+                fresh.loc[0, 'low'] = min(prefix['low'], fresh.loc[0, 'low'])
+                fresh.loc[0, 'volume'] += prefix['volume']
+            if len(fresh) > 1 or first_ms != prefix['start']:
+                # 带前缀的K线已收盘，之后的K线完全由基础K线合成
+                del self.prefix[key]
+
+        target = pd.concat([target[target[column] < from_time], fresh], ignore_index=True)
+        self.series[key] = target.iloc[-self.max_bars:].reset_index(drop=True)
+
+    def _trim_base(self, symbol: str):
+        """保留最近max_bars根基础K线，且不丢弃各高周期当前K线内的基础K线"""
+        column = self.time_column
+        key = (symbol, self.base_interval)
+        base = self.series[key]
+        if len(base) <= self.max_bars:
+            return
+
+        keep_from = base[column].iloc[-self.max_bars]
+        for interval in self.intervals:
+            target = self.series[(symbol, interval)]
+            if not target.empty:
+                keep_from = min(keep_from, target[column].iloc[-1])
+        self.series[key] = base[base[column] >= keep_from].reset_index(drop=True)
+
+    def _normalize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """只保留时间和OHLCV列，按时间升序"""
+        column = self.time_column
+        df = df[[column] + OHLCV_COLUMNS].drop_duplicates(subset=[column], keep='last')
+        return df.sort_values(column, kind='stable').reset_index(drop=True)
+
+    def get(self, symbol: str, interval: str, limit: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """
+        获取某个周期的K线副本
+
+        Args:
+            symbol: 交易对
+            interval: 周期，基础周期或已配置的高周期
+            limit: 最近的K线数量，None表示全部
+
+        Returns:
+            pandas.DataFrame: 按时间升序的K线，未初始化时返回None
+        """
+        df = self.series.get((symbol, interval))
+        if df is None:
+            return None
+        if limit:
+            df = df.iloc[-limit:]
+        return df.reset_index(drop=True).copy()
+
+
+# 示例：用随机15m K线验证增量合成与一次性合成的结果一致
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    times = pd.date_range('2025-01-01 00:00', periods=4000, freq='15min')
+    close = 100 + rng.standard_normal(len(times)).cumsum()
+    full = pd.DataFrame({
+        'datetime': times,
+        'open': close + rng.standard_normal(len(times)) * 0.1,
+        'high': close + 1,
+        'low': close - 1,
+        'close': close,
+        'volume': rng.random(len(times)) * 100,
+    })
+
+    intervals = ['4H', '1D', '1W']
+    resampler = TimeframeResampler('15m', intervals, max_bars=300)
+
+    # 模拟接口：seed时各周期独立获取，基础周期只有最近300根，不足以覆盖当前周线
+    seed_end = 3000
+    frames = {'15m': full.iloc[seed_end - 300:seed_end]}
+    for interval in intervals:
+        frames[interval] = resample(full.iloc[:seed_end], interval).tail(100)
+    resampler.seed('DEMO', frames)
+
+    # 之后每轮只请求最近100根基础K线
+    for end in range(seed_end + 4, len(full) + 1, 4):
+        assert resampler.update('DEMO', full.iloc[max(end - 100, 0):end])
+
+    for interval in intervals:
+        expected = resample(full, interval).tail(100).reset_index(drop=True)
+        actual = resampler.get('DEMO', interval, limit=100)
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+        print(f"{interval}: 最新K线 {actual['datetime'].iloc[-1]}，与一次性合成结果一致")
+    print(f"周线从周一开始: {resampler.get('DEMO', '1W')['datetime'].dt.dayofweek.unique()}")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+请求合并模块
+
+同一个key同时只执行一次上游请求，并发调用方等待并共享同一结果；
+结果在短时间内缓存，避免面板多个页面同时刷新时重复消耗API权重。
+请求可以带数据量（如K线根数），数据量更大的结果可以供较小的请求共享，由调用方截取。
+"""
+
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+
+
+class _Call:
+    """一次正在执行的上游请求"""
+
+    def __init__(self, size=None):
+        self.done = threading.Event()
+        self.size = size
+        self.result = None
+        self.error = None
+
+
+def _covers(size, wanted) -> bool:
+    """数据量为size的结果能否满足数据量为wanted的请求，None表示不区分数据量"""
+    return wanted is None or (size is not None and size >= wanted)
+
+
+class SingleFlight:
+    """按key合并并发请求，并带短期TTL结果缓存"""
+
+    def __init__(self, ttl: float = 5.0, max_entries: int = 256):
+        """
+        初始化请求合并器
+
+        Args:
+            ttl: 结果缓存秒数，0表示只合并并发请求、不缓存结果
+            max_entries: 最多缓存的结果数，超出时淘汰最早写入的结果
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.calls = {}  # {key: _Call}
+        self.cache = {}  # {key: (过期时间, 结果, 数据量)}
+
+    def do(
+        self,
+        key: Hashable,
+        func: Callable[[], Any],
+        cache_if: Optional[Callable[[Any], bool]] = None,
+        size: Optional[int] = None,
+    ) -> Any:
+        """
+        执行或等待key对应的请求
+
+        Args:
+            key: 请求标识，如 (函数名, symbol, interval, limit)
+            func: 实际执行上游请求的无参函数
+            cache_if: 判断结果是否可以缓存，如空DataFrame不缓存；None表示都缓存
+            size: 请求的数据量，缓存或正在执行的请求数据量不小于size时直接共享，
+                  返回的结果可能比size多，调用方自行截取；None表示不区分数据量
+
+        Returns:
+            func的返回值，多个调用方拿到的是同一个对象，调用方需要修改时应自行复制
+
+        Raises:
+            func抛出的异常（包括KeyboardInterrupt等BaseException）会传递给所有等待中的调用方，异常不缓存
+        """
+        with self.lock:
+            now = time.monotonic()
+            cached = self.cache.get(key)
+            if cached is not None:
+                if cached[0] <= now:
+                    del self.cache[key]
+                elif _covers(cached[2], size):
+                    return cached[1]
+
+            call = self.calls.get(key)
+            leader = call is None or not _covers(call.size, size)
+            if leader:
+                call = _Call(size)
+                if key not in self.calls or _covers(size, self.calls[key].size):
+                    # 之后到达的请求等待数据量更大的这次请求
+                    self.calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        completed = False
+        try:
+            call.result = func()
+            completed = True
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                if self.calls.get(key) is call:
+                    del self.calls[key]
+                if completed and self.ttl > 0 and (cache_if is None or cache_if(call.result)):
+                    cached = self.cache.get(key)
+                    if cached is None or cached[0] <= time.monotonic() or _covers(size, cached[2]):
+                        if key not in self.cache and len(self.cache) >= self.max_entries:
+                            self.cache.pop(next(iter(self.cache)))
+                        self.cache[key] = (time.monotonic() + self.ttl, call.result, size)
+            call.done.set()
+
+        return call.result
+
+    def forget(self, key: Hashable):
+        """丢弃key对应的缓存结果"""
+        with self.lock:
+            self.cache.pop(key, None)
+
+    def clear(self):
+        """清空所有缓存结果"""
+        with self.lock:
+            self.cache.clear()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+StochRSI概览快照模块
+
+watcher 每完成一个 (symbol, 周期) 的计算就把该序列的概览写入快照文件
+data/stochrsi/overview.json（带递增版本号和更新时间，先写临时文件再原子替换）。
+Web端只在快照文件变化时重新加载一次，并把完整的接口响应预先序列化为字节，
+/api/stochrsi/overview 每次请求只需要一次 stat，不再逐个查询12个序列。
+watcher 进程和Web端的刷新接口都会发布快照，读取-修改-写入在旁边的 overview.json.lock 文件锁内完成。
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from stochrsi_store import StochRSIStore
+
+
+# 各时间周期的间隔（小时），背离信号在最新K线之前一个周期内才标注
+TIMEFRAME_HOURS = {
+    '5m': 0.083,
+    '15m': 0.25,
+    '30m': 0.5,
+    '1H': 1,
+    '2H': 2,
+    '4H': 4,
+    '6H': 6,
+    '12H': 12,
+    '1D': 24,
+    '3D': 72,
+    '1W': 168,
+}
+
+
+def _float_or_none(value):
+    try:
+        if value is None or pd.isna(value):
+            return None
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _string_or_default(value, default=''):
+    if value is None or pd.isna(value):
+        return default
+    if value in ['normal', 'nan', 'NaN', 'None']:
+        return default
+    return str(value)
+
+
+def _signal(event: Optional[Dict], flag_column: str, flag_value: int, latest_time: str, timeframe: str) -> Dict:
+    """
+    最近的背离事件是否在最新K线的上一个周期内
+
+    Args:
+        event: StochRSIStore.latest_event() 的结果
+        flag_column: 标记列，bl 或 dbl
+        flag_value: 标记值，tbl 为 -1，dbl 为 1
+        latest_time: 最新K线时间
+        timeframe: 时间周期
+    """
+    signal = {'has_signal': False, 'timestamp': '', 'stochrsi': None, 'price': None}
+    if event is None or _float_or_none(event.get(flag_column)) != flag_value:
+        return signal
+
+    signal_time = str(event.get('datetime', ''))
+    try:
+        time_diff = (
+            datetime.strptime(latest_time, '%Y-%m-%d %H:%M:%S')
+            - datetime.strptime(signal_time, '%Y-%m-%d %H:%M:%S')
+        )
+        interval = TIMEFRAME_HOURS.get(timeframe, 4)  # 默认4小时
+        in_window = timedelta(0) <= time_diff <= timedelta(hours=interval)
+    except ValueError:
+        # 时间解析失败时只比较是否为同一根K线
+        in_window = signal_time == latest_time
+
+    if in_window:
+        signal.update({
+            'has_signal': True,
+            'timestamp': signal_time,
+            'stochrsi': _float_or_none(event.get('stochrsi')),
+            'price': _float_or_none(event.get('close')),
+        })
+    return signal
+
+
+def summarize_series(store: StochRSIStore, symbol: str, timeframe: str) -> Optional[Dict]:
+    """
+    生成单个序列的概览：最新StochRSI、TBL/DBL信号、波动率
+
+    Returns:
+        概览字典，无数据时返回None
+    """
+    latest_row = store.latest_row(symbol, timeframe)
+    if latest_row is None:
+        return None
+
+    latest_time = str(latest_row.get('datetime', ''))
+    tbl_signal = _signal(store.latest_event(symbol, timeframe, 'tbl'), 'bl', -1, latest_time, timeframe)
+    dbl_signal = _signal(store.latest_event(symbol, timeframe, 'dbl'), 'dbl', 1, latest_time, timeframe)
+
+    return {
+        'symbol': symbol,
+        'timeframe': timeframe,
+        'latest_stochrsi': _float_or_none(latest_row.get('stochrsi')),
+        'latest_timestamp': latest_time,
+        'tbl_signal': tbl_signal,
+        'dbl_signal': dbl_signal,
+        'volatility': {
+            'current_volatility': _float_or_none(latest_row.get('volatility')),
+            'rolling_volatility': _float_or_none(latest_row.get('volatility_rolling')),
+            'sigma_level': _string_or_default(latest_row.get('volatility_sigma_level')),
+            'trend': _string_or_default(latest_row.get('volatility_trend'), 'stable'),
+            'historical_mean': _float_or_none(latest_row.get('volatility_historical_mean')),
+            'historical_std': _float_or_none(latest_row.get('volatility_historical_std')),
+        },
+    }
+
+
+@contextmanager
+def _file_lock(path: str):
+    """跨进程的排他文件锁，阻塞直到获得锁"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def empty_summary(symbol: str, timeframe: str) -> Dict:
+    """没有数据的序列在概览中的占位"""
+    return {
+        'symbol': symbol,
+        'timeframe': timeframe,
+        'latest_stochrsi': None,
+        'latest_timestamp': '',
+        'tbl_signal': {'has_signal': False},
+        'dbl_signal': {'has_signal': False},
+    }
+
+
+class OverviewSnapshot:
+    """概览快照：watcher 端发布，Web端按文件变化加载并缓存序列化后的响应"""
+
+    def __init__(self, store: StochRSIStore, path: str = 'data/stochrsi/overview.json'):
+        """
+        初始化快照
+
+        Args:
+            store: 指标存储，发布时从中读取最新数据
+            path: 快照文件路径
+        """
+        self.store = store
+        self.path = path
+        self.lock = threading.Lock()
+        self._cached = (None, None)  # ((快照文件修改时间, symbols, timeframes), 预先序列化的接口响应)
+
+    def load(self) -> Dict:
+        """读取快照文件，不存在时返回空快照"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'version': 0, 'updated_at': None, 'data': {}}
+
+    def _write(self, snapshot: Dict):
+        """先写临时文件再原子替换，读取方不会看到写了一半的快照"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def publish(self, symbols: Iterable[str], timeframes: Iterable[str]) -> int:
+        """
+        重新计算指定序列的概览并发布新版本的快照；读取-合并-写入在文件锁内完成，
+        多个进程同时发布时不会丢失彼此的序列，版本号也不会重复
+
+        Args:
+            symbols: 交易对列表
+            timeframes: 周期列表
+
+        Returns:
+            int: 新的版本号
+        """
+        summaries = [
+            summary
+            for symbol in symbols
+            for timeframe in timeframes
+            for summary in (summarize_series(self.store, symbol, timeframe),)
+            if summary is not None
+        ]
+        with self.lock, _file_lock(f"{self.path}.lock"):
+            snapshot = self.load()
+            for summary in summaries:
+                snapshot['data'].setdefault(summary['symbol'], {})[summary['timeframe']] = summary
+            snapshot['version'] = snapshot.get('version', 0) + 1
+            snapshot['updated_at'] = datetime.now().isoformat()
+            self._write(snapshot)
+            return snapshot['version']
+
+    def publish_series(self, symbol: str, timeframe: str) -> int:
+        """单个序列计算完成后发布"""
+        return self.publish([symbol], [timeframe])
+
+    def response_body(self, symbols: Iterable[str], timeframes: Iterable[str]) -> bytes:
+        """
+        概览接口的完整响应（JSON字节），只在快照文件变化时重新生成
+
+        快照文件不存在时先从存储生成一次。
+        """
+        symbols, timeframes = tuple(symbols), tuple(timeframes)
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self.publish(symbols, timeframes)
+            mtime = os.stat(self.path).st_mtime_ns
+
+        key = (mtime, symbols, timeframes)
+        cached_key, body = self._cached
+        if cached_key == key:
+            return body
+
+        with self.lock:
+            cached_key, body = self._cached
+            if cached_key == key:
+                return body
+            snapshot = self.load()
+            data = {
+                symbol: {
+                    timeframe: snapshot['data'].get(symbol, {}).get(timeframe) or empty_summary(symbol, timeframe)
+                    for timeframe in timeframes
+                }
+                for symbol in symbols
+            }
+            body = json.dumps({
+                'success': True,
+                'data': data,
+                'version': snapshot.get('version', 0),
+                'updated_at': snapshot.get('updated_at'),
+                'message': 'StochRSI概览数据获取成功',
+            }).encode('utf-8')
+            self._cached = (key, body)
+            return body
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+StochRSI结果存储模块
+
+用一个SQLite数据库（WAL模式）代替每个 (symbol, 周期) 的四个CSV文件：
+- indicators: 指标行，按 (序列, 时间) 建主键，每次只写入晚于上次最后一根（含）的K线
+- events: 背离事件，tbl 为顶背离K线（bl=-1），dbl 为所有向上拐点（dbl=1 表示底背离），
+  每次只替换本轮计算窗口内可能变化的事件
+- series: 每个序列的元数据（最后一根K线时间、行数、更新时间）
+看板读取"最新一行"和"最近N个事件"都是索引上的 LIMIT 查询，与历史数据量无关。
+"""
+
+import glob
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from trendline_store import connect_sqlite
+
+
+# 指标行保存的列，与原 stochrsi_{symbol}_{tf}.csv 的列一致
+INDICATOR_COLUMNS = [
+    'open', 'high', 'low', 'close', 'volume', 'stochrsi',
+    'volatility', 'volatility_rolling', 'volatility_sigma_level', 'volatility_trend',
+    'volatility_historical_mean', 'volatility_historical_std',
+]
+
+# 事件类型及其标记列名：tbl 对应原 _tbl.csv 的 bl 列，dbl 对应原 _dbl.csv 的 dbl 列
+EVENT_FLAG_COLUMNS = {'tbl': 'bl', 'dbl': 'dbl'}
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_TEXT_COLUMNS = ('volatility_sigma_level', 'volatility_trend')
+
+
+def _format_times(times: pd.Series) -> List[str]:
+    return pd.to_datetime(times).dt.strftime(TIME_FORMAT).tolist()
+
+
+def _clean(value):
+    """NaN转换为None，numpy标量转换为Python类型"""
+    if value is None:
+        return None
+    if isinstance(value, float) and pd.isna(value):
+        return None
+    if hasattr(value, 'item'):
+        value = value.item()
+        if isinstance(value, float) and pd.isna(value):
+            return None
+    return value
+
+
+def _rows(df: pd.DataFrame, columns: List[str]) -> List[list]:
+    """按列顺序取出DataFrame的值，缺少的列为None"""
+    values = [df[c].tolist() if c in df.columns else [None] * len(df) for c in columns]
+    return [[_clean(v) for v in row] for row in zip(*values)]
+
+
+class StochRSIStore:
+    """StochRSI指标与背离事件存储"""
+
+    def __init__(self, db_path: str = 'data/stochrsi/stochrsi.db'):
+        """
+        初始化存储
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程使用自己的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect_sqlite(self.db_path)
+        return conn
+
+    def _init_schema(self):
+        indicator_columns = ', '.join(
+            f"{c} {'TEXT' if c in _TEXT_COLUMNS else 'REAL'}" for c in INDICATOR_COLUMNS
+        )
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS series ("
+                "id INTEGER PRIMARY KEY, symbol TEXT, timeframe TEXT, last_datetime TEXT, "
+                "rows INTEGER DEFAULT 0, updated_at TEXT, UNIQUE(symbol, timeframe))"
+            )
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS indicators (series_id INTEGER, datetime TEXT, {indicator_columns}, "
+                "PRIMARY KEY(series_id, datetime)) WITHOUT ROWID"
+            )
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS events (series_id INTEGER, kind TEXT, datetime TEXT, "
+                f"turn REAL, flag REAL, {indicator_columns}, "
+                "PRIMARY KEY(series_id, kind, datetime)) WITHOUT ROWID"
+            )
+
+    def _series_id(self, conn: sqlite3.Connection, symbol: str, timeframe: str, create: bool = False) -> Optional[int]:
+        row = conn.execute(
+            "SELECT id FROM series WHERE symbol = ? AND timeframe = ?", (symbol, timeframe)
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        if not create:
+            return None
+        return conn.execute(
+            "INSERT INTO series (symbol, timeframe) VALUES (?, ?)", (symbol, timeframe)
+        ).lastrowid
+
+    def write(
+        self,
+        symbol: str,
+        timeframe: str,
+        df: Optional[pd.DataFrame] = None,
+        events: Optional[Dict[str, pd.DataFrame]] = None,
+        events_since=None,
+    ) -> int:
+        """
+        增量写入一次计算结果
+
+        Args:
+            symbol: 交易对
+            timeframe: 周期
+            df: 本轮计算的指标DataFrame（datetime列 + INDICATOR_COLUMNS），只写入不早于已保存最后一根的行，
+                最后一根通常是未收盘K线，下次写入时会被覆盖；None表示只写入事件
+            events: {'tbl': DataFrame, 'dbl': DataFrame}，本轮窗口内计算出的事件，需包含 turn 列和标记列（bl / dbl）
+            events_since: 只替换该时间（含）之后的事件；None表示替换窗口内全部事件
+
+        Returns:
+            int: 写入的指标行数
+        """
+        events = events or {}
+        with self._write_lock, self._conn() as conn:
+            series_id = self._series_id(conn, symbol, timeframe, create=True)
+            last = conn.execute("SELECT last_datetime FROM series WHERE id = ?", (series_id,)).fetchone()[0]
+
+            times = _format_times(df['datetime']) if df is not None else []
+            rows = [
+                [series_id, t] + row
+                for t, row in zip(times, _rows(df, INDICATOR_COLUMNS) if times else [])
+                if last is None or t >= last
+            ]
+            names = ', '.join(['series_id', 'datetime'] + INDICATOR_COLUMNS)
+            placeholders = ', '.join('?' for _ in range(len(INDICATOR_COLUMNS) + 2))
+            conn.executemany(f"INSERT OR REPLACE INTO indicators ({names}) VALUES ({placeholders})", rows)
+
+            for kind, event_df in events.items():
+                self._replace_events(conn, series_id, kind, event_df, events_since)
+
+            if rows:
+                # 与上次最后一根时间相同的行是覆盖，不计入行数
+                added = sum(1 for row in rows if row[1] != last)
+                conn.execute(
+                    "UPDATE series SET last_datetime = ?, rows = rows + ?, updated_at = ? WHERE id = ?",
+                    (max(row[1] for row in rows), added, datetime.now().isoformat(), series_id),
+                )
+        return len(rows)
+
+    @staticmethod
+    def _replace_events(conn, series_id: int, kind: str, event_df: pd.DataFrame, since):
+        flag_column = EVENT_FLAG_COLUMNS[kind]
+        if since is None:
+            since = _format_times(event_df['datetime'])[0] if not event_df.empty else None
+        else:
+            since = pd.Timestamp(since).strftime(TIME_FORMAT)
+        if since is None:
+            return
+
+        conn.execute(
+            "DELETE FROM events WHERE series_id = ? AND kind = ? AND datetime >= ?", (series_id, kind, since)
+        )
+        times = _format_times(event_df['datetime']) if not event_df.empty else []
+        rows = [
+            [series_id, kind, t] + row
+            for t, row in zip(times, _rows(event_df, ['turn', flag_column] + INDICATOR_COLUMNS))
+            if t >= since
+        ]
+        names = ', '.join(['series_id', 'kind', 'datetime', 'turn', 'flag'] + INDICATOR_COLUMNS)
+        placeholders = ', '.join('?' for _ in range(len(INDICATOR_COLUMNS) + 5))
+        conn.executemany(f"INSERT OR REPLACE INTO events ({names}) VALUES ({placeholders})", rows)
+
+    def series_info(self, symbol: str, timeframe: str) -> Optional[Dict]:
+        """序列元数据：last_datetime、rows、updated_at"""
+        row = self._conn().execute(
+            "SELECT * FROM series WHERE symbol = ? AND timeframe = ?", (symbol, timeframe)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def latest_row(self, symbol: str, timeframe: str) -> Optional[Dict]:
+        """最新一行指标，无数据时返回None"""
+        conn = self._conn()
+        series_id = self._series_id(conn, symbol, timeframe)
+        if series_id is None:
+            return None
+        row = conn.execute(
+            "SELECT * FROM indicators WHERE series_id = ? ORDER BY datetime DESC LIMIT 1", (series_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        del record['series_id']
+        return record
+
+    def recent_events(self, symbol: str, timeframe: str, kind: str, limit: int = 10) -> List[Dict]:
+        """
+        最近的事件，最新的在前
+
+        Returns:
+            事件字典列表，包含 datetime、turn、标记列（bl 或 dbl）及事件K线的指标
+        """
+        conn = self._conn()
+        series_id = self._series_id(conn, symbol, timeframe)
+        if series_id is None:
+            return []
+        rows = conn.execute(
+            "SELECT * FROM events WHERE series_id = ? AND kind = ? ORDER BY datetime DESC LIMIT ?",
+            (series_id, kind, limit),
+        ).fetchall()
+        flag_column = EVENT_FLAG_COLUMNS[kind]
+        events = []
+        for row in rows:
+            event = dict(row)
+            event[flag_column] = event.pop('flag')
+            del event['series_id'], event['kind']
+            events.append(event)
+        return events
+
+    def latest_event(self, symbol: str, timeframe: str, kind: str) -> Optional[Dict]:
+        """最近一个事件，无事件时返回None"""
+        events = self.recent_events(symbol, timeframe, kind, limit=1)
+        return events[0] if events else None
+
+    def migrate_from_csv(self, data_dir: str) -> int:
+        """
+        从旧的 stochrsi_{symbol}_{tf}[_tbl|_dbl].csv 导入数据，已有数据的序列跳过
+
+        Returns:
+            int: 导入的序列数量
+        """
+        pattern = re.compile(r'^stochrsi_(.+)_([^_]+)\.csv$')
+        imported = 0
+        for path in sorted(glob.glob(os.path.join(data_dir, 'stochrsi_*.csv'))):
+            match = pattern.match(os.path.basename(path))
+            if not match or match.group(2) in ('tbl', 'dbl', 'turn'):
+                continue
+            symbol, timeframe = match.groups()
+            if self.latest_row(symbol, timeframe) is not None:
+                continue
+            try:
+                df = pd.read_csv(path)
+                events = {}
+                for kind in EVENT_FLAG_COLUMNS:
+                    event_file = f"{path[:-4]}_{kind}.csv"
+                    if os.path.exists(event_file):
+                        events[kind] = pd.read_csv(event_file)
+            except (pd.errors.EmptyDataError, OSError) as e:
+                print(f"跳过 {path}: {e}")
+                continue
+            if df.empty:
+                continue
+            self.write(symbol, timeframe, df, events)
+            imported += 1
+        if imported:
+            print(f"已从 {data_dir} 迁移 {imported} 个StochRSI序列到 {self.db_path}")
+        return imported
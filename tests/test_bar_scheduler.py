@@ -0,0 +1,36 @@
+"""next_bar_close：按北京时间对齐的K线收盘时间"""
+
+import pandas as pd
+import pytest
+
+from bar_scheduler import next_bar_close
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+
+
+def _ms(text):
+    return int(pd.Timestamp(text, tz='Asia/Shanghai').value // 1_000_000)
+
+
+@pytest.mark.parametrize('now, step_ms, expected', [
+    ('2025-01-01 00:07:30', 15 * MINUTE_MS, '2025-01-01 00:15:00'),
+    ('2025-01-01 00:15:00', 15 * MINUTE_MS, '2025-01-01 00:30:00'),  # 正好在收盘时刻，属于下一根
+    ('2025-01-01 03:59:59', 4 * HOUR_MS, '2025-01-01 04:00:00'),
+    ('2025-01-01 07:30:00', DAY_MS, '2025-01-02 00:00:00'),  # 日线在北京时间0点收盘
+    ('2025-01-01 23:59:59', DAY_MS, '2025-01-02 00:00:00'),
+    ('2025-01-01 12:00:00', 7 * DAY_MS, '2025-01-06 00:00:00'),  # 周线在周一0点收盘
+    ('2025-01-06 00:00:00', 7 * DAY_MS, '2025-01-13 00:00:00'),
+])
+def test_next_bar_close(now, step_ms, expected):
+    assert next_bar_close(_ms(now), step_ms) == _ms(expected)
+
+
+def test_close_is_strictly_after_now_and_within_one_step():
+    step_ms = 5 * MINUTE_MS
+    start = _ms('2025-03-01 10:00:00')
+    for now in range(start, start + 3 * step_ms, 37_000):
+        close = next_bar_close(now, step_ms)
+        assert now < close <= now + step_ms
+        assert (close - start) % step_ms == 0
@@ -0,0 +1,60 @@
+"""BreakoutLog：按月分区追加写入，按游标倒序分页"""
+
+import pytest
+
+from breakout_log import BreakoutLog
+
+
+def _log(i, detected_at, trendline_id='a'):
+    return {
+        'id': f'log-{i}', 'trendline_id': trendline_id, 'signal_type': 'breakout',
+        'price': float(i), 'trendline_value': float(i), 'detected_at': detected_at,
+    }
+
+
+@pytest.fixture
+def log(tmp_path):
+    log = BreakoutLog(str(tmp_path))
+    logs = [_log(i, f'2025-01-{i + 1:02d}T00:00:00', 'a' if i % 2 else 'b') for i in range(5)]
+    logs += [_log(i, f'2025-02-{i - 4:02d}T00:00:00', 'a' if i % 2 else 'b') for i in range(5, 10)]
+    assert log.append_many(logs) == 10
+    return log
+
+
+def _pages(log, limit, trendline_id=None):
+    pages, cursor = [], None
+    while True:
+        records, cursor = log.query(trendline_id=trendline_id, limit=limit, before=cursor)
+        pages.append([r['id'] for r in records])
+        if cursor is None:
+            return pages
+
+
+def test_partitions_by_month(log):
+    assert log.partitions() == ['2025-02', '2025-01']
+
+
+def test_cursor_pages_cover_all_logs_newest_first(log):
+    pages = _pages(log, 3)
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    assert sum(pages, []) == [f'log-{i}' for i in range(9, -1, -1)]
+
+
+def test_page_boundary_at_partition_end(log):
+    # 一页正好取完一个分区，下一页从上一个分区开始
+    first, cursor = log.query(limit=5)
+    assert [r['id'] for r in first] == [f'log-{i}' for i in range(9, 4, -1)]
+    second, _ = log.query(limit=5, before=cursor)
+    assert [r['id'] for r in second] == [f'log-{i}' for i in range(4, -1, -1)]
+
+
+def test_filter_by_trendline(log):
+    ids = sum(_pages(log, 2, trendline_id='a'), [])
+    assert ids == ['log-9', 'log-7', 'log-5', 'log-3', 'log-1']
+
+
+def test_cursor_is_stable_after_new_appends(log):
+    first, cursor = log.query(limit=4)
+    log.append(_log(10, '2025-02-28T00:00:00'))
+    second, _ = log.query(limit=4, before=cursor)
+    assert [r['id'] for r in second] == ['log-5', 'log-4', 'log-3', 'log-2']
@@ -0,0 +1,85 @@
+"""CandleRingBuffer：追加、原地更新、收盘确认、容量回绕与缺口标记"""
+
+import numpy as np
+import pytest
+
+from candle_ring_buffer import CandleRingBuffer
+
+
+def _bar(buffer, ts, close, confirm=True):
+    return buffer.upsert(ts, close, close, close, close, 1.0, confirm=confirm)
+
+
+def test_rejects_non_positive_capacity():
+    with pytest.raises(ValueError):
+        CandleRingBuffer(0)
+
+
+def test_forming_bar_updates_in_place_until_confirmed():
+    buffer = CandleRingBuffer(10)
+    assert _bar(buffer, 1, 1.0) is True
+    assert _bar(buffer, 2, 2.0, confirm=False) is False
+    assert _bar(buffer, 2, 2.5, confirm=False) is False
+    assert (len(buffer), buffer.closed_size, buffer.last_ts, buffer.last_confirmed_ts) == (2, 1, 2, 1)
+    assert buffer.view('close', include_forming=True).tolist() == [1.0, 2.5]
+
+    assert _bar(buffer, 2, 3.0) is True  # 收盘确认只计一次
+    assert _bar(buffer, 2, 3.0) is False
+    assert buffer.view('close').tolist() == [1.0, 3.0]
+
+
+def test_older_bar_is_ignored():
+    buffer = CandleRingBuffer(10)
+    _bar(buffer, 5, 5.0)
+    assert _bar(buffer, 4, 4.0) is False
+    assert buffer.view('ts').tolist() == [5]
+
+
+def test_late_unconfirmed_update_does_not_reopen_closed_bar():
+    buffer = CandleRingBuffer(10)
+    _bar(buffer, 1, 1.0)
+    assert _bar(buffer, 1, 9.0, confirm=False) is False
+    assert not buffer.forming
+    assert buffer.view('close').tolist() == [1.0]
+
+
+def test_dropped_forming_bar_marks_gap_and_stops_extend():
+    buffer = CandleRingBuffer(10)
+    _bar(buffer, 1, 1.0)
+    _bar(buffer, 2, 2.0, confirm=False)
+    closed = buffer.extend(
+        np.array([3, 4]), [3.0, 4.0], [3.0, 4.0], [3.0, 4.0], [3.0, 4.0], [1.0, 1.0],
+        confirm=np.array([True, True]),
+    )
+    assert closed == 0
+    assert buffer.view('ts', include_forming=True).tolist() == [1]
+    assert buffer.take_gap() is True
+    assert buffer.take_gap() is False
+
+    # 补齐后正常写入
+    assert buffer.extend(np.array([2, 3]), [2.0, 3.0], [2.0, 3.0], [2.0, 3.0], [2.0, 3.0], [1.0, 1.0]) == 2
+    assert buffer.view('ts').tolist() == [1, 2, 3]
+
+
+def test_wraps_around_and_views_stay_contiguous():
+    capacity = 4
+    buffer = CandleRingBuffer(capacity)
+    for ts in range(1, 11):
+        _bar(buffer, ts, float(ts))
+    _bar(buffer, 11, 11.0, confirm=False)
+
+    assert len(buffer) == capacity
+    assert buffer.view('ts').tolist() == [8, 9, 10]
+    assert buffer.view('ts', include_forming=True).tolist() == [8, 9, 10, 11]
+    view = buffer.view('close')
+    assert view.flags.c_contiguous and not view.flags.writeable
+
+
+def test_to_dataframe_excludes_forming_bar():
+    buffer = CandleRingBuffer(10)
+    _bar(buffer, 1_700_000_000_000, 1.0)
+    _bar(buffer, 1_700_000_900_000, 2.0, confirm=False)
+    df = buffer.to_dataframe()
+    assert list(df.columns) == ['candle_begin_time_GMT8', 'open', 'high', 'low', 'close', 'volume']
+    assert len(df) == 1
+    assert str(df['candle_begin_time_GMT8'].dt.tz) == 'Asia/Shanghai'
@@ -0,0 +1,83 @@
+"""CandleStore：追加写入、原地更新最后一根、范围读取与增量更新的清单"""
+
+import numpy as np
+import pandas as pd
+
+from candle_store import CANDLE_DTYPE, CandleStore, gmt8_to_milliseconds
+from dataset_manifest import file_crc32, read_manifest, verify
+
+STEP_MS = 15 * 60 * 1000
+
+
+def _frame(start, periods, close=None, confirm=None):
+    times = pd.date_range(start, periods=periods, freq='15min', tz='Asia/Shanghai')
+    close = np.arange(periods, dtype=float) if close is None else close
+    df = pd.DataFrame({
+        'candle_begin_time_GMT8': times, 'open': close, 'high': close, 'low': close, 'close': close, 'volume': 1.0,
+    })
+    if confirm is not None:
+        df['confirm'] = confirm
+    return df
+
+
+def test_append_overwrite_last_and_ignore_older(tmp_path):
+    store = CandleStore(str(tmp_path))
+    assert store.write_dataframe('BTC', '15m', _frame('2025-01-01', 3, confirm=[True, True, False])) == 3
+
+    # 与最后一根时间相同的原地覆盖，更早的忽略，更新的追加
+    update = _frame('2025-01-01 00:15', 3, close=np.array([9.0, 20.0, 30.0]))
+    assert store.write_dataframe('BTC', '15m', update) == 2
+    records = store.read('BTC', '15m')
+    assert records['close'].tolist() == [0.0, 1.0, 20.0, 30.0]
+    assert records['confirm'].tolist() == [1, 1, 1, 1]
+    assert store.count('BTC', '15m') == 4
+    assert store.last_timestamp('BTC', '15m') == int(records['ts'][-1])
+
+
+def test_read_by_time_range(tmp_path):
+    store = CandleStore(str(tmp_path))
+    df = _frame('2025-01-01', 10)
+    store.write_dataframe('BTC', '15m', df)
+    ts = gmt8_to_milliseconds(df['candle_begin_time_GMT8'])
+
+    records = store.read('BTC', '15m', start_ms=int(ts[2]), end_ms=int(ts[5]))
+    assert records['ts'].tolist() == ts[2:5].tolist()
+    assert store.read_latest('BTC', '15m', 3)['ts'].tolist() == ts[-3:].tolist()
+    assert store.read('ETH', '15m').dtype == CANDLE_DTYPE
+
+
+def test_manifest_tracks_incremental_writes(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.write_dataframe('BTC', '15m', _frame('2025-01-01', 5, confirm=[True] * 4 + [False]))
+    path = store.path('BTC', '15m')
+    assert verify(path)
+
+    # 覆盖正在形成的K线并追加，清单的crc32只从最后一根开始增量计算
+    store.write_dataframe('BTC', '15m', _frame('2025-01-01 01:00', 3))
+    manifest = read_manifest(path)
+    assert manifest['rows'] == 7
+    assert manifest['crc32'] == file_crc32(path)
+    assert manifest['gaps'] == []
+
+    # 跳过两根K线，清单记录缺口
+    store.write_dataframe('BTC', '15m', _frame('2025-01-01 02:15', 1))
+    manifest = read_manifest(path)
+    last_ts = manifest['max_ts']
+    assert manifest['gaps'] == [[last_ts - 2 * STEP_MS, last_ts - STEP_MS]]
+    assert verify(path)
+
+
+def test_manifest_rebuilt_when_out_of_date(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.write_dataframe('BTC', '15m', _frame('2025-01-01', 4))
+    path = store.path('BTC', '15m')
+
+    # 其他程序修改了数据文件，清单失效
+    with open(path, 'ab') as f:
+        f.write(np.zeros(1, dtype=CANDLE_DTYPE).tobytes()[:10])
+    assert read_manifest(path) is None
+
+    store.write_dataframe('BTC', '15m', _frame('2025-01-01 01:00', 1))
+    manifest = read_manifest(path)
+    assert manifest['rows'] == 5
+    assert manifest['crc32'] == file_crc32(path)
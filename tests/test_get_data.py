@@ -0,0 +1,60 @@
+"""get_data：缺失区间的查找、合并与按天数切分"""
+
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+# get_data 在导入时创建交易所客户端，需要 ccxt 和本地的 config_constants
+pytest.importorskip('ccxt')
+pytest.importorskip('config_constants')
+
+from get_data import find_missing_ranges, split_ranges  # noqa: E402
+
+STEP = timedelta(minutes=15)
+
+
+def _times(*ranges):
+    """由若干 (开始, 根数) 拼出已排序的K线时间"""
+    return pd.DatetimeIndex(sum(
+        (list(pd.date_range(start, periods=n, freq='15min')) for start, n in ranges), []
+    ))
+
+
+def test_no_gaps():
+    assert find_missing_ranges(_times(('2025-01-01', 10)), STEP) == []
+    assert find_missing_ranges(_times(('2025-01-01', 1)), STEP) == []
+
+
+def test_single_gap_bounds_are_inclusive():
+    times = _times(('2025-01-01 00:00', 4), ('2025-01-01 02:00', 4))
+    assert find_missing_ranges(times, STEP) == [
+        (pd.Timestamp('2025-01-01 01:00'), pd.Timestamp('2025-01-01 01:45')),
+    ]
+
+
+def test_nearby_gaps_merge_and_distant_gaps_stay_apart():
+    times = _times(('2025-01-01 00:00', 2), ('2025-01-01 01:00', 2), ('2025-01-01 02:00', 2))
+    assert find_missing_ranges(times, STEP, merge_gap_bars=100) == [
+        (pd.Timestamp('2025-01-01 00:30'), pd.Timestamp('2025-01-01 01:45')),
+    ]
+    assert find_missing_ranges(times, STEP, merge_gap_bars=1) == [
+        (pd.Timestamp('2025-01-01 00:30'), pd.Timestamp('2025-01-01 00:45')),
+        (pd.Timestamp('2025-01-01 01:30'), pd.Timestamp('2025-01-01 01:45')),
+    ]
+
+
+def test_split_ranges_by_days_without_overlap():
+    start = pd.Timestamp('2025-01-01 00:00')
+    end = pd.Timestamp('2025-01-03 11:45')
+    pieces = split_ranges([(start, end)], STEP, max_days_per_request=1)
+    assert pieces == [
+        (start, pd.Timestamp('2025-01-01 23:45')),
+        (pd.Timestamp('2025-01-02 00:00'), pd.Timestamp('2025-01-02 23:45')),
+        (pd.Timestamp('2025-01-03 00:00'), end),
+    ]
+
+
+def test_split_ranges_keeps_short_ranges():
+    ranges = [(pd.Timestamp('2025-01-01 00:00'), pd.Timestamp('2025-01-01 00:00'))]
+    assert split_ranges(ranges, STEP, max_days_per_request=5) == ranges
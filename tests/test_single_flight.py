@@ -0,0 +1,137 @@
+"""SingleFlight：并发请求合并、按数据量共享、结果缓存与异常传递"""
+
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def _run_concurrently(n, target):
+    """n个线程同时调用 target()，返回各线程的结果或异常"""
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except BaseException as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_calls_share_one_request():
+    flight = SingleFlight(ttl=0)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return object()
+
+    results = _run_concurrently(8, lambda: flight.do('k', fetch))
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_larger_request_in_flight_covers_smaller():
+    flight = SingleFlight(ttl=0)
+    started = threading.Event()
+    calls = []
+
+    def fetch(size):
+        calls.append(size)
+        started.set()
+        time.sleep(0.2)
+        return size
+
+    leader = threading.Thread(target=lambda: flight.do('k', lambda: fetch(100), size=100))
+    leader.start()
+    started.wait()
+    assert flight.do('k', lambda: fetch(50), size=50) == 100
+    leader.join()
+    assert calls == [100]
+
+
+def test_smaller_request_in_flight_does_not_cover_larger():
+    flight = SingleFlight(ttl=0)
+    started = threading.Event()
+    calls = []
+
+    def fetch(size):
+        calls.append(size)
+        started.set()
+        time.sleep(0.2)
+        return size
+
+    leader = threading.Thread(target=lambda: flight.do('k', lambda: fetch(50), size=50))
+    leader.start()
+    started.wait()
+    assert flight.do('k', lambda: fetch(100), size=100) == 100
+    leader.join()
+    assert sorted(calls) == [50, 100]
+
+
+def test_result_cached_within_ttl():
+    flight = SingleFlight(ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert flight.do('k', fetch, size=100) == 1
+    assert flight.do('k', fetch, size=10) == 1  # 缓存的数据量更大，直接共享
+    assert flight.do('k', fetch, size=200) == 2  # 缓存的数据量不够，重新请求
+    flight.forget('k')
+    assert flight.do('k', fetch) == 3
+
+
+def test_cache_if_rejects_result():
+    flight = SingleFlight(ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return []
+
+    flight.do('k', fetch, cache_if=bool)
+    flight.do('k', fetch, cache_if=bool)
+    assert len(calls) == 2
+
+
+def test_expired_entry_is_refetched():
+    flight = SingleFlight(ttl=0.05)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert flight.do('k', fetch) == 1
+    time.sleep(0.1)
+    assert flight.do('k', fetch) == 2
+
+
+@pytest.mark.parametrize('error', [RuntimeError('boom'), KeyboardInterrupt()])
+def test_exception_reaches_every_waiter_and_is_not_cached(error):
+    flight = SingleFlight(ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        raise error
+
+    results = _run_concurrently(4, lambda: flight.do('k', fetch))
+    assert len(calls) == 1
+    assert all(r is error for r in results)
+    assert flight.do('k', lambda: 'ok') == 'ok'
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+时间轴上的趋势线几何
+
+Signals.define_trendline 在K线DataFrame中逐行查找两个端点，以行序号计算斜率：每次调用O(n)，
+端点滚出缓存窗口后会抛出 IndexError。这里用端点的时间戳和K线周期描述趋势线：
+斜率预先换算为每个周期的价格变化，任意时刻的值 = 起点价格 + 斜率 * (时间 - 起点时间) / 周期，
+计算是O(1)的，与缓存了多少历史、端点是否还在窗口内无关。
+
+K线连续（没有缺失）时，两根K线的时间差除以周期正好等于行序号之差，
+计算结果与 define_trendline 逐位相同。
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+TIME_COLUMN = 'candle_begin_time_GMT8'
+
+
+def time_to_ms(value) -> int:
+    """时间（不带时区时按北京时间）转换为UTC毫秒时间戳"""
+    ts = pd.Timestamp(value)
+    if ts.tz is None:
+        ts = ts.tz_localize('Asia/Shanghai')
+    return int(ts.tz_convert('UTC').value // 1_000_000)
+
+
+def frame_times_ms(df: pd.DataFrame, column: str = TIME_COLUMN) -> np.ndarray:
+    """K线DataFrame的时间列转换为UTC毫秒时间戳数组，不带时区的时间按北京时间处理"""
+    times = pd.to_datetime(df[column])
+    if times.dt.tz is None:
+        times = times.dt.tz_localize('Asia/Shanghai')
+    return times.dt.tz_convert('UTC').values.astype('datetime64[ms]').astype(np.int64)
+
+
+class TrendlineGeometry:
+    """由两个端点（时间戳、价格）和K线周期确定的趋势线，只在起点右侧延伸"""
+
+    __slots__ = ('start_ms', 'start_price', 'end_ms', 'end_price', 'step_ms', 'slope')
+
+    def __init__(self, start_ms: int, start_price: float, end_ms: int, end_price: float, step_ms: int):
+        """
+        初始化趋势线
+
+        Args:
+            start_ms, end_ms: 起点、终点K线的UTC毫秒时间戳
+            start_price, end_price: 起点、终点价格
+            step_ms: K线周期（毫秒）
+
+        Raises:
+            ValueError: 周期不为正或两个端点是同一时间
+        """
+        if step_ms <= 0:
+            raise ValueError(f"K线周期必须大于0: {step_ms}")
+        if start_ms == end_ms:
+            raise ValueError(f"趋势线两个端点时间相同: {start_ms}")
+        self.start_ms = int(start_ms)
+        self.start_price = float(start_price)
+        self.end_ms = int(end_ms)
+        self.end_price = float(end_price)
+        self.step_ms = int(step_ms)
+        # 每个周期的价格变化，与 define_trendline 按行序号计算的斜率相同
+        self.slope = (self.end_price - self.start_price) / ((self.end_ms - self.start_ms) / self.step_ms)
+
+    @classmethod
+    def from_points(cls, start_point: List, end_point: List, step_ms: int) -> 'TrendlineGeometry':
+        """
+        由 define_trendline 使用的端点 [时间, 价格] 构造
+
+        Args:
+            start_point: 趋势线起点 [时间, 价格]，时间不带时区时按北京时间处理
+            end_point: 趋势线终点 [时间, 价格]
+            step_ms: K线周期（毫秒）
+        """
+        return cls(
+            time_to_ms(start_point[0]), start_point[1], time_to_ms(end_point[0]), end_point[1], step_ms
+        )
+
+    @classmethod
+    def from_trendline(cls, trendline: Dict, step_ms: int) -> 'TrendlineGeometry':
+        """由趋势线配置（start_time、start_price、end_time、end_price）构造"""
+        return cls.from_points(
+            [trendline['start_time'], float(trendline['start_price'])],
+            [trendline['end_time'], float(trendline['end_price'])],
+            step_ms,
+        )
+
+    @property
+    def slope_per_ms(self) -> float:
+        """每毫秒的价格变化"""
+        return self.slope / self.step_ms
+
+    def value_at(self, ts_ms: int) -> float:
+        """
+        趋势线在某根K线上的值，O(1)
+
+        Args:
+            ts_ms: K线开始时间（UTC毫秒时间戳）
+
+        Returns:
+            float: 趋势线的值，早于起点时为NaN
+        """
+        if ts_ms < self.start_ms:
+            return np.nan
+        return self.start_price + self.slope * ((ts_ms - self.start_ms) / self.step_ms)
+
+    def values(self, ts_ms: np.ndarray) -> np.ndarray:
+        """批量计算趋势线在各K线上的值，早于起点的为NaN"""
+        ts_ms = np.asarray(ts_ms, dtype=np.int64)
+        values = self.start_price + self.slope * ((ts_ms - self.start_ms) / self.step_ms)
+        return np.where(ts_ms >= self.start_ms, values, np.nan)
+
+    def series(self, df: pd.DataFrame) -> pd.Series:
+        """与 define_trendline 返回格式相同的趋势线值Series，端点不需要在 df 中"""
+        return pd.Series(self.values(frame_times_ms(df)), index=df.index)
+
+    def breakout(self, prev_ts: int, prev_close: float, ts: int, close: float) -> Optional[int]:
+        """
+        根据两根K线的收盘价判断突破，规则与 Signals.monitor_breakout 一致
+
+        Args:
+            prev_ts, prev_close: 前一根K线的时间戳和收盘价
+            ts, close: 当前K线的时间戳和收盘价
+
+        Returns:
+            1=向上突破, -1=向下跌破, None=无突破
+        """
+        prev_trend = self.value_at(prev_ts)
+        current_trend = self.value_at(ts)
+        if prev_close < prev_trend and close >= current_trend:
+            return 1
+        if prev_close > prev_trend and close <= current_trend:
+            return -1
+        return None
+
+
+def geometry_arrays(start_ms: np.ndarray, start_prices: np.ndarray, end_ms: np.ndarray,
+                    end_prices: np.ndarray, step_ms: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    批量计算多条趋势线的每周期斜率
+
+    Args:
+        start_ms, end_ms: 各趋势线起点、终点的UTC毫秒时间戳，无法解析的为负数
+        start_prices, end_prices: 各趋势线起点、终点价格
+        step_ms: K线周期（毫秒）
+
+    Returns:
+        (slope, valid)，valid为False表示端点时间无效或两个端点时间相同
+    """
+    start_ms = np.asarray(start_ms, dtype=np.int64)
+    end_ms = np.asarray(end_ms, dtype=np.int64)
+    valid = (start_ms >= 0) & (end_ms >= 0) & (start_ms != end_ms)
+    span = np.where(valid, (end_ms - start_ms) / step_ms, 1.0)
+    slope = (np.asarray(end_prices, dtype=float) - np.asarray(start_prices, dtype=float)) / span
+    return slope, valid
+
+
+def batch_breakout(times_ms: np.ndarray, close: np.ndarray, start_ms: np.ndarray, start_prices: np.ndarray,
+                   slope: np.ndarray, step_ms: int, valid: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    批量判断多条趋势线在最后两根K线上的突破，规则与 Signals.monitor_breakout 一致；
+    趋势线的值按最后两根K线各自的时间计算（同 TrendlineGeometry.values），两根K线之间有缺失时也正确
+
+    Args:
+        times_ms: K线的UTC毫秒时间戳（升序，至少两根）
+        close: 对应的收盘价
+        start_ms, start_prices, slope: 各趋势线起点的UTC毫秒时间戳、起点价格、每周期斜率（见 geometry_arrays）
+        step_ms: K线周期（毫秒）
+        valid: 有效的趋势线，无效的趋势线不产生信号
+
+    Returns:
+        (breakout, current_values)，breakout为1=向上突破、-1=向下跌破、0=无突破，
+        current_values为各趋势线在最后一根K线上的值，早于起点时为NaN
+    """
+    start_ms = np.asarray(start_ms, dtype=np.int64)
+    start_prices = np.asarray(start_prices, dtype=float)
+    slope = np.asarray(slope, dtype=float)
+
+    def values_at(ts: int) -> np.ndarray:
+        values = start_prices + slope * ((ts - start_ms) / step_ms)
+        return np.where(ts >= start_ms, values, np.nan)
+
+    prev_trend = values_at(int(times_ms[-2]))
+    current_trend = values_at(int(times_ms[-1]))
+    prev_close, current_close = float(close[-2]), float(close[-1])
+
+    # NaN参与比较结果为False
+    up = (prev_close < prev_trend) & (current_close >= current_trend)
+    down = (prev_close > prev_trend) & (current_close <= current_trend)
+    breakout = np.where(up, 1, np.where(down, -1, 0)).astype(np.int8)
+    if valid is not None:
+        breakout[~np.asarray(valid)] = 0
+    return breakout, current_trend
+
+
+# 校验：端点在窗口内时与 define_trendline 结果一致，起点滚出窗口后仍可计算
+if __name__ == "__main__":
+    import time
+
+    from Signals import define_trendline
+
+    rng = np.random.default_rng(0)
+    step_ms = 15 * 60 * 1000
+    n_bars = 2000
+    times = pd.date_range("2025-01-01", periods=n_bars, freq="15min", tz="Asia/Shanghai")
+    close = 100 + rng.standard_normal(n_bars).cumsum()
+    df = pd.DataFrame({TIME_COLUMN: times, "close": close})
+    times_ms = frame_times_ms(df)
+
+    for _ in range(200):
+        start, end = sorted(rng.choice(n_bars, 2, replace=False))
+        start_point = [times[start].strftime("%Y-%m-%d %H:%M:%S"), float(close[start]) + rng.normal()]
+        end_point = [times[end].strftime("%Y-%m-%d %H:%M:%S"), float(close[end]) + rng.normal()]
+        expected = define_trendline(df, start_point, end_point)
+        geometry = TrendlineGeometry.from_points(start_point, end_point, step_ms)
+        assert expected.equals(geometry.series(df))
+        assert geometry.value_at(int(times_ms[-1])) == expected.iloc[-1]
+
+    # 起点已不在窗口内：define_trendline 报错，时间轴计算不受影响
+    window = df.iloc[-100:].reset_index(drop=True)
+    try:
+        define_trendline(window, start_point, end_point)
+    except IndexError:
+        print("define_trendline: 端点不在窗口内时抛出 IndexError")
+    assert np.array_equal(geometry.series(window).values, expected.values[-100:], equal_nan=True)
+
+    # 批量判断与逐条判断一致，最后两根K线之间有缺失时同样按时间计算
+    gap_times = np.append(times_ms[:-1], times_ms[-1] + 3 * step_ms)
+    lines = [TrendlineGeometry.from_points(
+        [times[s].strftime("%Y-%m-%d %H:%M:%S"), float(close[s])],
+        [times[s + 5].strftime("%Y-%m-%d %H:%M:%S"), float(close[s]) + rng.normal()], step_ms)
+        for s in rng.integers(0, n_bars - 10, 500)]
+    for bar_times in (times_ms, gap_times):
+        breakout, _ = batch_breakout(bar_times, close, [g.start_ms for g in lines],
+                                     [g.start_price for g in lines], [g.slope for g in lines], step_ms)
+        expected = [g.breakout(bar_times[-2], close[-2], bar_times[-1], close[-1]) or 0 for g in lines]
+        assert breakout.tolist() == expected
+
+    for history in (1000, 100000):
+        big = pd.DataFrame({TIME_COLUMN: pd.date_range("2020-01-01", periods=history, freq="15min",
+                                                       tz="Asia/Shanghai")})
+        big["close"] = 100.0
+        point_a = [big[TIME_COLUMN].iloc[history // 2].strftime("%Y-%m-%d %H:%M:%S"), 100.0]
+        point_b = [big[TIME_COLUMN].iloc[history // 2 + 10].strftime("%Y-%m-%d %H:%M:%S"), 101.0]
+        last_ms = int(frame_times_ms(big.iloc[-1:])[0])
+
+        begin = time.perf_counter()
+        for _ in range(20):
+            define_trendline(big, point_a, point_b).iloc[-1]
+        define_cost = (time.perf_counter() - begin) / 20 * 1e6
+
+        geometry = TrendlineGeometry.from_points(point_a, point_b, step_ms)
+        begin = time.perf_counter()
+        for _ in range(10000):
+            geometry.value_at(last_ms)
+        value_cost = (time.perf_counter() - begin) / 10000 * 1e6
+        print(f"{history:>6d} 根K线: define_trendline {define_cost:.0f} 微秒，value_at {value_cost:.2f} 微秒")
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+趋势线内存注册表
+
+进程内每个数据库只加载一次全部趋势线，按id和symbol的查找都在内存中完成；
+写操作先写入 TrendlineStore 再更新内存（write-through），
+并向订阅方发布 add / update / delete 事件，监测引擎据此更新监测的交易对，无需每轮重新读取存储。
+
+其他进程（另一个Web进程、单独运行的监测程序、导入脚本）也可能写入同一个数据库：
+读写前检查存储的变更标记（PRAGMA data_version，最多每 sync_interval 秒一次），
+变化时重新加载，并把差异作为 add / update / delete 事件发布。
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from trendline_store import TRENDLINE_COLUMNS, TrendlineStore, to_db_value
+
+
+# 事件类型
+EVENT_ADD = 'add'
+EVENT_UPDATE = 'update'
+EVENT_DELETE = 'delete'
+
+
+class TrendlineRegistry:
+    """趋势线内存注册表，接口与 TrendlineStore 一致"""
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, db_path: str) -> "TrendlineRegistry":
+        """获取数据库对应的注册表，同一进程内每个数据库只有一个实例"""
+        key = os.path.abspath(db_path)
+        with cls._instances_lock:
+            registry = cls._instances.get(key)
+            if registry is None:
+                registry = cls._instances[key] = cls(TrendlineStore(db_path))
+            return registry
+
+    def __init__(self, store: TrendlineStore, sync_interval: float = 1.0):
+        """
+        初始化注册表并加载全部趋势线
+
+        Args:
+            store: 底层存储
+            sync_interval: 检查其他进程写入的最小间隔秒数，0表示每次读写前都检查
+        """
+        self.store = store
+        self.db_path = store.db_path
+        self.lock = threading.RLock()
+        self.listeners = []
+        self.sync_interval = sync_interval
+        self.by_id = {}  # {id: 趋势线}，保持创建顺序
+        self.by_symbol = {}  # {symbol: {id: None}}，保持创建顺序
+        self.data_version = None
+        self.synced_at = 0.0
+        self.reload()
+
+    def reload(self):
+        """从存储重新加载全部趋势线，并把与内存的差异作为事件发布（如其他进程修改了数据库）"""
+        with self.lock:
+            old = self.by_id
+            # 先读取变更标记再读取数据，读取期间的写入会在下次检查时发现
+            self.data_version = self.store.data_version()
+            self.synced_at = time.monotonic()
+            self.by_id = {}
+            self.by_symbol = {}
+            for trendline in self.store.query():
+                self._index(trendline)
+
+            events = []
+            for trendline_id, trendline in self.by_id.items():
+                previous = old.get(trendline_id)
+                if previous == trendline:
+                    continue
+                if previous is None:
+                    events.append((EVENT_ADD, dict(trendline)))
+                elif trendline['status'] == 'deleted':
+                    events.append((EVENT_DELETE, dict(trendline)))
+                else:
+                    events.append((EVENT_UPDATE, dict(trendline)))
+            for trendline_id, previous in old.items():
+                if trendline_id not in self.by_id:
+                    # 被其他进程从数据库中删除
+                    events.append((EVENT_DELETE, dict(previous, status='deleted')))
+
+        for event, snapshot in events:
+            self._publish(event, snapshot)
+
+    def sync(self, force: bool = False) -> bool:
+        """
+        检查其他进程是否写入了数据库，写入过时重新加载
+
+        Args:
+            force: 忽略 sync_interval 立即检查
+
+        Returns:
+            bool: 是否重新加载
+        """
+        if not force and time.monotonic() - self.synced_at < self.sync_interval:
+            return False
+        with self.lock:
+            self.synced_at = time.monotonic()
+            if self.store.data_version() == self.data_version:
+                return False
+        self.reload()
+        return True
+
+    def _index(self, trendline: Dict):
+        self.by_id[trendline['id']] = trendline
+        self.by_symbol.setdefault(trendline['symbol'], {})[trendline['id']] = None
+
+    def subscribe(self, listener: Callable[[str, Dict], None]) -> Callable[[], None]:
+        """
+        订阅趋势线变更事件
+
+        Args:
+            listener: 回调 listener(event, trendline)，event为 add / update / delete，
+                      trendline为变更后的趋势线副本；回调在写入线程中同步执行，应尽快返回
+
+        Returns:
+            取消订阅的函数
+        """
+        with self.lock:
+            self.listeners.append(listener)
+
+        def unsubscribe():
+            with self.lock:
+                if listener in self.listeners:
+                    self.listeners.remove(listener)
+
+        return unsubscribe
+
+    def _publish(self, event: str, trendline: Dict):
+        with self.lock:
+            listeners = list(self.listeners)
+        for listener in listeners:
+            try:
+                listener(event, dict(trendline))
+            except Exception as e:
+                print(f"趋势线事件 {event} 处理失败: {e}")
+
+    def count(self) -> int:
+        """趋势线总数（含已删除）"""
+        self.sync()
+        with self.lock:
+            return len(self.by_id)
+
+    def insert(self, trendline: Dict):
+        """插入一条趋势线，先写入存储再更新内存"""
+        self.sync()
+        record = {key: None for key in TRENDLINE_COLUMNS}
+        record.update({k: to_db_value(k, v) for k, v in trendline.items() if k in TRENDLINE_COLUMNS})
+        # 持锁写入，保证存储与内存的修改顺序一致
+        with self.lock:
+            self.store.insert(trendline)
+            self._index(record)
+            snapshot = dict(record)
+        self._publish(EVENT_ADD, snapshot)
+
+    def insert_many(self, trendlines: Iterable[Dict]) -> int:
+        """
+        批量插入趋势线，按id去重（已存在或批内重复的跳过），字段无法转换的记录也跳过，存储只提交一次
+
+        Returns:
+            int: 插入的数量
+        """
+        self.sync()
+        with self.lock:
+            records, seen = [], set()
+            for trendline in trendlines:
+                trendline_id = trendline.get('id')
+                if not trendline_id or trendline_id in seen or trendline_id in self.by_id:
+                    continue
+                record = {key: None for key in TRENDLINE_COLUMNS}
+                try:
+                    record.update({k: to_db_value(k, v) for k, v in trendline.items() if k in TRENDLINE_COLUMNS})
+                except (TypeError, ValueError, OverflowError):
+                    continue
+                seen.add(trendline_id)
+                records.append(record)
+
+            self.store.insert_many(records)
+            for record in records:
+                self._index(record)
+            snapshots = [dict(record) for record in records]
+
+        for snapshot in snapshots:
+            self._publish(EVENT_ADD, snapshot)
+        return len(snapshots)
+
+    def get(self, trendline_id: str) -> Optional[Dict]:
+        """按id读取趋势线副本，不存在时返回None"""
+        self.sync()
+        with self.lock:
+            trendline = self.by_id.get(trendline_id)
+            return dict(trendline) if trendline else None
+
+    def query(
+        self,
+        symbol: Optional[str] = None,
+        status: Optional[str] = None,
+        exclude_status: Optional[str] = None,
+    ) -> List[Dict]:
+        """按条件查询趋势线副本，参数同 TrendlineStore.query"""
+        self.sync()
+        with self.lock:
+            if symbol:
+                candidates = (self.by_id[i] for i in self.by_symbol.get(symbol, {}))
+            else:
+                candidates = self.by_id.values()
+            return [
+                dict(t) for t in candidates
+                if (status is None or t['status'] == status)
+                and (exclude_status is None or t['status'] != exclude_status)
+            ]
+
+    def active_symbols(self) -> Set[str]:
+        """有活跃趋势线的交易对"""
+        self.sync()
+        with self.lock:
+            return {
+                symbol for symbol, ids in self.by_symbol.items()
+                if any(self.by_id[i]['status'] == 'active' for i in ids)
+            }
+
+    def active_series(self) -> Set[tuple]:
+        """有活跃趋势线的 (symbol, timeframe)，未设置周期的趋势线 timeframe 为None"""
+        self.sync()
+        with self.lock:
+            return {
+                (trendline['symbol'], trendline.get('timeframe'))
+                for trendline in self.by_id.values()
+                if trendline['status'] == 'active'
+            }
+
+    def update(self, trendline_id: str, fields: Dict) -> bool:
+        """
+        更新单条趋势线，先写入存储再更新内存
+
+        Returns:
+            bool: 趋势线是否存在
+        """
+        self.sync()
+        changes = {k: to_db_value(k, v) for k, v in fields.items() if k in TRENDLINE_COLUMNS and k != 'id'}
+        with self.lock:
+            if not self.store.update(trendline_id, fields):
+                return False
+
+            trendline = self.by_id.get(trendline_id)
+            if trendline is None:
+                # 其他进程创建的趋势线，从存储读取
+                trendline = self.store.get(trendline_id)
+                self._index(trendline)
+            else:
+                old_symbol = trendline['symbol']
+                trendline.update(changes)
+                if trendline['symbol'] != old_symbol:
+                    self.by_symbol.get(old_symbol, {}).pop(trendline_id, None)
+                    self.by_symbol.setdefault(trendline['symbol'], {})[trendline_id] = None
+            snapshot = dict(trendline)
+
+        event = EVENT_DELETE if changes.get('status') == 'deleted' else EVENT_UPDATE
+        self._publish(event, snapshot)
+        return True
+
+    def migrate_from_csv(self, csv_path: str) -> int:
+        """从旧的CSV文件导入数据并重新加载"""
+        imported = self.store.migrate_from_csv(csv_path)
+        if imported:
+            self.reload()
+        return imported
+
+
+def get_trendline_registry(db_path: str) -> TrendlineRegistry:
+    """获取数据库对应的进程内注册表"""
+    return TrendlineRegistry.for_path(db_path)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+趋势线存储模块
+
+使用SQLite（WAL模式）保存趋势线配置，按 id、symbol、status 建立索引，
+单条趋势线的读取和更新只涉及对应的行，读写可以并发进行。
+首次使用时自动从旧的 trendlines.csv 迁移数据。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+
+# 趋势线表的列及类型，顺序与旧CSV文件一致，之后新增的列追加在末尾
+TRENDLINE_COLUMNS = {
+    'id': 'TEXT PRIMARY KEY',
+    'name': 'TEXT',
+    'symbol': 'TEXT',
+    'start_time': 'TEXT',
+    'start_price': 'REAL',
+    'end_time': 'TEXT',
+    'end_price': 'REAL',
+    'direction': 'INTEGER',
+    'status': 'TEXT',
+    'created_at': 'TEXT',
+    'updated_at': 'TEXT',
+    'price_info': 'TEXT',
+    'candle_data': 'TEXT',
+    'end_price_info': 'TEXT',
+    'end_candle_data': 'TEXT',
+    'timeframe': 'TEXT',  # 趋势线所在图表的K线周期，如 15m、4H、1D；为空时使用监测的默认周期
+}
+
+
+def connect_sqlite(db_path: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    打开SQLite连接并启用WAL模式
+
+    WAL模式下读不阻塞写、写不阻塞读；busy_timeout让并发写入排队等待而不是立即报错。
+    check_same_thread=False 的连接可以在多个线程中使用，调用方需自行加锁。
+    """
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+def to_db_value(key: str, value):
+    """将字段值转换为可存入SQLite的类型"""
+    if value is None:
+        return None
+    if isinstance(value, float) and pd.isna(value):
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if key in ('start_price', 'end_price'):
+        return float(value)
+    if key == 'direction':
+        return int(value)
+    if hasattr(value, 'item'):
+        # numpy标量
+        return value.item()
+    return value
+
+
+class TrendlineStore:
+    """基于SQLite的趋势线存储"""
+
+    def __init__(self, db_path: str):
+        """
+        初始化存储
+
+        Args:
+            db_path: 数据库文件路径，如 data/trendlines.db
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._writer = None  # 所有写入共用的连接，持有 _write_lock 时使用
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程使用自己的连接（只读）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect_sqlite(self.db_path)
+        return conn
+
+    def _write_conn(self) -> sqlite3.Connection:
+        """
+        写入连接（调用方需持有 _write_lock）
+
+        本进程的写入都经过这一个连接，它的 data_version 只在其他连接（其他进程）写入后才变化
+        """
+        if self._writer is None:
+            self._writer = connect_sqlite(self.db_path, check_same_thread=False)
+        return self._writer
+
+    def data_version(self) -> int:
+        """
+        数据库变更标记：其他进程（或其他 TrendlineStore 实例）提交写入后变化，本实例的写入不改变它
+
+        Returns:
+            int: PRAGMA data_version 的值，只能与本实例之前的返回值比较
+        """
+        with self._write_lock:
+            return self._write_conn().execute("PRAGMA data_version").fetchone()[0]
+
+    def _init_schema(self):
+        conn = self._conn()
+        columns = ', '.join(f"{name} {sql_type}" for name, sql_type in TRENDLINE_COLUMNS.items())
+        with conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS trendlines ({columns})")
+            # 旧数据库缺少后来新增的列时补上
+            existing = {row['name'] for row in conn.execute("PRAGMA table_info(trendlines)")}
+            for name, sql_type in TRENDLINE_COLUMNS.items():
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE trendlines ADD COLUMN {name} {sql_type}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_trendlines_symbol ON trendlines(symbol)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_trendlines_status_symbol ON trendlines(status, symbol)")
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict:
+        return {key: row[key] for key in row.keys()}
+
+    def count(self) -> int:
+        """趋势线总数（含已删除）"""
+        return self._conn().execute("SELECT COUNT(*) FROM trendlines").fetchone()[0]
+
+    def insert(self, trendline: Dict):
+        """
+        插入一条趋势线，未知字段忽略
+
+        Args:
+            trendline: 趋势线字段字典，必须包含id
+        """
+        record = {k: to_db_value(k, v) for k, v in trendline.items() if k in TRENDLINE_COLUMNS}
+        names = ', '.join(record)
+        placeholders = ', '.join('?' for _ in record)
+        with self._write_lock, self._write_conn() as conn:
+            conn.execute(f"INSERT INTO trendlines ({names}) VALUES ({placeholders})", list(record.values()))
+
+    def insert_many(self, trendlines: Iterable[Dict]) -> int:
+        """
+        批量插入趋势线，单个事务提交，已存在的id跳过
+
+        Args:
+            trendlines: 趋势线字段字典，必须包含id
+
+        Returns:
+            int: 实际插入的数量
+        """
+        names = list(TRENDLINE_COLUMNS)
+        rows = [[to_db_value(k, t.get(k)) for k in names] for t in trendlines]
+        if not rows:
+            return 0
+        placeholders = ', '.join('?' for _ in names)
+        with self._write_lock, self._write_conn() as conn:
+            before = conn.total_changes
+            conn.executemany(f"INSERT OR IGNORE INTO trendlines ({', '.join(names)}) VALUES ({placeholders})", rows)
+            return conn.total_changes - before
+
+    def get(self, trendline_id: str) -> Optional[Dict]:
+        """按id读取趋势线，不存在时返回None"""
+        row = self._conn().execute("SELECT * FROM trendlines WHERE id = ?", (trendline_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def query(
+        self,
+        symbol: Optional[str] = None,
+        status: Optional[str] = None,
+        exclude_status: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        按条件查询趋势线，结果按创建顺序排列
+
+        Args:
+            symbol: 交易对，None表示全部
+            status: 只返回该状态，如 active
+            exclude_status: 排除该状态，如 deleted
+        """
+        conditions, params = [], []
+        if symbol:
+            conditions.append("symbol = ?")
+            params.append(symbol)
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if exclude_status:
+            conditions.append("status != ?")
+            params.append(exclude_status)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._conn().execute(f"SELECT * FROM trendlines{where} ORDER BY rowid", params).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def update(self, trendline_id: str, fields: Dict) -> bool:
+        """
+        更新单条趋势线的字段，未知字段忽略
+
+        Returns:
+            bool: 趋势线是否存在
+        """
+        record = {k: to_db_value(k, v) for k, v in fields.items() if k in TRENDLINE_COLUMNS and k != 'id'}
+        with self._write_lock, self._write_conn() as conn:
+            if not record:
+                return conn.execute("SELECT 1 FROM trendlines WHERE id = ?", (trendline_id,)).fetchone() is not None
+            assignments = ', '.join(f"{name} = ?" for name in record)
+            cursor = conn.execute(
+                f"UPDATE trendlines SET {assignments} WHERE id = ?",
+                list(record.values()) + [trendline_id],
+            )
+            return cursor.rowcount > 0
+
+    def migrate_from_csv(self, csv_path: str) -> int:
+        """
+        从旧的 trendlines.csv 导入数据，已存在的id跳过
+
+        Returns:
+            int: 导入的趋势线数量
+        """
+        if not os.path.exists(csv_path):
+            return 0
+        try:
+            df = pd.read_csv(csv_path)
+        except pd.errors.EmptyDataError:
+            return 0
+
+        columns = [c for c in df.columns if c in TRENDLINE_COLUMNS]
+        rows = [
+            [to_db_value(c, v) for c, v in zip(columns, values)]
+            for values in df[columns].itertuples(index=False, name=None)
+        ]
+        if not rows:
+            return 0
+
+        names = ', '.join(columns)
+        placeholders = ', '.join('?' for _ in columns)
+        with self._write_lock, self._write_conn() as conn:
+            before = conn.total_changes
+            conn.executemany(f"INSERT OR IGNORE INTO trendlines ({names}) VALUES ({placeholders})", rows)
+            imported = conn.total_changes - before
+        print(f"已从 {csv_path} 迁移 {imported} 条趋势线到 {self.db_path}")
+        return imported
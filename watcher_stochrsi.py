@@ -8,10 +8,19 @@ import time
 from send_email import send_email
 import os
 from kline_fetcher import KlineFetcher
+from resampler import TimeframeResampler
+from stochrsi_store import StochRSIStore
+from stochrsi_overview import OverviewSnapshot
 from volatility_calculator import calculate_volatility, calculate_sigma_level
 
 np.set_printoptions(suppress=True)  # 取消科学计数法
 fetcher = KlineFetcher()
+# 每个交易对只请求15m K线，4H、1D、1W在本地增量合成
+resampler = TimeframeResampler(base_interval="15m", intervals=["4H", "1D", "1W"])
+# 指标和背离事件增量写入 data/stochrsi/stochrsi.db
+stochrsi_store = StochRSIStore()
+# 每个序列计算完成后发布概览快照，供Web看板直接读取
+overview_snapshot = OverviewSnapshot(stochrsi_store)
 
 
 # 计算公式
@@ -60,13 +69,6 @@ def is_tbl(df, time_interval, symbol):
             -1,
             np.nan,
         )
-        # 确保 data/stochrsi 目录存在
-        output_dir = "data/stochrsi"
-        os.makedirs(output_dir, exist_ok=True)
-
-        output_file = f"{output_dir}/stochrsi_{symbol}_{time_interval}_tbl_turn.csv"
-        df.to_csv(output_file, index=False)
-        print(f"Turn数据已保存到: {output_file}")
 
         # 过滤出 turn 的数据
         df_turn = df[df["turn"] == -1].copy()
@@ -84,14 +86,10 @@ def is_tbl(df, time_interval, symbol):
         # 过滤出 bl 的数据
         bl = df_turn[df_turn["bl"] == -1]
 
-        # 确保 data/stochrsi 目录存在
-        output_dir = "data/stochrsi"
-        os.makedirs(output_dir, exist_ok=True)
-
-        # 保存结果到指定目录
-        output_file = f"{output_dir}/stochrsi_{symbol}_{time_interval}_tbl.csv"
-        bl.to_csv(output_file, index=False)
-        print(f"Turn分析结果已保存到: {output_file}")
+        # 第一个拐点无法与前一个比较，只替换其后的事件
+        if len(df_turn) > 1:
+            stochrsi_store.write(symbol, time_interval, events={"tbl": bl}, events_since=df_turn.iloc[1]["datetime"])
+            print(f"TBL事件已保存: {symbol} {time_interval}，窗口内 {len(bl)} 个")
 
         return bl.iloc[-1]["datetime"] == turn_time if not bl.empty else False
     except Exception as e:
@@ -126,14 +124,10 @@ def is_dbl(df, time_interval, symbol):
 
         bl = df_turn[df_turn["dbl"] == 1]
 
-        # 确保 data/stochrsi 目录存在
-        output_dir = "data/stochrsi"
-        os.makedirs(output_dir, exist_ok=True)
-
-        # 保存结果到指定目录
-        output_file = f"{output_dir}/stochrsi_{symbol}_{time_interval}_dbl.csv"
-        df_turn.to_csv(output_file, index=False)
-        print(f"DBL分析结果已保存到: {output_file}")
+        # 保存所有拐点（dbl=1 为底背离），第一个拐点无法与前一个比较，只替换其后的事件
+        if len(df_turn) > 1:
+            stochrsi_store.write(symbol, time_interval, events={"dbl": df_turn}, events_since=df_turn.iloc[1]["datetime"])
+            print(f"DBL事件已保存: {symbol} {time_interval}，窗口内 {len(bl)} 个")
 
         return bl.iloc[-1]["datetime"] == turn_time if not bl.empty else False
     except Exception as e:
@@ -142,14 +136,16 @@ def is_dbl(df, time_interval, symbol):
 
 
 # def watch(time_interval="5m", rule="15min", symbol="BTC/USDT", days=15):
-def watch(time_interval="15m", symbol="SOL-USDT-SWAP", limit=100):
+def watch(time_interval="15m", symbol="SOL-USDT-SWAP", limit=100, df=None):
     try:
 
-        df = fetcher.get_klines(
-            symbol=symbol,
-            timeframe=time_interval,
-            limit=limit,
-        )
+        # 未传入预先获取的K线时，单独请求
+        if df is None:
+            df = fetcher.get_klines(
+                symbol=symbol,
+                timeframe=time_interval,
+                limit=limit,
+            )
 
         stochrsi, _ = StochRSI(df["close"].tolist(), m=14, p=3)
 
@@ -199,14 +195,9 @@ def watch(time_interval="15m", symbol="SOL-USDT-SWAP", limit=100):
 
         print(f"波动率计算完成: {volatility_data['current_volatility']:.4f}% ({volatility_data['sigma_level']})")
 
-        # 确保 data/stochrsi 目录存在
-        output_dir = "data/stochrsi"
-        os.makedirs(output_dir, exist_ok=True)
-
-        # 保存结果到指定目录
-        output_file = f"{output_dir}/stochrsi_{symbol}_{time_interval}.csv"
-        df.to_csv(output_file, index=False)
-        print(f"原始数据和指标已保存到: {output_file}")
+        # 只追加新的指标行（并覆盖上次未收盘的K线）
+        written = stochrsi_store.write(symbol, time_interval, df)
+        print(f"指标已保存: {symbol} {time_interval}，写入 {written} 行")
         # stochrsi 15m
         # 1. 小于5，注意最近支撑位强度!!!；三次以上触及支撑，看空!!!, 4h 大概率低点
         # 2. 大于92，可能短期高点，是否顶背离，4h 首次达到 大概率继续
@@ -233,6 +224,9 @@ def watch(time_interval="15m", symbol="SOL-USDT-SWAP", limit=100):
             show_notification(f"{symbol},{time_interval}", msg)
             show_notification(f"{symbol},{time_interval}", msg)
 
+        version = overview_snapshot.publish_series(symbol, time_interval)
+        print(f"概览快照已更新: {symbol} {time_interval}，版本 {version}")
+
     except Exception as e:
         print('Exception',e)
 
@@ -264,9 +258,36 @@ def watch1d():
 def watchPlan():
     symbols = ["BTC-USDT-SWAP", "ETH-USDT-SWAP", "SOL-USDT-SWAP"]
     time_intervals = ["15m", "1W", "1D", "4H"]
+    higher_intervals = resampler.intervals
+    # 首次运行（或数据出现缺口）的交易对获取所有周期的K线用于初始化，之后每轮只请求15m
+    unseeded = [symbol for symbol in symbols if not resampler.is_seeded(symbol)]
+    requests = [(symbol, "15m", 300 if symbol in unseeded else 100) for symbol in symbols]
+    requests += [(symbol, time_interval) for symbol in unseeded for time_interval in higher_intervals]
+    klines = fetcher.get_klines_batch(requests, limit=100)
+
     for symbol in symbols:
+        base_df = klines.get((symbol, "15m"))
+        if base_df is None:
+            print(f"跳过 {symbol}，15m K线获取失败")
+            continue
+        if symbol in unseeded:
+            frames = {time_interval: klines.get((symbol, time_interval)) for time_interval in higher_intervals}
+            if any(df is None for df in frames.values()):
+                print(f"跳过 {symbol}，K线获取失败")
+                continue
+            frames["15m"] = base_df
+            resampler.seed(symbol, frames)
+        elif not resampler.update(symbol, base_df):
+            # 基础K线有缺口，下一轮重新初始化
+            resampler.reset(symbol)
+            continue
+
         for time_interval in time_intervals:
-            watch(time_interval=time_interval, symbol=symbol)
+            df = resampler.get(symbol, time_interval, limit=100)
+            if df is None:
+                print(f"跳过 {symbol} {time_interval}，K线获取失败")
+                continue
+            watch(time_interval=time_interval, symbol=symbol, df=df)
     print("watchPlan", time.strftime("%Y-%m-%d %H:%M:%S"))
 
 